@@ -0,0 +1,93 @@
+import random
+from typing import AsyncGenerator
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import DATABASE_ASYNC_REPLICA_URLS, DATABASE_ASYNC_URL, DATABASE_REPLICA_URLS, DATABASE_URL
+from app.core.pool import InstrumentedAsyncQueuePool, engine_options, instrument_engine
+from app.core.request_metrics import instrument_queries
+
+# Async driver used for each backend when DATABASE_ASYNC_URL is not given explicitly
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Derive the async-driver URL for the database `url` points to.
+
+    For example `postgresql://user@host/db` becomes `postgresql+asyncpg://user@host/db`.
+
+    Args:
+        url (str): A sync SQLAlchemy database URL.
+
+    Returns:
+        str: The same database addressed through its async driver.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()!r}; set DATABASE_ASYNC_URL")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+# The async engine is only created when this module is imported, which app.main does only
+# when USE_ASYNC_DB is enabled, so the async drivers stay optional for sync deployments.
+_async_url = DATABASE_ASYNC_URL or async_database_url(DATABASE_URL)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, poolclass=InstrumentedAsyncQueuePool))
+instrument_engine(async_engine.sync_engine, "async")
+instrument_queries(async_engine.sync_engine, "async")
+
+# expire_on_commit=False keeps returned objects readable after commit; with an async session
+# an expired attribute could not be lazily reloaded outside the session's context.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Async engines of the read replicas; see app/core/database.py
+_async_replica_urls = DATABASE_ASYNC_REPLICA_URLS or [async_database_url(url) for url in DATABASE_REPLICA_URLS]
+async_replica_engines = []
+for _index, _url in enumerate(_async_replica_urls):
+    _replica = create_async_engine(_url, **engine_options(_url, poolclass=InstrumentedAsyncQueuePool))
+    instrument_engine(_replica.sync_engine, f"async-replica{_index}")
+    instrument_queries(_replica.sync_engine, "async-replica")
+    async_replica_engines.append(_replica)
+AsyncReplicaSessionLocals = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False, info={"replica": True})
+    for replica in async_replica_engines
+]
+
+
+def async_read_sessionmaker(primary: bool = False) -> async_sessionmaker:
+    """
+    Async counterpart of `read_sessionmaker`: a random replica's factory, or `AsyncSessionLocal`.
+    """
+    if primary or not AsyncReplicaSessionLocals:
+        return AsyncSessionLocal
+    return random.choice(AsyncReplicaSessionLocals)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function for getting a new async database session.
+
+    The async counterpart of `get_db`: waiting on the database suspends the request's
+    coroutine instead of occupying a threadpool thread.
+
+    Yields:
+        db (AsyncSession): A SQLAlchemy async database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_replica_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of `get_replica_db`: a session on a read replica, or on the primary if none is configured.
+
+    Yields:
+        db (AsyncSession): A SQLAlchemy async database session.
+    """
+    async with async_read_sessionmaker()() as db:
+        yield db
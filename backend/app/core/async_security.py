@@ -0,0 +1,35 @@
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.async_database import AsyncSessionLocal, get_async_replica_db
+from app.core.security import AuthenticatedUser, decode_token_subject, oauth2_scheme, resolve_user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_replica_db)
+) -> AuthenticatedUser:
+    """
+    Async counterpart of `get_current_user`, for the routers served from the async engine.
+
+    Shares the token validation and the authenticated-user cache with the sync dependency;
+    on a cache hit the session never touches the database. Like it, the lookup reads from a
+    replica and falls back to the primary for users the replica does not know yet.
+
+    Parameters:
+        token (str): The OAuth2 token, passed automatically by FastAPI using the OAuth2PasswordBearer dependency.
+        db (AsyncSession): The async SQLAlchemy session on a replica, provided via the dependency injection system.
+
+    Returns:
+        AuthenticatedUser: The user corresponding to the JWT's subject (ID or email).
+
+    Raises:
+        HTTPException: If the token is invalid or the user is not found in the database.
+    """
+    sub = decode_token_subject(token)
+    try:
+        return await db.run_sync(resolve_user, sub)
+    except HTTPException:
+        if not db.info.get("replica"):
+            raise
+    async with AsyncSessionLocal() as primary:
+        return await primary.run_sync(resolve_user, sub)
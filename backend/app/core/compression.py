@@ -0,0 +1,157 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_SIZE
+from app.core.metrics import Counter
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses are only gzip-compressed
+    brotli = None
+
+# Content codings in order of preference, for clients accepting several with the same weight
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Media types worth compressing; everything the API sends is one of these
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/msgpack", "text/",
+)
+
+compressed_bytes = Counter(
+    "http_response_compressed_bytes_total",
+    "Bytes of compressed response bodies before (stage=\"identity\") and after (stage=\"encoded\") compression.",
+    ["encoding", "stage"],
+)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content coding for a response from the request's `Accept-Encoding` header.
+
+    Args:
+        accept_encoding (str): The header value, e.g. "gzip, deflate, br;q=0.9".
+
+    Returns:
+        Optional[str]: "br" (only if the brotli package is installed) or "gzip", whichever the
+        client weighs highest; None if it accepts neither.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        weight = 1.0
+        name, _, value = params.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    chosen, chosen_weight = None, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > chosen_weight:
+            chosen, chosen_weight = coding, weight
+    return chosen
+
+
+class _GzipEncoder:
+    def __init__(self):
+        # wbits 16 + 15 writes the gzip container rather than a bare zlib stream
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with brotli or gzip, as negotiated with the client.
+
+    Complete responses smaller than COMPRESSION_MIN_SIZE bytes are sent as they are, since
+    compressing them saves less than it costs. Streamed responses (the export) are compressed
+    chunk by chunk and flushed after every chunk, so the client still receives rows while the
+    export runs. A compressed response's ETag is made weak, as it no longer identifies the
+    exact bytes of the uncompressed representation; `If-None-Match` compares tags weakly, so
+    revalidation is unaffected.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder = None  # set once the response is being compressed
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                # First body chunk: decide whether this response is compressed
+                headers = MutableHeaders(raw=start["headers"])
+                passthrough = (
+                    "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if "content-encoding" not in headers:
+                    headers.add_vary_header("Accept-Encoding")
+                if not passthrough:
+                    encoder = _BrotliEncoder() if encoding == "br" else _GzipEncoder()
+                    headers["Content-Encoding"] = encoding
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                    del headers["Content-Length"]
+
+            if passthrough:
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            encoded = encoder.encode(body, final=not more_body)
+            compressed_bytes.inc(len(body), encoding=encoding, stage="identity")
+            compressed_bytes.inc(len(encoded), encoding=encoding, stage="encoded")
+            if start is not None:
+                if not more_body:
+                    MutableHeaders(raw=start["headers"])["Content-Length"] = str(len(encoded))
+                await send(start)
+                start = None
+            await send({**message, "body": encoded})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -8,4 +9,156 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256") # Retrieve the ALGORITHM from the en
 
 # Retrieve the ACCESS_TOKEN_EXPIRE_MINUTES from the environment, with a default of 30 minutes
 # This value controls how long the access token is valid before it expires
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+# Page size used by GET /expenses/ when the client does not pass `limit`, and the largest `limit` accepted
+EXPENSE_PAGE_DEFAULT_LIMIT = int(os.getenv("EXPENSE_PAGE_DEFAULT_LIMIT", 100))
+EXPENSE_PAGE_MAX_LIMIT = int(os.getenv("EXPENSE_PAGE_MAX_LIMIT", 500))
+
+# Number of changes GET /expenses/changes returns per page when the client does not pass `limit`,
+# and the largest `limit` accepted
+EXPENSE_CHANGES_DEFAULT_LIMIT = int(os.getenv("EXPENSE_CHANGES_DEFAULT_LIMIT", 1000))
+EXPENSE_CHANGES_MAX_LIMIT = int(os.getenv("EXPENSE_CHANGES_MAX_LIMIT", 5000))
+
+# Number of rows fetched per round trip from the server-side cursor when streaming an export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# Number of results GET /expenses/search returns when the client does not pass `limit`
+EXPENSE_SEARCH_DEFAULT_LIMIT = int(os.getenv("EXPENSE_SEARCH_DEFAULT_LIMIT", 50))
+
+# PostgreSQL text search configuration used to index and query expense descriptions. It is baked
+# into the full-text index, so changing it requires recreating ix_expenses_description_fts.
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "english")
+
+# Largest number of items accepted by one call to the batch create/update/delete endpoints
+EXPENSE_BATCH_MAX_ITEMS = int(os.getenv("EXPENSE_BATCH_MAX_ITEMS", 500))
+
+# Statement imports are parsed and loaded IMPORT_BATCH_SIZE rows at a time, so memory use does not
+# grow with the file; the report lists at most IMPORT_MAX_REJECTIONS rejected rows
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+IMPORT_MAX_REJECTIONS = int(os.getenv("IMPORT_MAX_REJECTIONS", 100))
+
+# Background jobs run on JOB_WORKERS threads of each worker process. At most JOB_QUEUE_LIMIT jobs
+# wait for a thread, and a user has at most JOB_MAX_ACTIVE_PER_USER jobs queued or running
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", 100))
+JOB_MAX_ACTIVE_PER_USER = int(os.getenv("JOB_MAX_ACTIVE_PER_USER", 3))
+
+# Running jobs record their progress and a heartbeat every JOB_HEARTBEAT_SECONDS; a running job
+# without a heartbeat for JOB_STALE_SECONDS lost its process and is marked failed
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 5))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 120))
+
+# Uploaded statements and export files of jobs are kept in JOB_SPOOL_DIR, which must be shared by
+# every host serving the API. Finished jobs and their files are deleted after JOB_RETENTION_SECONDS
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "budgie-jobs"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+
+# Resolved users are cached in-process for USER_CACHE_TTL_SECONDS (0 disables the cache),
+# holding at most USER_CACHE_MAX_ENTRIES users per worker
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024))
+
+# Serve the expenses and auth routers from the async engine (asyncpg / aiosqlite) instead of the
+# threadpool-bound sync engine. DATABASE_ASYNC_URL overrides the URL derived from DATABASE_URL.
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+DATABASE_ASYNC_URL = os.getenv("DATABASE_ASYNC_URL")
+
+# Comma-separated URLs of read replicas of DATABASE_URL. When set, the read-only expense endpoints
+# and the user lookup are served from a randomly chosen replica. DATABASE_ASYNC_REPLICA_URLS
+# overrides the async URLs derived from them, in the same order.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DATABASE_ASYNC_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_ASYNC_REPLICA_URLS", "").split(",") if url.strip()
+]
+
+# After a user writes, their reads go to the primary for READ_YOUR_WRITES_SECONDS (0 disables it), so
+# replication lag never hides their own changes. The pins live in the key-value store (KVSTORE_URL),
+# which must be shared (Redis) when several workers serve the API.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+# Connection pool sizing. Each worker process keeps up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections;
+# a checkout waits at most DB_POOL_TIMEOUT seconds and connections older than DB_POOL_RECYCLE seconds
+# are replaced (-1 never recycles).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+
+# How connections are checked for liveness on checkout: "always" pings on every checkout,
+# "idle" only pings connections idle for more than DB_POOL_PING_IDLE_SECONDS, "never" skips pinging
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "always").lower()
+if DB_POOL_PRE_PING not in ("always", "idle", "never"):
+    raise ValueError(f"DB_POOL_PRE_PING must be 'always', 'idle' or 'never', not {DB_POOL_PRE_PING!r}")
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", 30))
+
+# Expose pool, cache and request statistics in Prometheus format on GET /metrics. Off by default, since
+# the endpoint reveals per-route traffic; with METRICS_TOKEN set, scrapers must send it as a bearer token
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# SQL statements taking at least this many milliseconds are logged (logger "app.slow_queries")
+# together with the route of the request that ran them
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+
+# Compress responses with brotli (when the brotli package is installed) or gzip, whichever the client
+# accepts. Complete responses under COMPRESSION_MIN_SIZE bytes are sent uncompressed. Brotli quality
+# runs from 0 to 11; dynamic responses want a low setting, since higher ones cost far more CPU.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+# Shared state of the worker processes (rate-limit buckets, read-your-writes pins): empty or "memory://"
+# keeps it in each process, "redis://host:6379/0" shares it through Redis (needs the redis package)
+KVSTORE_URL = os.getenv("KVSTORE_URL", "")
+
+# Summaries are cached per user, query and data version, so repeated dashboard loads skip the
+# summary query. RESULT_CACHE_URL selects the backend: "memory://" keeps results in each worker
+# process (at most RESULT_CACHE_MAX_BYTES, least recently used evicted first), "redis://host:6379/1"
+# shares them between workers; empty disables the cache. Either way a write is seen by every
+# worker, since the data version is read from the database on each request.
+RESULT_CACHE_URL = os.getenv("RESULT_CACHE_URL", "memory://")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 3600))
+
+# Per-user token buckets in front of the expenses API. Each user may send RATE_LIMIT_READ_PER_SECOND
+# reads (GET) and RATE_LIMIT_WRITE_PER_SECOND writes per second on average, in bursts of up to
+# RATE_LIMIT_READ_BURST and RATE_LIMIT_WRITE_BURST; requests beyond that get a 429 response.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_READ_PER_SECOND = float(os.getenv("RATE_LIMIT_READ_PER_SECOND", 10))
+RATE_LIMIT_READ_BURST = float(os.getenv("RATE_LIMIT_READ_BURST", 50))
+RATE_LIMIT_WRITE_PER_SECOND = float(os.getenv("RATE_LIMIT_WRITE_PER_SECOND", 2))
+RATE_LIMIT_WRITE_BURST = float(os.getenv("RATE_LIMIT_WRITE_BURST", 20))
+
+# Apply pending migrations on startup instead of only checking that the database is at the schema
+# revision this build expects. Meant for single-process development setups, so it defaults to on
+# for SQLite only; deployments run `python -m app.services.schema upgrade` before starting workers.
+DB_AUTO_MIGRATE = os.getenv(
+    "DB_AUTO_MIGRATE", "true" if (DATABASE_URL or "").startswith("sqlite") else "false"
+).lower() in ("1", "true", "yes")
+
+# Range-partition the expenses table by date into "month" or "year" partitions (PostgreSQL only;
+# empty disables it). This shapes the table when it is created; an existing table is converted with
+# `python -m app.services.partitions migrate`. EXPENSE_PARTITION_PREMAKE future partitions are
+# kept created ahead of the current one.
+EXPENSE_PARTITION_INTERVAL = (
+    os.getenv("EXPENSE_PARTITION_INTERVAL", "").lower() if (DATABASE_URL or "").startswith("postgresql") else ""
+)
+EXPENSE_PARTITION_PREMAKE = int(os.getenv("EXPENSE_PARTITION_PREMAKE", 3))
+
+# Google OAuth client settings and endpoints. The endpoints default to Google's and can point at a
+# local stand-in for development. ID tokens are verified against the JWKS key set, which is cached
+# for the max-age Google sends (GOOGLE_JWKS_CACHE_SECONDS when it sends none).
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
+GOOGLE_AUTH_ENDPOINT = os.getenv("GOOGLE_AUTH_ENDPOINT", "https://accounts.google.com/o/oauth2/v2/auth")
+GOOGLE_TOKEN_ENDPOINT = os.getenv("GOOGLE_TOKEN_ENDPOINT", "https://oauth2.googleapis.com/token")
+GOOGLE_JWKS_URI = os.getenv("GOOGLE_JWKS_URI", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_ISSUERS = tuple(os.getenv("GOOGLE_ISSUERS", "https://accounts.google.com,accounts.google.com").split(","))
+GOOGLE_JWKS_CACHE_SECONDS = float(os.getenv("GOOGLE_JWKS_CACHE_SECONDS", 3600))
+
+# Timeout in seconds for each call to Google, and the size of the pooled client's keep-alive pool
+GOOGLE_HTTP_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", 10))
+GOOGLE_HTTP_MAX_CONNECTIONS = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", 20))
@@ -1,10 +1,25 @@
-from sqlalchemy import create_engine
+import random
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.core.config import DATABASE_URL
+from app.core.config import DATABASE_REPLICA_URLS, DATABASE_URL
+from app.core.pool import engine_options, instrument_engine
+from app.core.request_metrics import instrument_queries
 
 # Create the SQLAlchemy engine for database connection using the provided DATABASE_URL
-# The 'pool_pre_ping' option ensures that the connection is checked before each use.
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Pool size, overflow, timeout, recycling and the pre-ping strategy come from app.core.config,
+# and the pool's statistics are published on the /metrics endpoint. Every statement is timed and
+# attributed to the request that ran it, and slow ones are logged.
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine, "primary")
+instrument_queries(engine, "primary")
+
+if engine.dialect.name == "sqlite":
+    # Write-ahead logging lets requests read while another connection writes, e.g. clients polling
+    # a background job whose long import holds the write lock. The mode is stored in the file.
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
 
 # SessionLocal is a session factory that will allow interaction with the database.
 # autocommit=False: Disables automatic commits; transactions must be explicitly committed.
@@ -12,6 +27,36 @@ engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional read replicas (DATABASE_REPLICA_URLS), pooled and instrumented like the primary. Their
+# sessions are marked with info["replica"], so code can tell that what it reads may lag behind.
+replica_engines = []
+for _index, _url in enumerate(DATABASE_REPLICA_URLS):
+    _replica = create_engine(_url, **engine_options(_url))
+    instrument_engine(_replica, f"replica{_index}")
+    instrument_queries(_replica, "replica")
+    replica_engines.append(_replica)
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica, info={"replica": True})
+    for replica in replica_engines
+]
+
+
+def read_sessionmaker(primary: bool = False) -> sessionmaker:
+    """
+    Pick the session factory for a read-only unit of work.
+
+    Args:
+        primary (bool): Read from the primary even if replicas are configured, e.g. because the
+            user has just written something.
+
+    Returns:
+        sessionmaker: The factory of a randomly chosen replica, or `SessionLocal` if `primary` is
+        set or no replica is configured.
+    """
+    if primary or not ReplicaSessionLocals:
+        return SessionLocal
+    return random.choice(ReplicaSessionLocals)
+
 def get_db():
     """
     Dependency function for getting a new database session.
@@ -27,4 +72,40 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_replica_db():
+    """
+    Dependency function for getting a database session on a read replica.
+
+    Like `get_db`, but the session reads from a replica when any is configured, and from the
+    primary otherwise. Only for work that never writes and tolerates replication lag.
+
+    Yields:
+        db (Session): A SQLAlchemy database session.
+    """
+    db = read_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def dialect_insert(db, table):
+    """
+    Return an INSERT construct for `table` that supports ON CONFLICT upserts on the session's database.
+
+    Both PostgreSQL and SQLite implement `INSERT ... ON CONFLICT`, but SQLAlchemy exposes it through
+    dialect-specific `insert()` functions.
+
+    Args:
+        db (Session): The session the statement will be executed on.
+        table: The table or mapped class to insert into.
+
+    Returns:
+        Insert: A dialect-specific insert with `on_conflict_do_update` / `on_conflict_do_nothing`.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
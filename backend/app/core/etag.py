@@ -0,0 +1,62 @@
+import hashlib
+
+from fastapi import Request, Response
+
+# Listings change only when the user writes, so clients must revalidate but may keep a copy
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+# Listings and summaries are negotiated on Accept (JSON or MessagePack); caches must key on it
+ETAG_VARY = "Accept"
+
+
+def make_etag(request: Request, user_id: int, data_version: int, media_type: str = "application/json") -> str:
+    """
+    Build the strong ETag of a listing or summary response.
+
+    The tag covers the user's data version and everything that selects the response (path,
+    query parameters and the negotiated media type), so it changes whenever the user's expenses
+    do and differs between pages, filters, groupings and formats.
+
+    Args:
+        request (Request): The incoming request.
+        user_id (int): The ID of the user whose data is returned.
+        data_version (int): The user's current data version.
+        media_type (str): The media type the response is encoded in.
+
+    Returns:
+        str: The quoted ETag value.
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    selector = f"{user_id}:{data_version}:{request.url.path}?{params}"
+    if media_type != "application/json":
+        selector += f":{media_type}"
+    digest = hashlib.sha256(selector.encode()).hexdigest()
+    return f'"{data_version}-{digest[:16]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Check whether the request's `If-None-Match` header matches `etag`.
+
+    Args:
+        request (Request): The incoming request.
+        etag (str): The current ETag of the requested resource.
+
+    Returns:
+        bool: True if the client's copy is current and a 304 response can be sent.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    Build the bodiless 304 response for a matching `If-None-Match`.
+    """
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL, "Vary": ETAG_VARY})
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Query
+
+from app.models.category import category_id_query
+from app.models.expense import Expense as ExpenseModel
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.astimezone(timezone.utc) if value is not None and value.tzinfo is not None else value
+
+
+class ExpenseFilters:
+    """
+    Query-string filters shared by the expense read endpoints.
+
+    Used as a FastAPI dependency (`filters: ExpenseFilters = Depends()`), so every endpoint that
+    reads expenses accepts the same date-range, category and amount-range parameters.
+
+    Attributes:
+        date_from (Optional[datetime]): Only include expenses on or after this moment.
+        date_to (Optional[datetime]): Only include expenses strictly before this moment.
+        category (Optional[str]): Only include expenses in this category, matched case-insensitively.
+        min_amount (Optional[float]): Only include expenses of at least this amount.
+        max_amount (Optional[float]): Only include expenses of at most this amount.
+    """
+
+    def __init__(
+        self,
+        date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on the expense date"),
+        date_to: Optional[datetime] = Query(None, description="Exclusive upper bound on the expense date"),
+        category: Optional[str] = Query(None),
+        min_amount: Optional[float] = Query(None, ge=0),
+        max_amount: Optional[float] = Query(None, ge=0),
+    ):
+        # In UTC, like the stored dates, so SQLite's text comparison orders them correctly
+        self.date_from = _utc(date_from)
+        self.date_to = _utc(date_to)
+        self.category = category
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+
+    def apply(self, query, user_id: int):
+        """
+        Add the active filters to a query over the expenses table.
+
+        Args:
+            query: A SQLAlchemy `Query` or `Select` that selects from the expenses table.
+            user_id (int): The ID of the user whose expenses the query reads, which the
+                category name is resolved against.
+
+        Returns:
+            The same query with one WHERE condition per filter that was supplied.
+        """
+        if self.date_from is not None:
+            query = query.filter(ExpenseModel.date >= self.date_from)
+        if self.date_to is not None:
+            query = query.filter(ExpenseModel.date < self.date_to)
+        if self.category is not None:
+            query = query.filter(ExpenseModel.category_id == category_id_query(user_id, self.category))
+        if self.min_amount is not None:
+            query = query.filter(ExpenseModel.amount >= self.min_amount)
+        if self.max_amount is not None:
+            query = query.filter(ExpenseModel.amount <= self.max_amount)
+        return query
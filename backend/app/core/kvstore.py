@@ -0,0 +1,303 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from app.core.config import KVSTORE_URL
+
+# Shared state for the API's worker processes, behind one small interface.
+#
+# `MemoryKVStore` keeps the state in the process; it is exact for a single worker and serves as
+# the stand-in for the shared store when testing. `RedisKVStore` keeps it in Redis, so every
+# worker sees the same buckets and keys. Which one is used is chosen by URL with `create_kvstore`.
+
+
+class KVStoreError(Exception):
+    """
+    Raised when the shared store cannot be reached or fails to answer.
+    """
+
+
+class KVStore(ABC):
+    """
+    Interface of the stores holding state shared by the API's worker processes.
+    """
+
+    @abstractmethod
+    async def take_tokens(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        """
+        Take `cost` tokens from the token bucket stored under `key`, if it holds enough.
+
+        A bucket starts full, holds at most `capacity` tokens and is refilled with `rate` tokens
+        per second. Checking and taking happen atomically, however many workers share the bucket.
+
+        Args:
+            key (str): The bucket's key.
+            rate (float): Tokens added per second.
+            capacity (float): The most tokens the bucket holds, i.e. the largest burst.
+            cost (float): Tokens taken by this call.
+
+        Returns:
+            float: 0 if the tokens were taken; otherwise the seconds until the bucket holds enough,
+            in which case nothing was taken.
+
+        Raises:
+            KVStoreError: If the store cannot be reached.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the value stored under `key`, or None if there is none or it has expired.
+
+        Raises:
+            KVStoreError: If the store cannot be reached.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        """
+        Store `value` under `key` for `ttl` seconds, replacing any previous value.
+
+        Raises:
+            KVStoreError: If the store cannot be reached.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """
+        Store `value` under `key` for `ttl` seconds, unless the key already holds a value.
+
+        Returns:
+            bool: True if the value was stored, False if the key was taken.
+
+        Raises:
+            KVStoreError: If the store cannot be reached.
+        """
+        raise NotImplementedError
+
+    async def aclose(self):
+        """
+        Release the store's connections; called on application shutdown.
+        """
+
+
+class MemoryKVStore(KVStore):
+    """
+    A `KVStore` keeping its state in the current process.
+
+    At most `max_keys` buckets are kept, so idle users do not accumulate: the least recently used
+    bucket is dropped first, which, having been idle the longest, has usually refilled and carries
+    no information. Likewise at most `max_keys` values, and optionally at most `max_bytes` bytes of
+    them, are kept, the least recently used ones being evicted first. Refills and expiries follow
+    `clock` (`time.monotonic` unless another clock is passed, as tests do).
+
+    Attributes:
+        max_keys (int): The most buckets, and the most values, kept.
+        max_bytes (Optional[int]): The most bytes of keys and values kept, or None for no limit.
+        size_bytes (int): The bytes of keys and values currently kept.
+    """
+
+    def __init__(
+        self, max_keys: int = 100_000, max_bytes: Optional[int] = None, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated at)
+        self._values: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # key -> (value, expires at)
+        self._lock = threading.Lock()
+
+    async def take_tokens(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self._clock():
+                self._discard(key)
+                return None
+            self._values.move_to_end(key)
+            return entry[0]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[1] > self._clock():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key: str, value: bytes, ttl: float):
+        self._discard(key)
+        size = len(key) + len(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._values[key] = (value, self._clock() + ttl)
+        self.size_bytes += size
+        over_bytes = self.max_bytes is not None and self.size_bytes > self.max_bytes
+        while len(self._values) > self.max_keys or over_bytes:
+            self._discard(next(iter(self._values)))
+            over_bytes = self.max_bytes is not None and self.size_bytes > self.max_bytes
+
+    def _discard(self, key: str):
+        entry = self._values.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(key) + len(entry[0])
+
+    def clear(self):
+        """
+        Drop every bucket and value.
+        """
+        with self._lock:
+            self._buckets.clear()
+            self._values.clear()
+            self.size_bytes = 0
+
+
+# Token bucket update, run atomically inside Redis. The clock is Redis's, so workers on hosts
+# whose clocks disagree still agree on the refill. The bucket expires once it would be full.
+_TAKE_TOKENS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisKVStore(KVStore):
+    """
+    A `KVStore` keeping its state in Redis, shared by every worker that points at the same server.
+
+    Needs the `redis` package. The client is created on first use, inside the running event loop.
+
+    Attributes:
+        url (str): The Redis URL, e.g. "redis://localhost:6379/0".
+        timeout (float): Seconds to wait for Redis before giving up on a call.
+    """
+
+    def __init__(self, url: str, timeout: float = 0.25):
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+        self._script = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self.url, socket_timeout=self.timeout, socket_connect_timeout=self.timeout)
+            self._script = self._client.register_script(_TAKE_TOKENS_SCRIPT)
+        return self._client
+
+    async def take_tokens(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        from redis.exceptions import RedisError
+
+        self._redis()
+        try:
+            wait = await asyncio.wait_for(
+                self._script(keys=[key], args=[rate, capacity, cost]), timeout=self.timeout
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as exc:
+            raise KVStoreError(f"Redis call failed: {exc!r}") from exc
+        return float(wait)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        from redis.exceptions import RedisError
+
+        client = self._redis()
+        try:
+            return await asyncio.wait_for(client.get(key), timeout=self.timeout)
+        except (RedisError, OSError, asyncio.TimeoutError) as exc:
+            raise KVStoreError(f"Redis call failed: {exc!r}") from exc
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        from redis.exceptions import RedisError
+
+        client = self._redis()
+        try:
+            await asyncio.wait_for(client.set(key, value, px=max(1, int(ttl * 1000))), timeout=self.timeout)
+        except (RedisError, OSError, asyncio.TimeoutError) as exc:
+            raise KVStoreError(f"Redis call failed: {exc!r}") from exc
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        from redis.exceptions import RedisError
+
+        client = self._redis()
+        try:
+            stored = await asyncio.wait_for(
+                client.set(key, value, px=max(1, int(ttl * 1000)), nx=True), timeout=self.timeout
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as exc:
+            raise KVStoreError(f"Redis call failed: {exc!r}") from exc
+        return bool(stored)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_kvstore(url: Optional[str], max_bytes: Optional[int] = None) -> KVStore:
+    """
+    Create the store `url` points to.
+
+    Args:
+        url (Optional[str]): "redis://..." or "rediss://..." for Redis; empty or "memory://" for
+            the in-process store.
+        max_bytes (Optional[int]): Memory bound of the in-process store's values; a Redis server
+            is bounded by its own `maxmemory` setting.
+
+    Returns:
+        KVStore: The store.
+
+    Raises:
+        ValueError: If the URL's scheme is not supported.
+    """
+    if not url or url.startswith("memory://"):
+        return MemoryKVStore(max_bytes=max_bytes)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisKVStore(url)
+    raise ValueError(f"Unsupported key-value store URL: {url!r}")
+
+
+# The store of the running application, shared by every request (and, with Redis, every worker)
+shared_store: KVStore = create_kvstore(KVSTORE_URL)
@@ -0,0 +1,170 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond pool checkouts up to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    """
+    Base class for the in-process metrics exposed on `/metrics`.
+
+    A metric holds one value per combination of label values. Values are either recorded
+    directly or, for state that already lives elsewhere (pool sizes, cache counters),
+    read from a callback when the metrics are rendered.
+
+    Attributes:
+        name (str): The Prometheus metric name.
+        documentation (str): The HELP text.
+        labelnames (Tuple[str, ...]): The names of the labels every sample carries.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set_function(self, function: Callable[[], float], **labels):
+        """
+        Report the value returned by `function` at render time instead of a recorded one.
+
+        Args:
+            function (Callable[[], float]): Returns the current value.
+            **labels: The label values of the sample.
+        """
+        self._functions[self._key(labels)] = function
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        """
+        Yield (name suffix, label values, value) for every sample of the metric.
+        """
+        with self._lock:
+            values = dict(self._values)
+        for key, function in list(self._functions.items()):
+            values[key] = function()
+        for key, value in values.items():
+            yield "", key, value
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, e.g. requests served or checkouts that timed out.
+    """
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down, e.g. connections currently checked out.
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    A distribution of observed values in cumulative buckets, plus their sum and count.
+
+    Attributes:
+        buckets (Tuple[float, ...]): The upper bounds of the buckets, in increasing order.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # One slot per bucket, then the running sum
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                yield "_bucket", key + (le,), cumulative
+            yield "_sum", key, values[-1]
+            yield "_count", key, cumulative
+
+
+class Registry:
+    """
+    The set of metrics rendered by the `/metrics` endpoint.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, value in metric.samples():
+                names = metric.labelnames + (("le",) if suffix == "_bucket" else ())
+                labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, key))
+                lines.append(f"{metric.name}{suffix}{{{labels}}} {_format(value)}" if labels
+                             else f"{metric.name}{suffix} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+REGISTRY = Registry()
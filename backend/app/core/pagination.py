@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(date: datetime, expense_id: int) -> str:
+    """
+    Build the opaque `after` token that points just past the given row.
+
+    The token carries the sort key (date, id) of the last row on a page. Clients must treat it
+    as an opaque string and hand it back unchanged to fetch the next page.
+
+    Args:
+        date (datetime): The date of the last expense on the page.
+        expense_id (int): The ID of the last expense on the page.
+
+    Returns:
+        str: A URL-safe base64 token.
+    """
+    raw = json.dumps({"d": date.isoformat(), "i": expense_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decode an `after` token produced by `encode_cursor`.
+
+    Args:
+        token (str): The opaque cursor received from the client.
+
+    Returns:
+        Tuple[datetime, int]: The (date, id) sort key the next page starts after.
+
+    Raises:
+        HTTPException: A 400 error if the token is malformed or was tampered with.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["d"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def encode_change_cursor(change_seq: int, expense_id: Optional[int] = None, floor: Optional[int] = None) -> str:
+    """
+    Build the opaque `since` token of the change feed.
+
+    A token with only `change_seq` says the client is in sync with that data version. The
+    tokens of a partial response also carry how far into that version's rows it got, and, while
+    a snapshot is being paged through, the version the snapshot started at.
+
+    Args:
+        change_seq (int): The change sequence of the last change sent.
+        expense_id (Optional[int]): The ID of the last change sent, if the response stopped
+            within `change_seq`; None once every change of `change_seq` was sent.
+        floor (Optional[int]): The data version a snapshot in progress started at; deletions up
+            to it are not reported, since the snapshot never contained the deleted expenses.
+
+    Returns:
+        str: A URL-safe base64 token.
+    """
+    data = {"s": change_seq}
+    if expense_id is not None:
+        data["i"] = expense_id
+    if floor is not None:
+        data["f"] = floor
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(token: str) -> Tuple[int, Optional[int], Optional[int]]:
+    """
+    Decode a `since` token produced by `encode_change_cursor`.
+
+    Args:
+        token (str): The opaque cursor received from the client.
+
+    Returns:
+        Tuple[int, Optional[int], Optional[int]]: The change sequence, expense ID and snapshot
+        floor the token was built from.
+
+    Raises:
+        HTTPException: A 400 error if the token is malformed or was tampered with.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        expense_id, floor = data.get("i"), data.get("f")
+        return (
+            int(data["s"]),
+            int(expense_id) if expense_id is not None else None,
+            int(floor) if floor is not None else None,
+        )
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid change cursor")
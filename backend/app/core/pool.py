@@ -0,0 +1,140 @@
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import (
+    DB_MAX_OVERFLOW, DB_POOL_PING_IDLE_SECONDS, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+)
+from app.core.metrics import Counter, Gauge, Histogram
+
+pool_size = Gauge("db_pool_size", "Configured number of persistent connections in the pool.", ["engine"])
+pool_checked_out = Gauge("db_pool_checked_out", "Connections currently checked out of the pool.", ["engine"])
+pool_overflow = Gauge("db_pool_overflow", "Connections open beyond pool_size (bounded by max_overflow).", ["engine"])
+pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to obtain a connection from the pool, including waiting for a free slot and opening a new connection.",
+    ["engine"],
+)
+pool_checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout seconds.", ["engine"]
+)
+pool_connections_created = Counter(
+    "db_pool_connections_created_total", "New DBAPI connections opened by the pool.", ["engine"]
+)
+pool_pings = Counter("db_pool_pings_total", "Liveness pings issued on checkout, by outcome.", ["engine", "result"])
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times every checkout of a queue pool and counts checkouts that time out.
+
+    `_do_get` is where a queue pool hands out an idle connection, waits for one to be returned
+    or opens a new one, so timing it measures exactly what a request waits for.
+    """
+    metrics_label = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc(engine=self.metrics_label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - start, engine=self.metrics_label)
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool; keep reporting under the same label
+        pool = super().recreate()
+        pool.metrics_label = self.metrics_label
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """
+    QueuePool that reports checkout latency and timeouts.
+    """
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that reports checkout latency and timeouts.
+    """
+
+
+def engine_options(url: str, poolclass=InstrumentedQueuePool) -> dict:
+    """
+    Build the `create_engine` keyword arguments for the configured pool.
+
+    In-memory SQLite databases live inside a single connection and cannot be pooled, so they
+    keep SQLAlchemy's default pool.
+
+    Args:
+        url (str): The database URL the engine is created for.
+        poolclass: The pool implementation to use (the async engine passes `InstrumentedAsyncQueuePool`).
+
+    Returns:
+        dict: Keyword arguments for `create_engine` / `create_async_engine`.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        # "always" uses SQLAlchemy's own pre-ping; "idle" is handled by instrument_engine
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+    }
+
+
+def instrument_engine(engine: Engine, label: str):
+    """
+    Publish an engine's pool statistics and install the "idle" pre-ping strategy if configured.
+
+    Args:
+        engine (Engine): The sync engine (for an async engine, its `sync_engine`).
+        label (str): The value of the `engine` label on the pool metrics.
+    """
+    if isinstance(engine.pool, _InstrumentedPoolMixin):
+        engine.pool.metrics_label = label
+    pool_size.set_function(lambda: engine.pool.size(), engine=label)
+    pool_checked_out.set_function(lambda: engine.pool.checkedout(), engine=label)
+    pool_overflow.set_function(lambda: max(engine.pool.overflow(), 0), engine=label)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_connections_created.inc(engine=label)
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    if DB_POOL_PRE_PING != "idle":
+        return
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # Only connections that sat idle long enough to have been dropped by the server or a
+        # proxy are pinged, which saves the extra round trip on busy connections.
+        idle = time.monotonic() - connection_record.info.get("checked_in_at", 0)
+        if idle < DB_POOL_PING_IDLE_SECONDS:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            pool_pings.inc(engine=label, result="ok")
+        except Exception:
+            pool_pings.inc(engine=label, result="failed")
+            # Makes the pool discard this connection and retry the checkout with a fresh one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
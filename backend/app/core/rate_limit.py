@@ -0,0 +1,83 @@
+import logging
+import math
+from typing import Callable
+
+from fastapi import Depends, HTTPException, Request
+
+from app.core.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_READ_BURST, RATE_LIMIT_READ_PER_SECOND, RATE_LIMIT_WRITE_BURST,
+    RATE_LIMIT_WRITE_PER_SECOND,
+)
+from app.core.kvstore import KVStore, KVStoreError, shared_store
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# (tokens per second, capacity) of each bucket; every user has one bucket of each kind
+BUCKETS = {
+    "read": (RATE_LIMIT_READ_PER_SECOND, RATE_LIMIT_READ_BURST),
+    "write": (RATE_LIMIT_WRITE_PER_SECOND, RATE_LIMIT_WRITE_BURST),
+}
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+rate_limit_decisions = Counter(
+    "rate_limit_requests_total", "Requests checked against the per-user rate limits, by bucket and outcome.",
+    ["bucket", "outcome"],
+)
+rate_limit_store_errors = Counter(
+    "rate_limit_store_errors_total", "Rate-limit checks skipped because the key-value store failed."
+)
+
+
+async def check_rate_limit(user_id: int, bucket: str, store: KVStore = shared_store):
+    """
+    Take one token from the user's bucket, or reject the request if it is empty.
+
+    When the store cannot be reached the request is let through (and counted), so an outage of
+    the shared store degrades to no rate limiting instead of failing every request.
+
+    Args:
+        user_id (int): The ID of the user making the request.
+        bucket (str): "read" or "write".
+        store (KVStore): The store holding the buckets.
+
+    Raises:
+        HTTPException: A 429 error with a `Retry-After` header if the bucket is empty.
+    """
+    rate, capacity = BUCKETS[bucket]
+    try:
+        wait = await store.take_tokens(f"ratelimit:{bucket}:{user_id}", rate, capacity)
+    except KVStoreError:
+        logger.warning("Rate-limit store unavailable; letting the request through", exc_info=True)
+        rate_limit_store_errors.inc()
+        return
+    if wait > 0:
+        rate_limit_decisions.inc(bucket=bucket, outcome="limited")
+        raise HTTPException(
+            status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(wait))}
+        )
+    rate_limit_decisions.inc(bucket=bucket, outcome="allowed")
+
+
+def rate_limiter(user_dependency: Callable) -> Callable:
+    """
+    Build a router dependency enforcing the per-user read and write limits.
+
+    The dependency depends on `user_dependency`, so it runs once the user is identified, and it
+    shares that user with the endpoint through FastAPI's per-request dependency cache. GET, HEAD
+    and OPTIONS requests draw from the read bucket, every other method from the write bucket.
+
+    Args:
+        user_dependency (Callable): The dependency resolving the authenticated user
+            (`get_current_user` or `get_current_user_async`).
+
+    Returns:
+        Callable: The dependency, for `APIRouter(dependencies=[Depends(...)])`.
+    """
+
+    async def enforce_rate_limit(request: Request, current_user=Depends(user_dependency)):
+        if RATE_LIMIT_ENABLED:
+            await check_rate_limit(current_user.id, "read" if request.method in READ_METHODS else "write")
+
+    return enforce_rate_limit
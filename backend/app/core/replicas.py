@@ -0,0 +1,136 @@
+import logging
+from typing import AsyncGenerator, Callable, Generator
+
+from fastapi import Depends, Request
+from sqlalchemy.orm import Session
+
+from app.core.config import DATABASE_ASYNC_REPLICA_URLS, DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS
+from app.core.database import read_sessionmaker
+from app.core.kvstore import KVStore, KVStoreError, shared_store
+from app.core.metrics import Counter
+from app.core.rate_limit import READ_METHODS
+
+# Routing of read-only requests to the read replicas.
+#
+# A router opts in with `read_routing(user_dependency)`, added to its dependencies: every write
+# request (and every login, which may create the user) pins the user to the primary for
+# READ_YOUR_WRITES_SECONDS, and every read request is
+# routed to the primary while the user is pinned and to a replica otherwise. The read-only
+# endpoints then take their session from `read_db(...)` / `async_read_db(...)` built on the same
+# routing dependency; the write endpoints keep using the primary's `get_db`. Without replicas
+# configured nothing is pinned or looked up and every session is the primary's.
+
+logger = logging.getLogger(__name__)
+
+REPLICAS_CONFIGURED = bool(DATABASE_REPLICA_URLS or DATABASE_ASYNC_REPLICA_URLS)
+
+read_routes = Counter(
+    "db_read_routing_total", "Read-only requests by the database they were routed to.", ["target"]
+)
+
+
+def _pin_key(user_id: int) -> str:
+    return f"primary-pin:{user_id}"
+
+
+async def pin_to_primary(user_id: int, store: KVStore = shared_store):
+    """
+    Route the user's reads to the primary for the next READ_YOUR_WRITES_SECONDS.
+
+    Args:
+        user_id (int): The ID of the user who is writing.
+        store (KVStore): The store holding the pins.
+    """
+    if not REPLICAS_CONFIGURED or READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    try:
+        await store.set(_pin_key(user_id), b"1", READ_YOUR_WRITES_SECONDS)
+    except KVStoreError:
+        logger.warning("Key-value store unavailable; user %s is not pinned to the primary", user_id, exc_info=True)
+
+
+async def is_pinned_to_primary(user_id: int, store: KVStore = shared_store) -> bool:
+    """
+    Tell whether the user wrote within the last READ_YOUR_WRITES_SECONDS.
+
+    When the store cannot be reached the answer is yes, so an outage of the store costs replica
+    offload rather than showing users stale data.
+
+    Args:
+        user_id (int): The ID of the user who is reading.
+        store (KVStore): The store holding the pins.
+
+    Returns:
+        bool: True if the user's reads must go to the primary.
+    """
+    if READ_YOUR_WRITES_SECONDS <= 0:
+        return False
+    try:
+        return await store.get(_pin_key(user_id)) is not None
+    except KVStoreError:
+        logger.warning("Key-value store unavailable; reading from the primary", exc_info=True)
+        return True
+
+
+def read_routing(user_dependency: Callable) -> Callable:
+    """
+    Build a router dependency that pins writers to the primary and routes reads.
+
+    Like the rate limiter, it depends on `user_dependency` and shares the user with the endpoint
+    through FastAPI's per-request dependency cache. A write request pins the user before the
+    endpoint runs, so reads racing with the write are routed to the primary as well.
+
+    Args:
+        user_dependency (Callable): The dependency resolving the authenticated user
+            (`get_current_user` or `get_current_user_async`).
+
+    Returns:
+        Callable: The dependency, for `APIRouter(dependencies=[Depends(...)])`. It returns True
+        when the request must use the primary.
+    """
+
+    async def use_primary(request: Request, current_user=Depends(user_dependency)) -> bool:
+        if not REPLICAS_CONFIGURED:
+            return True
+        if request.method not in READ_METHODS:
+            await pin_to_primary(current_user.id)
+            return True
+        primary = await is_pinned_to_primary(current_user.id)
+        read_routes.inc(target="primary" if primary else "replica")
+        return primary
+
+    return use_primary
+
+
+def read_db(routing: Callable) -> Callable:
+    """
+    Build the session dependency of a router's read-only endpoints.
+
+    Args:
+        routing (Callable): The router's `read_routing(...)` dependency.
+
+    Returns:
+        Callable: A dependency yielding a session on the database `routing` chose.
+    """
+
+    def get_read_db(primary: bool = Depends(routing)) -> Generator[Session, None, None]:
+        db = read_sessionmaker(primary)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return get_read_db
+
+
+def async_read_db(routing: Callable) -> Callable:
+    """
+    Async counterpart of `read_db`, yielding an `AsyncSession`.
+    """
+    from app.core.async_database import async_read_sessionmaker
+
+    async def get_async_read_db(primary: bool = Depends(routing)) -> AsyncGenerator:
+        async with async_read_sessionmaker(primary)() as db:
+            yield db
+
+    return get_async_read_db
@@ -0,0 +1,158 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import SLOW_QUERY_THRESHOLD_MS
+from app.core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger("app.slow_queries")
+
+# Statements per request: one cheap lookup sits in the first bucket, N+1 patterns in the last ones
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Requests that match no route share one label, so unknown paths cannot inflate the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests served, by route and status code.", ["method", "route", "status"]
+)
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the end of its response.",
+    ["method", "route"],
+)
+http_requests_in_progress = Gauge("http_requests_in_progress", "Requests currently being handled.", ["method", "route"])
+request_db_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed while handling one request.", ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL statements while handling one request.", ["method", "route"]
+)
+db_statements = Counter("db_statements_total", "SQL statements executed, by engine and route.", ["engine", "route"])
+db_slow_statements = Counter(
+    "db_slow_statements_total", "SQL statements slower than SLOW_QUERY_THRESHOLD_MS, by engine and route.",
+    ["engine", "route"],
+)
+
+
+class RequestStats:
+    """
+    Database work attributed to the request being handled.
+
+    One instance is created per request and published through a context variable. Sync endpoints
+    run in the threadpool with a copy of the context, which still points at this same object, so
+    statements executed there are counted as well.
+
+    Attributes:
+        route (str): The path template of the matched route.
+        statements (int): The number of SQL statements executed so far.
+        db_seconds (float): Their total execution time.
+    """
+
+    __slots__ = ("route", "statements", "db_seconds")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def instrument_queries(engine: Engine, label: str):
+    """
+    Time every statement an engine executes, attribute it to the current request and log slow ones.
+
+    Args:
+        engine (Engine): The sync engine (for an async engine, its `sync_engine`).
+        label (str): The value of the `engine` label on the statement metrics.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_start"].pop()
+        stats = _current_request.get()
+        route = stats.route if stats is not None else ""
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        db_statements.inc(engine=label, route=route)
+
+        if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+            db_slow_statements.inc(engine=label, route=route)
+            logger.warning(
+                "Slow query: %.1f ms on engine %s for route %s: %s",
+                elapsed * 1000, label, route or "-", " ".join(statement.split())[:1000],
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("statement_start"):
+            connection.info["statement_start"].pop()
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status codes, in-flight requests and database work.
+
+    Requests are labelled with the path template of the route they match ("/expenses/{expense_id}"),
+    so every expense ID shares one time series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _route(self, scope: Scope) -> str:
+        # The routing table is walked here because the router only records the match in the scope
+        # after the request has passed this middleware. A path matching a route registered for
+        # other methods (a 405) is reported under that route.
+        partial = UNMATCHED_ROUTE
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial == UNMATCHED_ROUTE:
+                partial = route.path
+        return partial
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats(self._route(scope))
+        labels = {"method": method, "route": stats.route}
+        status = 500  # reported when the application fails before starting a response
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current_request.set(stats)
+        http_requests_in_progress.inc(**labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - start, **labels)
+            http_requests_in_progress.dec(**labels)
+            http_requests.inc(status=str(status), **labels)
+            request_db_statements.observe(stats.statements, **labels)
+            request_db_seconds.observe(stats.db_seconds, **labels)
+            _current_request.reset(token)
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+from typing import AsyncGenerator, Callable, Optional
+
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core.config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_URL
+from app.core.kvstore import KVStore, KVStoreError, MemoryKVStore, create_kvstore
+from app.core.metrics import Counter, Gauge
+from app.core.serialization import preferred_media_type
+from app.services.users import get_data_version
+
+# Encoded results of expensive read-only requests (the summaries), cached per user.
+#
+# Entries are keyed by (user, data version, request). The data version lives in the user's row
+# and every write bumps it in its own transaction, so a write makes all of the user's entries
+# unreachable at once, in every worker and whichever store holds them, and they age out of the
+# store; nothing has to be deleted or notified. A lookup costs one primary-key read of the
+# version, made in the session the endpoint then queries, before its query: an entry may hold
+# data newer than its version, never older.
+
+logger = logging.getLogger(__name__)
+
+result_cache_lookups = Counter(
+    "result_cache_lookups_total", "Result cache lookups, by outcome (hit, miss, or error when the store failed).",
+    ["result"],
+)
+result_cache_bytes = Gauge("result_cache_bytes", "Bytes held by the in-process result cache.")
+
+
+class ResultCache:
+    """
+    Per-user cache of encoded responses, keyed by the user's data version.
+
+    Attributes:
+        store (Optional[KVStore]): The store holding the entries; None disables the cache.
+        ttl (float): Seconds an entry is kept.
+    """
+
+    def __init__(self, store: Optional[KVStore], ttl: float):
+        self.store = store
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None and self.ttl > 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up an entry by its full key (see `entry_key`), counting the lookup.
+        """
+        try:
+            value = await self.store.get(key)
+        except KVStoreError:
+            logger.warning("Result cache store unavailable", exc_info=True)
+            result_cache_lookups.inc(result="error")
+            return None
+        result_cache_lookups.inc(result="miss" if value is None else "hit")
+        return value
+
+    async def set(self, key: str, value: bytes):
+        """
+        Store an entry under its full key (see `entry_key`); failures are only logged.
+        """
+        try:
+            await self.store.set(key, value, self.ttl)
+        except KVStoreError:
+            logger.warning("Result cache store unavailable", exc_info=True)
+
+
+def entry_key(request: Request, user_id: int, version: int, media_type: str) -> str:
+    """
+    Build the key of the cached result of `request`.
+
+    Like the ETag, the key covers everything that selects the response: the path, the query
+    parameters and the negotiated media type.
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha256(f"{request.url.path}?{params}:{media_type}".encode()).hexdigest()
+    return f"result:{user_id}:{version}:{digest[:32]}"
+
+
+class CachedResult:
+    """
+    The result cache's entry for one request, handed to the endpoint by `cached_result`.
+
+    On a hit, `etag` and `body` hold the cached response. On a miss the endpoint computes the
+    response and passes it to `store`; it is written to the cache once the endpoint returns.
+
+    Attributes:
+        media_type (str): The media type negotiated for the response.
+        version (int): The user's data version, read before the endpoint's query.
+        etag (Optional[str]): The cached response's ETag, on a hit.
+        body (Optional[bytes]): The cached response's body, on a hit.
+    """
+
+    def __init__(self, media_type: str, version: int, etag: Optional[str] = None, body: Optional[bytes] = None):
+        self.media_type = media_type
+        self.version = version
+        self.etag = etag
+        self.body = body
+        self.pending: Optional[bytes] = None
+
+    @property
+    def hit(self) -> bool:
+        return self.body is not None
+
+    def store(self, etag: str, body: bytes):
+        """
+        Record the response computed on a miss, to be cached after the endpoint returns.
+        """
+        # ETags are quoted strings without line breaks, so the first newline ends it
+        self.pending = etag.encode() + b"\n" + body
+
+
+def cached_result(user_dependency: Callable, db_dependency: Callable) -> Callable:
+    """
+    Build the dependency that looks up a read-only request in the result cache.
+
+    The user's data version is read in the endpoint's own session (FastAPI hands the dependency
+    and the endpoint the same one), so the cached entry and the endpoint's query see the same
+    database, replica or primary.
+
+    Args:
+        user_dependency (Callable): The dependency resolving the authenticated user
+            (`get_current_user` or `get_current_user_async`).
+        db_dependency (Callable): The endpoint's session dependency, yielding a `Session` or an
+            `AsyncSession`.
+
+    Returns:
+        Callable: A dependency yielding a `CachedResult`.
+    """
+
+    async def lookup(
+        request: Request, current_user=Depends(user_dependency), db=Depends(db_dependency)
+    ) -> AsyncGenerator:
+        media_type = preferred_media_type(request)
+        if isinstance(db, Session):
+            version = await run_in_threadpool(get_data_version, db, current_user.id)
+        else:
+            version = await db.run_sync(get_data_version, current_user.id)
+        if not result_cache.enabled:
+            yield CachedResult(media_type, version)
+            return
+        key = entry_key(request, current_user.id, version, media_type)
+        value = await result_cache.get(key)
+        if value is not None:
+            etag, _, body = value.partition(b"\n")
+            yield CachedResult(media_type, version, etag.decode(), body)
+            return
+        entry = CachedResult(media_type, version)
+        yield entry
+        if entry.pending is not None:
+            await result_cache.set(key, entry.pending)
+
+    return lookup
+
+
+# The application's cache; its in-process store is bounded to RESULT_CACHE_MAX_BYTES
+result_cache = ResultCache(
+    create_kvstore(RESULT_CACHE_URL, max_bytes=RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_URL else None,
+    RESULT_CACHE_TTL_SECONDS,
+)
+if isinstance(result_cache.store, MemoryKVStore):
+    result_cache_bytes.set_function(lambda: result_cache.store.size_bytes)
@@ -1,19 +1,69 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
 from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.core.deps import get_db
+from app.core.database import SessionLocal, get_replica_db
 from app.models.user import User
+from app.services.users import find_user_by_subject, invalidate_user, user_cache
 
 # OAuth2 scheme (temporary, for dev we use auth/dev-login to get tokens)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/dev-login")
 
 
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """
+    A read-only snapshot of the user a request is authenticated as.
+
+    Handlers receive this instead of a `User` ORM instance, so it can be cached and shared
+    between requests and threads without being tied to a database session.
+
+    Attributes:
+        id (int): The unique identifier of the user.
+        email (str): The email address of the user.
+        full_name (Optional[str]): The full name of the user.
+        picture (Optional[str]): The profile picture URL of the user.
+        created_at (Optional[datetime]): When the user was created.
+    """
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    picture: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_model(cls, user: User) -> "AuthenticatedUser":
+        """
+        Take a snapshot of a `User` row.
+        """
+        return cls(
+            id=user.id, email=user.email, full_name=user.full_name,
+            picture=user.picture, created_at=user.created_at,
+        )
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User):
+    """
+    Keep the cache consistent when a user row is changed or removed through the ORM.
+
+    The email the user was cached under before the change is dropped as well.
+    """
+    old_emails = inspect(target).attrs.email.history.deleted or ()
+    invalidate_user(target.id, target.email)
+    for email in old_emails:
+        if email:
+            user_cache.delete(email)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Create a JWT access token containing the given data and an expiration time.
@@ -35,24 +85,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-):
+def decode_token_subject(token: str) -> str:
     """
-    Dependency to retrieve the current user from the database by decoding the JWT token.
+    Validate an access token and return its subject (a user ID or an email address).
 
-    This function decodes the JWT token, retrieves the user ID or email (sub),
-    and returns the corresponding user object from the database.
-
-    Parameters:
-        token (str): The OAuth2 token, passed automatically by FastAPI using the OAuth2PasswordBearer dependency.
-        db (Session): The SQLAlchemy session, provided via the dependency injection system.
+    Args:
+        token (str): The bearer token sent by the client.
 
     Returns:
-        User: The user object corresponding to the JWT's subject (ID or email).
-    
+        str: The token's `sub` claim.
+
     Raises:
-        HTTPException: If the token is invalid or the user is not found in the database.
+        HTTPException: A 401 error if the token is invalid, expired or has no subject.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,20 +111,69 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return sub
 
-   
-    user = None
-    try:
-        user_id = int(sub)
-        user = db.query(User).filter(User.id == user_id).first()
-    except ValueError:
-        # If not a number, assume it's an email (Google login case)
-        user = db.query(User).filter(User.email == sub).first()
 
+def resolve_user(db: Session, sub: str) -> AuthenticatedUser:
+    """
+    Turn a token subject into the authenticated user, consulting the user cache first.
+
+    Args:
+        db (Session): The database session used on a cache miss.
+        sub (str): The subject of a validated access token.
+
+    Returns:
+        AuthenticatedUser: The user the subject refers to.
+
+    Raises:
+        HTTPException: A 401 error if no such user exists.
+    """
+    cached = user_cache.get(sub)
+    if cached is not None:
+        return cached
+
+    user = find_user_by_subject(db, sub)
     if not user:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    current_user = AuthenticatedUser.from_model(user)
+    user_cache.set(sub, current_user)
+    return current_user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_replica_db)
+):
+    """
+    Dependency to retrieve the current user from the database by decoding the JWT token.
+
+    This function decodes the JWT token, retrieves the user ID or email (sub),
+    and returns the corresponding user. Resolved users are kept in a small in-process
+    TTL cache keyed by the subject, so repeated requests with the same token skip the
+    `users` lookup; the cache entry is dropped whenever the user row changes.
 
-    return user
+    The lookup reads from a replica when any is configured. A user the replica does not know
+    yet (one who signed up moments ago) is looked up again on the primary.
 
+    Parameters:
+        token (str): The OAuth2 token, passed automatically by FastAPI using the OAuth2PasswordBearer dependency.
+        db (Session): The SQLAlchemy session on a replica, provided via the dependency injection system.
 
+    Returns:
+        AuthenticatedUser: The user corresponding to the JWT's subject (ID or email).
     
+    Raises:
+        HTTPException: If the token is invalid or the user is not found in the database.
+    """
+    sub = decode_token_subject(token)
+    try:
+        return resolve_user(db, sub)
+    except HTTPException:
+        if not db.info.get("replica"):
+            raise
+    with SessionLocal() as primary:
+        return resolve_user(primary, sub)
@@ -0,0 +1,212 @@
+import json
+from datetime import date, datetime
+from typing import Iterable, List
+
+import msgpack
+import orjson
+from fastapi import Request
+from pydantic import TypeAdapter
+
+from app.schemas import ExpenseRead, ExpenseSummary
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Media ranges a client may ask for MessagePack with; "application/x-msgpack" predates the registration
+_MSGPACK_RANGES = frozenset({MSGPACK_MEDIA_TYPE, "application/x-msgpack"})
+
+# orjson renders timezone-aware UTC datetimes with a "Z" suffix, as pydantic does
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+_expense_list = TypeAdapter(List[ExpenseRead])
+
+
+def _expense_dict(row) -> dict:
+    # Keys in the order ExpenseRead serializes its fields
+    return {
+        "amount": row.amount,
+        "category": row.category,
+        "description": row.description,
+        "date": row.date,
+        "id": row.id,
+    }
+
+
+def _plain_float(value: float) -> bool:
+    """
+    Whether orjson writes `value` exactly like Python's `repr`.
+
+    Both print the shortest round-tripping digits, but for magnitudes outside [1e-4, 1e16)
+    Python switches to exponent notation with a sign ("1e+16", "1e-05") while orjson does
+    not ("1e16", "0.00001"). Non-finite values are rejected by the stdlib path as well.
+    """
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def _stdlib_dumps(content) -> bytes:
+    # Mirrors Starlette's JSONResponse.render, which is what FastAPI uses for response models
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def preferred_media_type(request: Request) -> str:
+    """
+    Choose between JSON and MessagePack for a response, from the request's `Accept` header.
+
+    MessagePack is only chosen when the client ranks it above JSON (explicitly or through a
+    wildcard), so clients that do not ask for it keep getting JSON.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        str: `MSGPACK_MEDIA_TYPE` or `JSON_MEDIA_TYPE`.
+    """
+    header = request.headers.get("accept")
+    if not header:
+        return JSON_MEDIA_TYPE
+    msgpack_q, json_q, wildcard_q = 0.0, None, 0.0
+    for media_range in header.split(","):
+        media_type, _, params = media_range.partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in _MSGPACK_RANGES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type == JSON_MEDIA_TYPE:
+            json_q = max(json_q or 0.0, q)
+        elif media_type in ("*/*", "application/*"):
+            wildcard_q = max(wildcard_q, q)
+    if json_q is None:
+        json_q = wildcard_q
+    return MSGPACK_MEDIA_TYPE if msgpack_q > json_q else JSON_MEDIA_TYPE
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        # Instants travel as MessagePack timestamps, which decode straight to datetimes; naive values
+        # (as SQLite returns them) identify no instant and keep the ISO string JSON would carry
+        return msgpack.Timestamp.from_datetime(value) if value.tzinfo is not None else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def dump_msgpack(content) -> bytes:
+    """
+    Encode plain data (dicts, lists, strings, numbers, datetimes) as MessagePack.
+
+    The structure and keys are those of the JSON response; datetimes become MessagePack
+    timestamps.
+
+    Args:
+        content: The data to encode.
+
+    Returns:
+        bytes: The MessagePack document.
+    """
+    return msgpack.packb(content, default=_msgpack_default)
+
+
+def dump_expense_summary(summary: dict, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """
+    Encode a summary exactly as an `ExpenseSummary` response model would be rendered.
+
+    Args:
+        summary (dict): The summary returned by `app.services.summary.expense_summary`.
+        media_type (str): `MSGPACK_MEDIA_TYPE` to encode it as MessagePack instead of JSON.
+
+    Returns:
+        bytes: The encoded summary.
+    """
+    model = ExpenseSummary.model_validate(summary)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return dump_msgpack(model.model_dump())
+    return _stdlib_dumps(model.model_dump(mode="json", by_alias=True))
+
+
+def dump_expense_rows(rows: Iterable, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """
+    Encode expense rows as the JSON array a `List[ExpenseRead]` response would produce.
+
+    Rows only need `id`, `amount`, `category`, `description` and `date` attributes, so plain
+    column tuples from a Core select can be encoded without building ORM instances or
+    validating each row through the schema. The output is byte-identical to FastAPI's
+    rendering of the same data through `ExpenseRead`; in the rare page holding an amount
+    that orjson would format differently, the page is rendered through the schema instead.
+
+    Args:
+        rows (Iterable): Rows with the `ExpenseRead` fields.
+        media_type (str): `MSGPACK_MEDIA_TYPE` to encode the same array as MessagePack instead.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON array, or the MessagePack array.
+    """
+    items = [_expense_dict(row) for row in rows]
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return dump_msgpack(items)
+    if all(_plain_float(item["amount"]) for item in items):
+        return orjson.dumps(items, option=_ORJSON_OPTIONS)
+    return _stdlib_dumps(_expense_list.dump_python(_expense_list.validate_python(items), mode="json"))
+
+
+def dump_expense_lines(rows: Iterable) -> bytes:
+    """
+    Encode expense rows as NDJSON, one `ExpenseRead` object per line.
+
+    Each line is encoded exactly like one element of `dump_expense_rows`.
+
+    Args:
+        rows (Iterable): Rows with the `ExpenseRead` fields.
+
+    Returns:
+        bytes: The UTF-8 encoded lines, each terminated by a newline.
+    """
+    items = [_expense_dict(row) for row in rows]
+    if all(_plain_float(item["amount"]) for item in items):
+        return b"".join(orjson.dumps(item, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE) for item in items)
+    return b"".join(
+        _stdlib_dumps(item) + b"\n"
+        for item in _expense_list.dump_python(_expense_list.validate_python(items), mode="json")
+    )
+
+
+def dump_expense_msgpack_stream(rows: Iterable) -> bytes:
+    """
+    Encode expense rows as a stream of MessagePack maps, one per expense, for the export.
+
+    The maps are simply concatenated, so a reader (such as `msgpack.Unpacker`) decodes them
+    one at a time while the stream is still arriving.
+
+    Args:
+        rows (Iterable): Rows with the `ExpenseRead` fields.
+
+    Returns:
+        bytes: The concatenated MessagePack maps.
+    """
+    return b"".join(dump_msgpack(_expense_dict(row)) for row in rows)
+
+
+def dump_expense_changes_msgpack(changes: dict) -> bytes:
+    """
+    Encode a change-feed result (see `list_expense_changes`) as MessagePack.
+
+    Args:
+        changes (dict): The changed expense rows, the deleted IDs, the new cursor and `has_more`.
+
+    Returns:
+        bytes: A MessagePack map shaped like the `ExpenseChanges` JSON response.
+    """
+    return dump_msgpack({
+        "changes": [_expense_dict(row) for row in changes["changes"]],
+        "deleted": list(changes["deleted"]),
+        "cursor": changes["cursor"],
+        "has_more": changes["has_more"],
+    })
@@ -1,6 +1,24 @@
+import asyncio
+
 from fastapi import FastAPI
-from app.core.database import Base, engine
-from app.routers import auth, expenses, auth_google
+from app.core.config import (
+    COMPRESSION_ENABLED, DB_AUTO_MIGRATE, EXPENSE_PARTITION_INTERVAL, METRICS_ENABLED, USE_ASYNC_DB,
+)
+from app.core.compression import CompressionMiddleware
+from app.core.database import engine
+from app.core.kvstore import shared_store
+from app.core.result_cache import result_cache
+from app.core.request_metrics import RequestMetricsMiddleware
+from app.services.google_oauth import google_oauth
+from app.services.jobs import job_runner
+from app.services.schema import check_schema, upgrade
+from app.routers import auth_google, jobs, metrics
+
+if USE_ASYNC_DB:
+    # Same endpoints, served from the async engine; see app/core/async_database.py
+    from app.routers import async_auth as auth, async_expenses as expenses
+else:
+    from app.routers import auth, expenses
 
 app = FastAPI(title="Budgie Api", version="1.0.0")
 """
@@ -9,17 +27,48 @@ The `title` and `version` arguments are used to provide metadata about the API t
 on the auto-generated documentation page (Swagger UI).
 """
 
-# Create tables on startup
+# Check the database schema on startup
 @app.on_event("startup")
 def startup_event():
     """
     This event handler is triggered when the FastAPI application starts up.
-    It runs once and is used to initialize database tables by creating them based on the ORM models.
+    It runs once per worker process and makes sure the database schema matches this build.
+
+    - Normally it only compares the database's Alembic revision with the one the code expects
+      (a single query), and refuses to start on a mismatch. Migrations are applied beforehand,
+      once per deploy, with `python -m app.services.schema upgrade`.
+    - With DB_AUTO_MIGRATE (the default for SQLite development databases) it applies pending
+      migrations itself, creating the tables on first start.
+    """
+    if DB_AUTO_MIGRATE:
+        upgrade()
+    check_schema()
+    if EXPENSE_PARTITION_INTERVAL:
+        # Keep the current and the next few date partitions of the expenses table created ahead
+        from app.services.partitions import ensure_partitions
+
+        with engine.begin() as connection:
+            ensure_partitions(connection)
 
-    - `Base.metadata.create_all(bind=engine)` will create all tables that are defined in the SQLAlchemy 
-      ORM models based on the metadata created from the models. This is typically used in development.
+@app.on_event("startup")
+async def start_job_runner():
+    """
+    Start the background job runner once the schema is known to be current, handing it the
+    event loop on which it updates the result cache after writing jobs.
+    """
+    job_runner.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Stop the job runner from taking jobs, and close the pooled connections to Google and to the
+    key-value stores, when the application stops.
     """
-    Base.metadata.create_all(bind=engine)
+    job_runner.shutdown()
+    await google_oauth.aclose()
+    await shared_store.aclose()
+    if result_cache.store is not None:
+        await result_cache.store.aclose()
 
 # ------------------------------
 # Include routers for routing API requests
@@ -27,3 +76,11 @@ def startup_event():
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(auth_google.router, prefix="/auth/google", tags=["google_oauth"])
 app.include_router(expenses.router, prefix="/expenses")
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+if COMPRESSION_ENABLED:
+    # brotli / gzip response compression, negotiated through Accept-Encoding
+    app.add_middleware(CompressionMiddleware)
+if METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["metrics"])
+    # Per-route latency, status and database statement metrics, exposed on /metrics
+    app.add_middleware(RequestMetricsMiddleware)
@@ -0,0 +1,63 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, UniqueConstraint, select
+from app.core.database import Base
+
+class Category(Base):
+    """
+    The Category class represents one of a user's expense categories.
+    Categories are matched case- and whitespace-insensitively through
+    their `key`, so "food", "Food" and " FOOD " are the same category;
+    `name` keeps the spelling it was first created with. Expenses and
+    rollups reference categories by their small integer ID.
+    """
+    __tablename__ = "categories"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_categories_user_key"),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+
+
+def category_key(name: str) -> str:
+    """
+    Normalize a category name to the key categories are matched by.
+
+    Args:
+        name (str): A category name as typed by the user.
+
+    Returns:
+        str: The name with surrounding and repeated whitespace removed, case-folded.
+    """
+    return " ".join(name.split()).casefold()
+
+
+def category_display_name(name: str) -> str:
+    """
+    Clean up a category name for display, keeping its case.
+    """
+    return " ".join(name.split())
+
+
+def category_id_query(user_id: int, name: str):
+    """
+    Build a scalar subquery yielding the ID of the user's category called `name` (in any case).
+
+    The subquery does not depend on the outer row, so the database evaluates it once and then
+    filters on the integer category ID.
+
+    Args:
+        user_id (int): The ID of the user who owns the category.
+        name (str): The category name to look up.
+
+    Returns:
+        ScalarSelect: The category ID, or NULL if the user has no such category.
+    """
+    return select(Category.id).where(Category.user_id == user_id, Category.key == category_key(name)).scalar_subquery()
+
+
+# Trigram index behind the fuzzy category match of the expense search (PostgreSQL only)
+Index(
+    "ix_categories_name_trgm", Category.name,
+    postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
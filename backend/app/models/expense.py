@@ -1,22 +1,93 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import DDL, Column, Integer, String, Float, ForeignKey, DateTime, Index, event, literal, literal_column
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+# Registers the typed text search functions (func.to_tsvector, ...) used by the search index
+import sqlalchemy.dialects.postgresql  # noqa: F401
+from app.core.config import EXPENSE_PARTITION_INTERVAL, SEARCH_TEXT_CONFIG
 from app.core.database import Base
+from app.models.category import Category  # noqa: F401  (registers the table category_id refers to)
 
 class Expense(Base):
     """
     The Expense class represents an expense record in the database.
     It contains details about the expense such as the amount spent,
-    the category of the expense, a description, and the date when 
-    the expense was created. Each expense is associated with a user 
-    through a foreign key relationship.
+    the category of the expense (a reference to the user's category
+    dictionary), a description, and the date when the expense was created. Each expense is associated with a user 
+    through a foreign key relationship. `updated_at` and `change_seq`
+    record the last write to the row for the change feed. `import_hash`
+    identifies expenses loaded from a bank statement, so importing the
+    same transactions again skips them (see app/services/imports.py).
+
+    With EXPENSE_PARTITION_INTERVAL set, the table is range-partitioned
+    by `date` (see app/services/partitions.py). PostgreSQL then requires
+    the partition key in the primary key, so the table's key becomes
+    (id, date), while the ORM keeps identifying expenses by `id` alone.
     """
     __tablename__ = "expenses"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # Backs the keyset-paginated listing: every page is a range scan over
+        # (user_id, date, id) instead of a sort over the user's full history.
+        Index("ix_expenses_user_date_id", "user_id", "date", "id"),
+        # Backs the change feed: rows written after a client's cursor are a range scan
+        Index("ix_expenses_user_change_seq", "user_id", "change_seq"),
+        # Backs listings filtered by category: an integer equality followed by the same
+        # (date, id) range scan as the unfiltered listing
+        Index("ix_expenses_user_category_date_id", "user_id", "category_id", "date", "id"),
+        # Deduplicates statement imports; PostgreSQL wants the partition key in a partitioned
+        # table's unique indexes, and the hash covers the date anyway
+        Index(
+            "uq_expenses_user_import_hash",
+            "user_id", "import_hash", *(("date",) if EXPENSE_PARTITION_INTERVAL else ()),
+            unique=True,
+        ),
+        {"postgresql_partition_by": "RANGE (date)"} if EXPENSE_PARTITION_INTERVAL else {},
+    )
+    # Fetch the server-generated date in the INSERT itself (RETURNING), so it is known
+    # right after a flush without another SELECT
+    __mapper_args__ = {"eager_defaults": True, "primary_key": "id"}
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     amount = Column(Float, nullable=False)
-    category = Column(String, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     description = Column(String, nullable=True)
-    date = Column(DateTime(timezone=True), server_default=func.now())
+    date = Column(DateTime(timezone=True), server_default=func.now(), primary_key=bool(EXPENSE_PARTITION_INTERVAL))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # The owner's data version after the write that last touched this row
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Hash of the statement transaction the expense was imported from; NULL for expenses entered by hand
+    import_hash = Column(String(32), nullable=True)
 
     user = relationship("User", back_populates="expenses")
+    category_ref = relationship("Category", lazy="joined", innerjoin=True)
+
+    @property
+    def category(self) -> str:
+        """
+        The name of the expense's category, so ORM instances still validate as `ExpenseRead`.
+        """
+        return self.category_ref.name
+
+
+# ------------------------------
+# Search indexes (PostgreSQL only)
+# ------------------------------
+# The full-text document of an expense. Search queries must use this exact expression, with the
+# configuration inlined as a constant, for the planner to match it against the GIN index below.
+EXPENSE_SEARCH_CONFIG = literal(SEARCH_TEXT_CONFIG).render_literal_execute()  # inlined, never a bound parameter
+EXPENSE_SEARCH_DOCUMENT = func.to_tsvector(
+    EXPENSE_SEARCH_CONFIG, func.coalesce(Expense.__table__.c.description, literal_column("''"))
+)
+
+Index("ix_expenses_description_fts", EXPENSE_SEARCH_DOCUMENT, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+# Trigram index backing the typo-tolerant word-similarity and prefix matches; category names
+# have theirs on the categories table
+Index(
+    "ix_expenses_description_trgm", Expense.description,
+    postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+event.listen(
+    Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
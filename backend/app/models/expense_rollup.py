@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer
+from app.core.database import Base
+
+class ExpenseDailyRollup(Base):
+    """
+    The ExpenseDailyRollup class holds pre-aggregated expense totals.
+    Each row stores the sum and number of one user's expenses in one
+    category on one (UTC) day. Rows are kept up to date by the expense
+    write endpoints in the same transaction as the expense change, so
+    summaries can be read from here without scanning the expenses table.
+    """
+    __tablename__ = "expense_daily_rollups"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ExpenseTombstone(Base):
+    """
+    The ExpenseTombstone class records a deleted expense.
+    Expenses are still deleted outright; a tombstone remembers the ID
+    and the change sequence of the deletion, so the change feed can
+    tell clients which expenses to drop since their last sync.
+    """
+    __tablename__ = "expense_tombstones"
+    __table_args__ = (
+        # Backs the change feed: tombstones newer than a client's cursor are a range scan
+        Index("ix_expense_tombstones_user_change_seq", "user_id", "change_seq"),
+    )
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    expense_id = Column(Integer, primary_key=True)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,44 @@
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, false
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# Job statuses; a job is active while queued or running and finished in any other status
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+class Job(Base):
+    """
+    The Job class records a background job run for a user.
+    Heavy operations (statement imports, exports, rollup rebuilds) are
+    queued here and run by the job runner outside of the request, which
+    keeps the row's status, progress and result up to date so clients
+    can poll it. See app/services/jobs.py.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Backs the user's job listing, newest first
+        Index("ix_jobs_user_created_at", "user_id", "created_at"),
+        # Back the runner's sweeps for interrupted and for expired jobs
+        Index("ix_jobs_status_heartbeat_at", "status", "heartbeat_at"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default=JOB_QUEUED, server_default=JOB_QUEUED)
+    # What the job works on, as given when it was queued; never sent to clients
+    params = Column(JSON, nullable=False, default=dict)
+    # Fraction of the work done, from 0 to 1, for jobs that can tell
+    progress = Column(Float, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False, server_default=false())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the runner while the job runs
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
@@ -9,6 +9,7 @@ class User(Base):
     It stores details about the user including their email, 
     full name, profile picture, and the creation date. 
     Each user can have multiple associated expenses.
+    The data version counts changes to those expenses.
     """
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -16,5 +17,7 @@ class User(Base):
     full_name = Column(String, nullable=True)
     picture = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Incremented by every write to the user's expenses; used to build ETags for their listings
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     expenses = relationship("Expense", back_populates="user")
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.async_database import get_async_db
+from app.core.replicas import pin_to_primary
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+from app.services.users import get_or_create_user
+
+# Async variant of app.routers.auth, mounted instead of it when USE_ASYNC_DB is enabled.
+router = APIRouter()
+
+@router.post("/dev-login")
+async def dev_login(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Development login route for creating or authenticating a user.
+
+    Behaves like the sync `dev_login`, running the user lookup or creation on the async engine.
+
+    Args:
+        payload (UserCreate): A Pydantic model containing the email and full_name for the user.
+        db (AsyncSession): The async SQLAlchemy session used to interact with the database.
+
+    Returns:
+        dict: A dictionary containing the generated access token, token type, and the user's details (id and email).
+    """
+    user = await db.run_sync(get_or_create_user, payload.email, payload.full_name)
+    await pin_to_primary(user.id)
+    token = create_access_token({"sub":str(user.id)})
+    return {"access_token": token, "token_type": "bearer", "user": {"id": user.id, "email": user.email}}
@@ -0,0 +1,246 @@
+from fastapi import APIRouter, Depends, File, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+from app.schemas import (
+    ExpenseBatchDelete, ExpenseBatchResult, ExpenseBatchUpdate, ExpenseChanges, ExpenseCreate, ExpenseImportReport,
+    ExpenseRead, ExpenseSummary,
+)
+from app.core.async_database import async_read_sessionmaker, get_async_db
+from app.core.async_security import get_current_user_async
+from app.core.config import (
+    EXPENSE_CHANGES_DEFAULT_LIMIT, EXPENSE_CHANGES_MAX_LIMIT, EXPENSE_PAGE_DEFAULT_LIMIT, EXPENSE_PAGE_MAX_LIMIT,
+    EXPENSE_SEARCH_DEFAULT_LIMIT,
+)
+from app.core.database import SessionLocal
+from app.core.etag import ETAG_CACHE_CONTROL, ETAG_VARY, is_not_modified, make_etag, not_modified_response
+from app.core.filters import ExpenseFilters
+from app.core.rate_limit import rate_limiter
+from app.core.replicas import async_read_db, read_routing
+from app.core.result_cache import CachedResult, cached_result
+from app.core.serialization import (
+    MSGPACK_MEDIA_TYPE, dump_expense_changes_msgpack, dump_expense_rows, dump_expense_summary, preferred_media_type,
+)
+from app.services import expenses as expense_service
+from app.services.export import EXPORT_MEDIA_TYPES, aiter_export
+from app.services.imports import ImportOptions, import_expenses, statement_format
+from app.services.search import search_expenses
+from app.services.summary import expense_summary as summarize_expenses
+from app.services.users import get_data_version
+
+# Async variant of app.routers.expenses, mounted instead of it when USE_ASYNC_DB is enabled.
+# Each handler runs the same service function as its sync twin through AsyncSession.run_sync,
+# which drives the sync-style code over the async driver without using a threadpool thread.
+# See the sync router for the full endpoint documentation.
+use_primary = read_routing(get_current_user_async)
+get_read_db = async_read_db(use_primary)
+router = APIRouter(dependencies=[Depends(rate_limiter(get_current_user_async)), Depends(use_primary)])
+
+# ------------------------------
+# GET /expenses/ - list expenses
+# ------------------------------
+@router.get("/", response_model=List[ExpenseRead])
+async def list_expenses(
+    request: Request,
+    response: Response,
+    after: Optional[str] = Query(None, description="Opaque cursor returned in the X-Next-Cursor header of the previous page"),
+    limit: int = Query(EXPENSE_PAGE_DEFAULT_LIMIT, ge=1, le=EXPENSE_PAGE_MAX_LIMIT),
+    filters: ExpenseFilters = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Retrieve one page of expenses for the currently logged-in user, newest first.
+    """
+    media_type = preferred_media_type(request)
+    etag = make_etag(request, current_user.id, await db.run_sync(get_data_version, current_user.id), media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    expenses, next_cursor = await db.run_sync(
+        expense_service.list_expenses_page, current_user.id, filters, after, limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return Response(dump_expense_rows(expenses, media_type), media_type=media_type, headers=response.headers)
+
+# ------------------------------
+# GET /expenses/export - stream full history
+# ------------------------------
+@router.get("/export")
+async def export_expenses(
+    request: Request,
+    export_format: Optional[Literal["ndjson", "csv", "msgpack"]] = Query(None, alias="format"),
+    filters: ExpenseFilters = Depends(),
+    primary: bool = Depends(use_primary),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Stream every expense of the currently logged-in user as NDJSON, CSV or MessagePack.
+    """
+    if export_format is None:
+        export_format = "msgpack" if preferred_media_type(request) == MSGPACK_MEDIA_TYPE else "ndjson"
+    return StreamingResponse(
+        aiter_export(current_user.id, export_format, filters, async_read_sessionmaker(primary)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="expenses.{export_format}"'},
+    )
+
+# ------------------------------
+# GET /expenses/summary - aggregated totals
+# ------------------------------
+@router.get("/summary", response_model=ExpenseSummary)
+async def expense_summary(
+    request: Request,
+    response: Response,
+    group_by: Literal["category", "day", "week", "month"] = Query("category"),
+    extremes: bool = Query(True, description="Include per-group min/max; set to false to read from the daily rollups"),
+    filters: ExpenseFilters = Depends(),
+    cached: CachedResult = Depends(cached_result(get_current_user_async, get_read_db)),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Summarize the currently logged-in user's expenses by category or by day, week or month.
+    """
+    media_type = cached.media_type
+    etag = cached.etag if cached.hit else make_etag(request, current_user.id, cached.version, media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    if cached.hit:
+        return Response(cached.body, media_type=media_type, headers=response.headers)
+    summary = await db.run_sync(summarize_expenses, current_user.id, group_by, extremes, filters)
+    content = dump_expense_summary(summary, media_type)
+    cached.store(etag, content)
+    return Response(content, media_type=media_type, headers=response.headers)
+
+# ------------------------------
+# GET /expenses/changes - change feed
+# ------------------------------
+@router.get("/changes", response_model=ExpenseChanges)
+async def expense_changes(
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="Cursor returned by the previous call; omit it for a full snapshot"),
+    limit: int = Query(EXPENSE_CHANGES_DEFAULT_LIMIT, ge=1, le=EXPENSE_CHANGES_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Return the expenses created, updated or deleted since the given cursor, a page at a time.
+    """
+    media_type = preferred_media_type(request)
+    version = await db.run_sync(get_data_version, current_user.id)
+    etag = make_etag(request, current_user.id, version, media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    changes = await db.run_sync(expense_service.list_expense_changes, current_user.id, since, limit, version)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return Response(dump_expense_changes_msgpack(changes), media_type=MSGPACK_MEDIA_TYPE, headers=response.headers)
+    return changes
+
+# ------------------------------
+# GET /expenses/search - full-text and fuzzy search
+# ------------------------------
+@router.get("/search", response_model=List[ExpenseRead])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(EXPENSE_SEARCH_DEFAULT_LIMIT, ge=1, le=EXPENSE_PAGE_MAX_LIMIT),
+    filters: ExpenseFilters = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Search the currently logged-in user's expenses by description and category, best matches first.
+    """
+    expenses = await db.run_sync(search_expenses, current_user.id, q, filters, limit)
+    return Response(dump_expense_rows(expenses), media_type="application/json")
+
+# ------------------------------
+# POST /expenses/ - create expense
+# ------------------------------
+@router.post("/", response_model=ExpenseRead)
+async def create_expense(expense_in: ExpenseCreate, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Create a new expense entry for the currently logged-in user.
+    """
+    return await db.run_sync(expense_service.create_expense, current_user.id, expense_in)
+
+# ------------------------------
+# Batch endpoints - many expenses in one transaction
+# ------------------------------
+@router.post("/batch", response_model=List[ExpenseBatchResult])
+async def create_expenses_batch(items: List[ExpenseCreate], db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Create many expenses for the currently logged-in user in a single transaction.
+    """
+    return await db.run_sync(expense_service.create_expenses_batch, current_user.id, items)
+
+
+@router.put("/batch", response_model=List[ExpenseBatchResult])
+async def update_expenses_batch(items: List[ExpenseBatchUpdate], db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Update many expenses of the currently logged-in user in a single transaction.
+    """
+    return await db.run_sync(expense_service.update_expenses_batch, current_user.id, items)
+
+
+@router.post("/batch/delete", response_model=List[ExpenseBatchResult])
+async def delete_expenses_batch(payload: ExpenseBatchDelete, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Delete many expenses of the currently logged-in user in a single transaction.
+    """
+    return await db.run_sync(expense_service.delete_expenses_batch, current_user.id, payload.ids)
+
+# ------------------------------
+# POST /expenses/import - import a bank statement
+# ------------------------------
+@router.post("/import", response_model=ExpenseImportReport)
+async def import_statement(
+    file: UploadFile = File(..., description="A CSV or OFX/QFX bank statement"),
+    import_format: Optional[Literal["csv", "ofx"]] = Query(None, alias="format"),
+    options: ImportOptions = Depends(),
+    current_user = Depends(get_current_user_async),
+):
+    """
+    Import a bank statement as expenses of the currently logged-in user.
+    """
+    # Parsing a large statement is CPU-bound, so unlike the other handlers this one runs the
+    # service in a threadpool thread, on a session of the sync engine, to keep the event loop free
+    with SessionLocal() as db:
+        return await run_in_threadpool(
+            import_expenses, db, current_user.id, file.file, import_format or statement_format(file.filename), options
+        )
+
+# ------------------------------
+# PUT /expenses/{expense_id} - update expense
+# ------------------------------
+@router.put("/{expense_id}", response_model=ExpenseRead)
+async def update_expense(expense_id: int, expense_in: ExpenseCreate, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Update an existing expense record. Only allowed if the expense belongs to the current authenticated user.
+    """
+    return await db.run_sync(expense_service.update_expense, current_user.id, expense_id, expense_in)
+
+# ------------------------------
+# DELETE /expenses/{expense_id} - delete expense
+# ------------------------------
+@router.delete("/{expense_id}", status_code=204)
+async def delete_expense(expense_id: int, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    """
+    Delete an existing expense record. Only allowed if the expense belongs to the current authenticated user.
+    """
+    await db.run_sync(expense_service.delete_expense, current_user.id, expense_id)
+    return
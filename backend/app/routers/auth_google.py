@@ -1,23 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-import requests, os, jwt
+from jose import jwt
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
+from app.core.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, GOOGLE_AUTH_ENDPOINT, GOOGLE_CLIENT_ID, GOOGLE_REDIRECT_URI, SECRET_KEY,
+)
 from app.core.database import get_db
-from app.models.user import User
+from app.core.replicas import pin_to_primary
+from app.services.google_oauth import google_oauth
+from app.services.users import get_or_create_user
 
 # Create an instance of the FastAPI APIRouter
 router = APIRouter()
 
-# Load environment variables
-CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
-REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
-
 # Redirect to Google login page# Redirect to Google login page
 @router.get("/login")
 def login_google():
@@ -31,14 +29,13 @@ def login_google():
         RedirectResponse: A redirection to Google's OAuth2 login page.
     """
 
-    google_auth_endpoint = "https://accounts.google.com/o/oauth2/v2/auth"
     scope = "https://www.googleapis.com/auth/userinfo.email https://www.googleapis.com/auth/userinfo.profile"
-    auth_url = f"{google_auth_endpoint}?client_id={CLIENT_ID}&redirect_uri={REDIRECT_URI}&response_type=code&scope={scope}&access_type=offline&prompt=consent"
+    auth_url = f"{GOOGLE_AUTH_ENDPOINT}?client_id={GOOGLE_CLIENT_ID}&redirect_uri={GOOGLE_REDIRECT_URI}&response_type=code&scope={scope}&access_type=offline&prompt=consent"
     return RedirectResponse(auth_url)
 
 # Endpoint to handle the callback from Google after user authorization
 @router.get("/callback")
-def callback_google(request: Request, db: Session = Depends(get_db)):
+async def callback_google(request: Request, db: Session = Depends(get_db)):
     """
     Handles the callback from Google after user authentication and authorization.
 
@@ -46,6 +43,10 @@ def callback_google(request: Request, db: Session = Depends(get_db)):
     code. This code is then exchanged for tokens, the user's information is extracted, and a JWT token
     is issued for API access.
 
+    The calls to Google are awaited on a pooled async HTTP client, so a burst of logins does not hold
+    worker threads while Google answers. The id_token's signature is verified locally against Google's
+    cached signing keys; only the database work runs in the threadpool.
+
     Args:
         request (Request): The incoming request, containing query parameters from the redirect.
         db (Session): The SQLAlchemy database session used to interact with the database.
@@ -54,41 +55,26 @@ def callback_google(request: Request, db: Session = Depends(get_db)):
         RedirectResponse: A redirection to the desktop app with the generated JWT token as a query parameter.
     
     Raises:
-        HTTPException: If no authorization code is found or if there is an issue obtaining the id_token from Google.
+        HTTPException: If no authorization code is found, if there is an issue obtaining the id_token from Google,
+                       or if the id_token fails verification.
     """
     code = request.query_params.get("code") # Extract the authorization code from the query parameters
     if not code:
         raise HTTPException(status_code=400, detail="No code returned from Google")
 
     # Exchange the authorization code for tokens
-    token_url = "https://oauth2.googleapis.com/token"
-    data = {
-        "code": code,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "redirect_uri": REDIRECT_URI,
-        "grant_type": "authorization_code"
-    }
-
-    # Make a POST request to the Google token endpoint to exchange the authorization code for tokens
-    token_resp = requests.post(token_url, data=data).json()
-    id_token = token_resp.get("id_token")
-
-    if not id_token:
-        raise HTTPException(status_code=400, detail="Failed to get id_token from Google")
+    tokens = await google_oauth.exchange_code(code)
 
-    # Decode the JWT id_token to extract the user’s information
-    payload = jwt.decode(id_token, options={"verify_signature": False})
+    # Verify the id_token and extract the user’s information
+    payload = await google_oauth.verify_id_token(tokens["id_token"], tokens.get("access_token"))
     email = payload.get("email")
     name = payload.get("name")
+    if not email or payload.get("email_verified") is False:
+        raise HTTPException(status_code=400, detail="Google account has no verified email address")
 
-    # Check DB for user, create if not exists
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        user = User(email=email, full_name=name)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    # Check DB for user, create if not exists; keep the user's reads on the primary until replicas catch up
+    user = await run_in_threadpool(get_or_create_user, db, email, name)
+    await pin_to_primary(user.id)
 
     # Issue JWT token for our API
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
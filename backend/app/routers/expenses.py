@@ -1,36 +1,296 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.models.expense import Expense as ExpenseModel
-from app.schemas import ExpenseCreate, ExpenseRead
+from typing import List, Literal, Optional
+from app.schemas import (
+    ExpenseBatchDelete, ExpenseBatchResult, ExpenseBatchUpdate, ExpenseChanges, ExpenseCreate, ExpenseImportReport,
+    ExpenseRead, ExpenseSummary,
+)
+from app.core.config import (
+    EXPENSE_CHANGES_DEFAULT_LIMIT, EXPENSE_CHANGES_MAX_LIMIT, EXPENSE_PAGE_DEFAULT_LIMIT, EXPENSE_PAGE_MAX_LIMIT,
+    EXPENSE_SEARCH_DEFAULT_LIMIT,
+)
+from app.core.database import read_sessionmaker
 from app.core.deps import get_db
+from app.core.etag import ETAG_CACHE_CONTROL, ETAG_VARY, is_not_modified, make_etag, not_modified_response
+from app.core.filters import ExpenseFilters
+from app.core.rate_limit import rate_limiter
+from app.core.replicas import read_db, read_routing
+from app.core.result_cache import CachedResult, cached_result
+from app.core.serialization import (
+    MSGPACK_MEDIA_TYPE, dump_expense_changes_msgpack, dump_expense_rows, dump_expense_summary, preferred_media_type,
+)
 from app.core.security import get_current_user
+from app.services import expenses as expense_service
+from app.services.export import EXPORT_MEDIA_TYPES, iter_export
+from app.services.imports import ImportOptions, import_expenses, statement_format
+from app.services.search import search_expenses
+from app.services.summary import expense_summary as summarize_expenses
+from app.services.users import get_data_version
 
-# Create an instance of the FastAPI APIRouter
-router = APIRouter()
+# Create an instance of the FastAPI APIRouter. Every endpoint first draws a token from the
+# current user's read or write bucket (see app/core/rate_limit.py). Writes then pin the user to
+# the primary for a few seconds, and the read-only endpoints read from a replica unless the user
+# is pinned (see app/core/replicas.py).
+use_primary = read_routing(get_current_user)
+get_read_db = read_db(use_primary)
+router = APIRouter(dependencies=[Depends(rate_limiter(get_current_user)), Depends(use_primary)])
 
 # ------------------------------
 # GET /expenses/ - list expenses
 # ------------------------------
 @router.get("/", response_model=List[ExpenseRead])
-def list_expenses(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def list_expenses(
+    request: Request,
+    response: Response,
+    after: Optional[str] = Query(None, description="Opaque cursor returned in the X-Next-Cursor header of the previous page"),
+    limit: int = Query(EXPENSE_PAGE_DEFAULT_LIMIT, ge=1, le=EXPENSE_PAGE_MAX_LIMIT),
+    filters: ExpenseFilters = Depends(),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+):
     """
-    Retrieve a list of all expenses for the currently logged-in user.
+    Retrieve one page of expenses for the currently logged-in user, newest first.
+
+    Expenses are ordered by (date, id) descending, which is a stable order even when several
+    expenses share a timestamp. Pages are addressed with keyset pagination: when more rows exist,
+    the response carries an `X-Next-Cursor` header whose value is passed back as `after` to get
+    the next page. Each page is a range scan over the (user_id, date, id) index, so its cost does
+    not grow with the size of the user's history. Rows are read as plain column tuples and
+    encoded straight to JSON, skipping ORM instances and per-row schema validation; the body
+    is identical to rendering them through `ExpenseRead`. Clients sending
+    `Accept: application/msgpack` get the same array encoded as MessagePack.
+
+    The response carries an `ETag` derived from the user's data version and the query. A request
+    whose `If-None-Match` still matches gets an empty 304 response without the page being loaded.
 
-    This endpoint fetches all expenses associated with the current user's ID.
-    
     Args:
+        request (Request): The incoming request, whose query and `Accept` and `If-None-Match` headers select
+            the format and the ETag.
+        response (Response): The outgoing response, used to attach the `ETag` and `X-Next-Cursor` headers.
+        after (Optional[str]): Cursor of the previous page; omit it to start from the newest expense.
+        limit (int): Maximum number of expenses to return.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters.
         db (Session): The database session, injected by FastAPI's `Depends` mechanism.
         current_user (User): The currently authenticated user, fetched using the `get_current_user` dependency.
 
     Returns:
-        List[ExpenseRead]: A list of `ExpenseRead` schemas representing the user's expenses.
-    
+        List[ExpenseRead]: A list of `ExpenseRead` schemas representing the user's expenses,
+        or an empty 304 response if the client's copy is current.
+
+    Raises:
+        HTTPException: If the current user is not authenticated, or a 400 error if `after` is not a valid cursor.
+    """
+    media_type = preferred_media_type(request)
+    etag = make_etag(request, current_user.id, get_data_version(db, current_user.id), media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    expenses, next_cursor = expense_service.list_expenses_page(db, current_user.id, filters, after, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return Response(dump_expense_rows(expenses, media_type), media_type=media_type, headers=response.headers)
+
+# ------------------------------
+# GET /expenses/export - stream full history
+# ------------------------------
+@router.get("/export")
+def export_expenses(
+    request: Request,
+    export_format: Optional[Literal["ndjson", "csv", "msgpack"]] = Query(None, alias="format"),
+    filters: ExpenseFilters = Depends(),
+    primary: bool = Depends(use_primary),
+    current_user = Depends(get_current_user),
+):
+    """
+    Stream every expense of the currently logged-in user as NDJSON, CSV or MessagePack.
+
+    Rows are read through a server-side cursor and written to the client batch by batch, so
+    memory use stays flat however long the user's history is, and the first bytes are sent
+    before the query has finished. Rows are ordered oldest first.
+
+    Args:
+        request (Request): The incoming request, whose `Accept` header picks the format when `format` is omitted.
+        export_format (Optional[str]): "ndjson" (one JSON object per line), "csv" or "msgpack" (a stream
+            of MessagePack maps), passed as `format`. Defaults to "msgpack" for clients that accept
+            `application/msgpack`, and to "ndjson" otherwise.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters.
+        primary (bool): Whether the export reads from the primary rather than a replica.
+        current_user (User): The currently authenticated user, fetched using the `get_current_user` dependency.
+
+    Returns:
+        StreamingResponse: The export, sent as an attachment.
+
     Raises:
         HTTPException: If the current user is not authenticated, the exception will be triggered.
     """
-    expenses = db.query(ExpenseModel).filter(ExpenseModel.user_id == current_user.id).all()
-    return expenses
+    if export_format is None:
+        export_format = "msgpack" if preferred_media_type(request) == MSGPACK_MEDIA_TYPE else "ndjson"
+    return StreamingResponse(
+        iter_export(current_user.id, export_format, filters, read_sessionmaker(primary)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="expenses.{export_format}"'},
+    )
+
+# ------------------------------
+# GET /expenses/summary - aggregated totals
+# ------------------------------
+@router.get("/summary", response_model=ExpenseSummary)
+def expense_summary(
+    request: Request,
+    response: Response,
+    group_by: Literal["category", "day", "week", "month"] = Query("category"),
+    extremes: bool = Query(True, description="Include per-group min/max; set to false to read from the daily rollups"),
+    filters: ExpenseFilters = Depends(),
+    cached: CachedResult = Depends(cached_result(get_current_user, get_read_db)),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Summarize the currently logged-in user's expenses by category or by day, week or month.
+
+    The totals, counts and extremes are computed by the database with a single GROUP BY query,
+    so the response holds one small entry per group instead of every expense. When `extremes`
+    is false and the filters line up with whole UTC days, totals are read from the per-day
+    rollup table instead, so the cost depends on the number of days and categories rather
+    than on the number of expenses.
+
+    Like the listing, the response carries an `ETag` and is answered with 304 when the client's
+    copy is current. Clients that ask for MessagePack get the summary encoded as MessagePack.
+
+    Encoded summaries are kept in the result cache, keyed by the user, the query and the user's
+    data version, which every write bumps. A repeated request is answered from the cache (or with
+    304) after reading only that version, with a primary-key lookup.
+
+    Args:
+        request (Request): The incoming request, whose query and `Accept` and `If-None-Match` headers select
+            the format and the ETag.
+        response (Response): The outgoing response, used to attach the `ETag` header.
+        group_by (str): "category", "day", "week" or "month". Weeks start on Monday.
+        extremes (bool): Whether to compute per-group `min`/`max`, which needs the expenses table.
+        filters (ExpenseFilters): Optional filters; `date_from`/`date_to` bound the summarized period.
+        cached (CachedResult): The result cache's entry for this request.
+        db (Session): The database session, injected by FastAPI's `Depends` mechanism.
+        current_user (User): The currently authenticated user, fetched using the `get_current_user` dependency.
+
+    Returns:
+        ExpenseSummary: The per-group aggregates and the overall total and count, or an empty
+        304 response if the client's copy is current.
+
+    Raises:
+        HTTPException: If the current user is not authenticated, the exception will be triggered.
+    """
+    media_type = cached.media_type
+    etag = cached.etag if cached.hit else make_etag(request, current_user.id, cached.version, media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    if cached.hit:
+        return Response(cached.body, media_type=media_type, headers=response.headers)
+    summary = summarize_expenses(db, current_user.id, group_by, extremes, filters)
+    content = dump_expense_summary(summary, media_type)
+    cached.store(etag, content)
+    return Response(content, media_type=media_type, headers=response.headers)
+
+# ------------------------------
+# GET /expenses/changes - change feed
+# ------------------------------
+@router.get("/changes", response_model=ExpenseChanges)
+def expense_changes(
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="Cursor returned by the previous call; omit it for a full snapshot"),
+    limit: int = Query(EXPENSE_CHANGES_DEFAULT_LIMIT, ge=1, le=EXPENSE_CHANGES_MAX_LIMIT),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Return the expenses created, updated or deleted since the given cursor.
+
+    Every write stamps the rows it touches, and tombstones of the rows it deletes, with the
+    user's new data version. A client that keeps the returned `cursor` and passes it back as
+    `since` therefore receives only what changed in between, so keeping a local copy current
+    costs in proportion to the number of changes rather than to the size of the history.
+    Without `since` the response starts a full snapshot of the user's expenses.
+
+    Responses hold at most `limit` changes and deletions. While `has_more` is set, the client
+    calls again at once with the new cursor; once it is clear, the client is in sync. Clients
+    should drop the `deleted` IDs before applying `changes`. The response is encoded as
+    MessagePack for clients that ask for it, and carries an `ETag` like the listing does, so
+    polling with an unchanged cursor is answered with an empty 304 response.
+
+    Args:
+        request (Request): The incoming request, whose `Accept` and `If-None-Match` headers select
+            the format and the ETag.
+        response (Response): The outgoing response, used to attach the `ETag` header.
+        since (Optional[str]): Cursor returned by the previous call.
+        limit (int): Maximum number of changes and deletions to return.
+        db (Session): The database session, injected by FastAPI's `Depends` mechanism.
+        current_user (User): The currently authenticated user, fetched using the `get_current_user` dependency.
+
+    Returns:
+        ExpenseChanges: The changed expenses, the IDs of deleted expenses and the next cursor,
+        or an empty 304 response if the client's copy is current.
+
+    Raises:
+        HTTPException: If the current user is not authenticated, or a 400 error if `since` is not a valid cursor.
+    """
+    media_type = preferred_media_type(request)
+    version = get_data_version(db, current_user.id)
+    etag = make_etag(request, current_user.id, version, media_type)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    response.headers["Vary"] = ETAG_VARY
+
+    changes = expense_service.list_expense_changes(db, current_user.id, since, limit, version)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return Response(dump_expense_changes_msgpack(changes), media_type=MSGPACK_MEDIA_TYPE, headers=response.headers)
+    return changes
+
+# ------------------------------
+# GET /expenses/search - full-text and fuzzy search
+# ------------------------------
+@router.get("/search", response_model=List[ExpenseRead])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(EXPENSE_SEARCH_DEFAULT_LIMIT, ge=1, le=EXPENSE_PAGE_MAX_LIMIT),
+    filters: ExpenseFilters = Depends(),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Search the currently logged-in user's expenses by description and category, best matches first.
+
+    On PostgreSQL a description matches the query as full text (stemmed words, "quoted phrases"
+    and -exclusions), and the query also matches descriptions and categories by trigram word
+    similarity, which tolerates typos and finds prefixes. GIN indexes cover all of these, so
+    a search does not scan the user's history. Results are ranked by the best of the full-text
+    rank and the similarities. On other databases every word of the query must appear in the
+    description or category.
+
+    Args:
+        q (str): The search text.
+        limit (int): Maximum number of results.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters, applied on top of the search.
+        db (Session): The database session, injected by FastAPI's `Depends` mechanism.
+        current_user (User): The currently authenticated user, fetched using the `get_current_user` dependency.
+
+    Returns:
+        List[ExpenseRead]: The matching expenses, most relevant first, newest first among equals.
+
+    Raises:
+        HTTPException: If the current user is not authenticated, the exception will be triggered.
+    """
+    expenses = search_expenses(db, current_user.id, q, filters, limit)
+    return Response(dump_expense_rows(expenses), media_type="application/json")
 
 # ------------------------------
 # POST /expenses/ - create expense
@@ -54,17 +314,118 @@ def create_expense(expense_in: ExpenseCreate, db: Session = Depends(get_db), cur
     Raises:
         HTTPException: If the current user is not authenticated, an exception will be raised.
     """
-    expense = ExpenseModel(
-        user_id=current_user.id,
-        amount=expense_in.amount,
-        category=expense_in.category,
-        description=expense_in.description,
-        date=expense_in.date  # can be None → defaults to server timestamp
+    return expense_service.create_expense(db, current_user.id, expense_in)
+
+# ------------------------------
+# Batch endpoints - many expenses in one transaction
+# ------------------------------
+@router.post("/batch", response_model=List[ExpenseBatchResult])
+def create_expenses_batch(items: List[ExpenseCreate], db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Create many expenses for the currently logged-in user in a single transaction.
+
+    All rows are written with one multi-row INSERT ... RETURNING, so importing a month of
+    transactions costs one request and one commit instead of one of each per expense.
+    Items without a date are stamped with the current UTC time.
+
+    Args:
+        items (List[ExpenseCreate]): The expenses to create, at most `EXPENSE_BATCH_MAX_ITEMS`.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        List[ExpenseBatchResult]: One "created" result per item, in request order, with the new ID.
+
+    Raises:
+        HTTPException: A 413 error if the batch is too large, or a 401 error if the user is not authenticated.
+    """
+    return expense_service.create_expenses_batch(db, current_user.id, items)
+
+
+@router.put("/batch", response_model=List[ExpenseBatchResult])
+def update_expenses_batch(items: List[ExpenseBatchUpdate], db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Update many expenses of the currently logged-in user in a single transaction.
+
+    The current rows are loaded with one SELECT, restricted to the user's own expenses, and the
+    changes are written with one executemany UPDATE. Items naming an expense that does not exist
+    or belongs to someone else are reported as "not_found"; repeated IDs are reported as
+    "duplicate" and skipped. As with the single-item endpoint, an item without a date keeps
+    the expense's current date.
+
+    Args:
+        items (List[ExpenseBatchUpdate]): The new values, each with the ID of the expense to update.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        List[ExpenseBatchResult]: One result per item, in request order.
+
+    Raises:
+        HTTPException: A 413 error if the batch is too large, or a 401 error if the user is not authenticated.
+    """
+    return expense_service.update_expenses_batch(db, current_user.id, items)
+
+
+@router.post("/batch/delete", response_model=List[ExpenseBatchResult])
+def delete_expenses_batch(payload: ExpenseBatchDelete, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Delete many expenses of the currently logged-in user in a single transaction.
+
+    The rows are removed with one DELETE ... RETURNING restricted to the user's own expenses.
+    IDs that do not exist or belong to someone else are reported as "not_found", and repeated
+    IDs as "duplicate".
+
+    Args:
+        payload (ExpenseBatchDelete): The IDs of the expenses to delete.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        List[ExpenseBatchResult]: One result per requested ID, in request order.
+
+    Raises:
+        HTTPException: A 413 error if the batch is too large, or a 401 error if the user is not authenticated.
+    """
+    return expense_service.delete_expenses_batch(db, current_user.id, payload.ids)
+
+# ------------------------------
+# POST /expenses/import - import a bank statement
+# ------------------------------
+@router.post("/import", response_model=ExpenseImportReport)
+def import_statement(
+    file: UploadFile = File(..., description="A CSV or OFX/QFX bank statement"),
+    import_format: Optional[Literal["csv", "ofx"]] = Query(None, alias="format"),
+    options: ImportOptions = Depends(),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Import a bank statement as expenses of the currently logged-in user.
+
+    The file is parsed as a stream and loaded in large batches (COPY on PostgreSQL), all in one
+    transaction, so statements of any size import in bounded memory. Transactions imported
+    before, from this file or an overlapping one, are skipped rather than duplicated, and credits
+    (money coming in) are left out. Rows that cannot be read are reported by line (CSV) or
+    position (OFX) and the rest are imported.
+
+    Args:
+        file (UploadFile): The statement.
+        import_format (Optional[str]): "csv" or "ofx", passed as `format`. Defaults to "ofx" for
+            .ofx and .qfx files and to "csv" otherwise.
+        options (ImportOptions): The column mapping, date format, default category and amount sign.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        ExpenseImportReport: How many transactions were inserted, skipped as duplicates or credits, and rejected.
+
+    Raises:
+        HTTPException: A 400 error if the file is not a statement of that format, or a 401 error if the user is not authenticated.
+    """
+    return import_expenses(
+        db, current_user.id, file.file, import_format or statement_format(file.filename), options
     )
-    db.add(expense)
-    db.commit()
-    db.refresh(expense)
-    return expense
 
 # ------------------------------
 # PUT /expenses/{expense_id} - update expense
@@ -89,23 +450,7 @@ def update_expense(expense_id: int, expense_in: ExpenseCreate, db: Session = Dep
     Raises:
         HTTPException: If the expense is not found, or if it does not belong to the current user, a 404 error is raised.
     """
-    expense = db.query(ExpenseModel).filter(
-        ExpenseModel.id == expense_id,
-        ExpenseModel.user_id == current_user.id
-    ).first()
-
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
-
-    expense.amount = expense_in.amount
-    expense.category = expense_in.category
-    expense.description = expense_in.description
-    if expense_in.date:
-        expense.date = expense_in.date
-
-    db.commit()
-    db.refresh(expense)
-    return expense
+    return expense_service.update_expense(db, current_user.id, expense_id, expense_in)
 
 # ------------------------------
 # DELETE /expenses/{expense_id} - delete expense
@@ -129,14 +474,6 @@ def delete_expense(expense_id: int, db: Session = Depends(get_db), current_user
     Raises:
         HTTPException: If the expense is not found or does not belong to the current user, a 404 error is raised.
     """
-    expense = db.query(ExpenseModel).filter(
-        ExpenseModel.id == expense_id,
-        ExpenseModel.user_id == current_user.id
-    ).first()
-
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
-
-    db.delete(expense)
-    db.commit()
+    expense_service.delete_expense(db, current_user.id, expense_id)
     return
+
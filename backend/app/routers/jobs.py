@@ -0,0 +1,235 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from app.schemas import JobRead
+from app.core.deps import get_db
+from app.core.filters import ExpenseFilters
+from app.core.rate_limit import rate_limiter
+from app.core.security import get_current_user
+from app.services.export import EXPORT_MEDIA_TYPES
+from app.services.imports import ImportOptions, statement_format
+from app.services.jobs import (
+    cancel_job, enqueue_job, filter_params, get_job as load_job, job_output_path, list_jobs as load_jobs,
+    remove_spool_files, spool_upload,
+)
+
+# Create an instance of the FastAPI APIRouter. The job endpoints are served by this one router in
+# both the sync and the async configuration: they only queue work or read one small row, and
+# always read from the primary so that polling sees the runner's latest writes. Every endpoint
+# draws a token from the current user's read or write bucket (see app/core/rate_limit.py).
+router = APIRouter(dependencies=[Depends(rate_limiter(get_current_user))])
+
+
+def _queued(request: Request, response: Response, job) -> JobRead:
+    """
+    Point the 202 response of an enqueue endpoint at the job's status endpoint.
+    """
+    response.headers["Location"] = str(request.url_for("get_job", job_id=job.id))
+    return job
+
+# ------------------------------
+# GET /jobs/ - list jobs
+# ------------------------------
+@router.get("/", response_model=List[JobRead])
+def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Retrieve the currently logged-in user's most recent jobs, newest first.
+
+    Finished jobs are kept for JOB_RETENTION_SECONDS, then deleted with their files.
+
+    Args:
+        limit (int): Maximum number of jobs to return.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        List[JobRead]: The jobs.
+    """
+    return load_jobs(db, current_user.id, limit)
+
+# ------------------------------
+# GET /jobs/{job_id} - poll a job
+# ------------------------------
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(job_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Retrieve the status, progress and result of one of the currently logged-in user's jobs.
+
+    Progress is refreshed every JOB_HEARTBEAT_SECONDS while the job runs.
+
+    Args:
+        job_id (int): The ID of the job.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        JobRead: The job.
+
+    Raises:
+        HTTPException: A 404 error if the job does not exist or belongs to another user.
+    """
+    return load_job(db, current_user.id, job_id)
+
+# ------------------------------
+# GET /jobs/{job_id}/result - download an export
+# ------------------------------
+@router.get("/{job_id}/result")
+def download_job_result(job_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Download the file produced by one of the currently logged-in user's export jobs.
+
+    Args:
+        job_id (int): The ID of the export job.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        FileResponse: The export, sent as an attachment.
+
+    Raises:
+        HTTPException: A 404 error if the job is not the user's, is not a succeeded export, or its file has expired.
+    """
+    job = load_job(db, current_user.id, job_id)
+    export_format = job.params.get("format")
+    return FileResponse(
+        job_output_path(job), media_type=EXPORT_MEDIA_TYPES.get(export_format),
+        filename=f"expenses.{export_format}",
+    )
+
+# ------------------------------
+# POST /jobs/{job_id}/cancel - cancel a job
+# ------------------------------
+@router.post("/{job_id}/cancel", response_model=JobRead)
+def cancel(job_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Cancel one of the currently logged-in user's jobs.
+
+    A queued job is cancelled at once. A running job has `cancel_requested` set and stops, with
+    its uncommitted work rolled back, the next time it reports progress; poll it to see it
+    become "cancelled". A job that ends before then keeps its outcome.
+
+    Args:
+        job_id (int): The ID of the job.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        JobRead: The job after the request.
+
+    Raises:
+        HTTPException: A 404 error if the job is not the user's, or a 409 error if it has already finished.
+    """
+    return cancel_job(db, current_user.id, job_id)
+
+# ------------------------------
+# POST /jobs/import - import a bank statement in the background
+# ------------------------------
+@router.post("/import", response_model=JobRead, status_code=202)
+def queue_import(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(..., description="A CSV or OFX/QFX bank statement"),
+    import_format: Optional[Literal["csv", "ofx"]] = Query(None, alias="format"),
+    options: ImportOptions = Depends(),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Queue the import of a bank statement, like POST /expenses/import but in the background.
+
+    The upload is stored in JOB_SPOOL_DIR until the job has read it. The job's result is the
+    `ExpenseImportReport`; its progress is how far into the file the import is.
+
+    Args:
+        request (Request): The incoming request, used to build the `Location` header.
+        response (Response): The outgoing response, used to attach the `Location` header.
+        file (UploadFile): The statement.
+        import_format (Optional[str]): "csv" or "ofx", passed as `format`. Defaults to "ofx" for
+            .ofx and .qfx files and to "csv" otherwise.
+        options (ImportOptions): The column mapping, date format, default category and amount sign.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        JobRead: The queued job, with a `Location` header pointing at its status.
+
+    Raises:
+        HTTPException: A 429 error if the user has too many jobs in progress, or a 503 error if the queue is full.
+    """
+    upload = spool_upload(file.file)
+    params = {
+        "upload": upload,
+        "format": import_format or statement_format(file.filename),
+        "options": vars(options),
+    }
+    try:
+        job = enqueue_job(db, current_user.id, "import", params)
+    except HTTPException:
+        remove_spool_files(upload)
+        raise
+    return _queued(request, response, job)
+
+# ------------------------------
+# POST /jobs/export - export expenses to a file in the background
+# ------------------------------
+@router.post("/export", response_model=JobRead, status_code=202)
+def queue_export(
+    request: Request,
+    response: Response,
+    export_format: Literal["ndjson", "csv", "msgpack"] = Query("ndjson", alias="format"),
+    filters: ExpenseFilters = Depends(),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Queue an export of the currently logged-in user's expenses, like GET /expenses/export but
+    written to a file that is downloaded from GET /jobs/{id}/result once the job has succeeded.
+
+    Args:
+        request (Request): The incoming request, used to build the `Location` header.
+        response (Response): The outgoing response, used to attach the `Location` header.
+        export_format (str): "ndjson", "csv" or "msgpack", passed as `format`.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        JobRead: The queued job, with a `Location` header pointing at its status.
+
+    Raises:
+        HTTPException: A 429 error if the user has too many jobs in progress, or a 503 error if the queue is full.
+    """
+    params = {"format": export_format, "filters": filter_params(filters)}
+    return _queued(request, response, enqueue_job(db, current_user.id, "export", params))
+
+# ------------------------------
+# POST /jobs/rollups/rebuild - rebuild the daily rollups in the background
+# ------------------------------
+@router.post("/rollups/rebuild", response_model=JobRead, status_code=202)
+def queue_rollup_rebuild(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Queue a rebuild of the currently logged-in user's daily rollups from their expenses.
+
+    Args:
+        request (Request): The incoming request, used to build the `Location` header.
+        response (Response): The outgoing response, used to attach the `Location` header.
+        db (Session): The database session, injected via `Depends`.
+        current_user (User): The currently logged-in user, fetched from the `get_current_user` dependency.
+
+    Returns:
+        JobRead: The queued job, with a `Location` header pointing at its status.
+
+    Raises:
+        HTTPException: A 429 error if the user has too many jobs in progress, or a 503 error if the queue is full.
+    """
+    return _queued(request, response, enqueue_job(db, current_user.id, "rebuild_rollups", {}))
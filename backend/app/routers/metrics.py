@@ -0,0 +1,54 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.responses import PlainTextResponse
+from app.core.config import METRICS_TOKEN
+from app.core.metrics import Counter, REGISTRY
+from app.core.security import user_cache
+
+# Create an instance of the FastAPI APIRouter
+router = APIRouter()
+
+user_cache_lookups = Counter("user_cache_lookups_total", "Authenticated-user cache lookups, by outcome.", ["result"])
+user_cache_lookups.set_function(lambda: user_cache.hits, result="hit")
+user_cache_lookups.set_function(lambda: user_cache.misses, result="miss")
+
+metrics_bearer = HTTPBearer(auto_error=False)
+
+
+def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_bearer)):
+    """
+    Dependency that admits only scrapers sending METRICS_TOKEN as their bearer token, when it is set.
+
+    Raises:
+        HTTPException: A 401 error if the token is missing or wrong.
+    """
+    if METRICS_TOKEN is None:
+        return
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.get(
+    "/metrics", response_class=PlainTextResponse, include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+def metrics():
+    """
+    Expose the API's internal metrics in the Prometheus text format.
+
+    Covers the database connection pools (size, checked-out and overflow connections,
+    checkout latency histogram, timeouts), the authenticated-user cache, and per-route
+    request latency, status codes, in-flight requests and SQL statement counts and time,
+    the rate limiter's decisions, response compression, and whether read-only requests
+    were routed to the primary or a replica.
+
+    Returns:
+        PlainTextResponse: The metrics, in exposition format version 0.0.4.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,2 +1,6 @@
 
-from .expense import ExpenseCreate, ExpenseRead
+from .expense import (
+    ExpenseBatchDelete, ExpenseBatchResult, ExpenseBatchUpdate, ExpenseChanges, ExpenseCreate, ExpenseImportRejection,
+    ExpenseImportReport, ExpenseRead, ExpenseSummary, ExpenseSummaryBucket,
+)
+from .job import JobRead
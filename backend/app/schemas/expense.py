@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timezone
+from typing import List, Optional
 
 # ------------------------------
 # Base class for expense schemas
@@ -21,6 +21,7 @@ class ExpenseBase(BaseModel):
     category: str
     description: Optional[str] = None
     date: Optional[datetime] = None  # frontend 'date'
+
 class ExpenseCreate(ExpenseBase):
     """
     Schema for creating a new expense.
@@ -28,9 +29,21 @@ class ExpenseCreate(ExpenseBase):
     This schema inherits from `ExpenseBase` and is used for validating the data 
     that is sent when creating a new expense record via an API request.
 
-    No additional fields are required, and it utilizes the base fields for validation.
+    No additional fields are required, and it utilizes the base fields for validation. Dates are
+    converted to UTC on the way in only, so responses show them as the database returns them.
     """
-    pass
+
+    @field_validator("date")
+    @classmethod
+    def date_in_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """
+        Convert dates with a UTC offset to UTC; dates without one are taken to be in UTC already.
+
+        SQLite stores timestamps as text without their offset, so storing them in UTC keeps its
+        day arithmetic in agreement with the UTC days of the rollups.
+        """
+        return value.astimezone(timezone.utc) if value is not None and value.tzinfo is not None else value
+
 
 class ExpenseRead(ExpenseBase):
     """
@@ -55,3 +68,121 @@ class ExpenseRead(ExpenseBase):
         This enables the model to convert database records into Pydantic models.
         """
         orm_mode = True
+
+
+class ExpenseBatchUpdate(ExpenseCreate):
+    """
+    Schema for one item of a batch update.
+
+    Carries the same fields as `ExpenseCreate` plus the ID of the expense to overwrite.
+
+    Attributes:
+        id (int): The unique identifier of the expense to update.
+    """
+    id: int
+
+class ExpenseBatchDelete(BaseModel):
+    """
+    Schema for the body of a batch delete.
+
+    Attributes:
+        ids (List[int]): The IDs of the expenses to delete.
+    """
+    ids: List[int]
+
+class ExpenseBatchResult(BaseModel):
+    """
+    Outcome of one item of a batch create, update or delete.
+
+    Attributes:
+        index (int): Position of the item in the request body.
+        id (Optional[int]): The ID of the affected expense (None when no expense was affected).
+        status (str): "created", "updated", "deleted", "not_found" or "duplicate".
+    """
+    index: int
+    id: Optional[int] = None
+    status: str
+
+class ExpenseImportRejection(BaseModel):
+    """
+    A statement row that could not be imported.
+
+    Attributes:
+        row (int): The row's line number in a CSV file, or the transaction's position in an OFX file.
+        reason (str): Why the row was rejected.
+    """
+    row: int
+    reason: str
+
+class ExpenseImportReport(BaseModel):
+    """
+    Outcome of importing one bank statement.
+
+    Attributes:
+        format (str): The format the file was read as, "csv" or "ofx".
+        inserted (int): Number of transactions added as new expenses.
+        skipped (int): Number of transactions already imported before, which were left alone.
+        skipped_credits (int): Number of credits (money coming in), which are not expenses and
+            were left out.
+        rejected (int): Number of rows that could not be read as a transaction.
+        rejections (List[ExpenseImportRejection]): The first rejected rows and why, at most
+            `IMPORT_MAX_REJECTIONS` of them.
+    """
+    format: str
+    inserted: int
+    skipped: int
+    skipped_credits: int
+    rejected: int
+    rejections: List[ExpenseImportRejection]
+
+class ExpenseSummaryBucket(BaseModel):
+    """
+    Aggregates for one group of expenses in a summary.
+
+    Attributes:
+        key (str): The group this bucket covers: a category name, or the first day of the
+            day/week/month bucket as an ISO date (e.g. "2024-03-01").
+        total (float): Sum of the amounts in the group.
+        count (int): Number of expenses in the group.
+        min (Optional[float]): Smallest amount in the group, or None when extremes were not requested.
+        max (Optional[float]): Largest amount in the group, or None when extremes were not requested.
+    """
+    key: str
+    total: float
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class ExpenseSummary(BaseModel):
+    """
+    Schema for the response of the expense summary endpoint.
+
+    Attributes:
+        group_by (str): How the expenses were grouped: "category", "day", "week" or "month".
+        buckets (List[ExpenseSummaryBucket]): One entry per group. Time buckets are ordered
+            chronologically, categories by descending total.
+        total (float): Sum of all amounts covered by the summary.
+        count (int): Number of expenses covered by the summary.
+    """
+    group_by: str
+    buckets: List[ExpenseSummaryBucket]
+    total: float
+    count: int
+
+class ExpenseChanges(BaseModel):
+    """
+    Schema for the response of the expense change feed.
+
+    Clients apply `deleted` before `changes` and keep `cursor` for their next request, which
+    they make right away while `has_more` is set.
+
+    Attributes:
+        changes (List[ExpenseRead]): Expenses created or updated since the cursor, in write order.
+        deleted (List[int]): IDs of expenses deleted since the cursor.
+        cursor (str): Opaque token to pass as `since` to receive the changes after this response.
+        has_more (bool): Whether the page was full and more changes follow it.
+    """
+    changes: List[ExpenseRead]
+    deleted: List[int]
+    cursor: str
+    has_more: bool = False
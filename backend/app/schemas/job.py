@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class JobRead(BaseModel):
+    """
+    Schema for reading a background job's state.
+
+    Attributes:
+        id (int): The unique identifier of the job.
+        kind (str): What the job does: "import", "export" or "rebuild_rollups".
+        status (str): "queued", "running", "succeeded", "failed" or "cancelled".
+        progress (Optional[float]): The fraction of the work done, from 0 to 1, when the job can tell.
+        result (Optional[dict]): What the job produced, once it has succeeded (e.g. the import report).
+        error (Optional[str]): Why the job failed.
+        cancel_requested (bool): Whether cancellation was requested while the job was running.
+        created_at (Optional[datetime]): When the job was queued.
+        started_at (Optional[datetime]): When the job started running.
+        finished_at (Optional[datetime]): When the job finished.
+    """
+    id: int
+    kind: str
+    status: str
+    progress: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        """
+        Configuration for the schema's behavior.
+
+        `orm_mode` is set to `True` so the schema can be built from `Job` rows.
+        """
+        orm_mode = True
@@ -0,0 +1,59 @@
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.category import Category, category_display_name, category_key
+
+# Resolved categories: category key -> (category ID, display name)
+ResolvedCategories = Dict[str, Tuple[int, str]]
+
+
+def resolve_categories(db: Session, user_id: int, names: Iterable[str]) -> ResolvedCategories:
+    """
+    Look up the user's categories for the given names, creating the ones that do not exist yet.
+
+    Names are matched through `category_key`, so differently cased spellings resolve to the same
+    category; a new category is named after the first spelling given for it. Existing categories
+    cost one indexed SELECT, and the missing ones are added with one INSERT ... RETURNING.
+
+    Call this after `bump_data_version`, whose lock on the user's row keeps two transactions
+    from creating the same category at once.
+
+    Args:
+        db (Session): The session of the transaction writing the expenses.
+        user_id (int): The ID of the user who owns the categories.
+        names (Iterable[str]): Category names as sent by the client.
+
+    Returns:
+        ResolvedCategories: The ID and display name of every requested category, by key.
+    """
+    wanted = {}
+    for name in names:
+        wanted.setdefault(category_key(name), category_display_name(name))
+
+    resolved = {
+        row.key: (row.id, row.name)
+        for row in db.execute(
+            select(Category.id, Category.key, Category.name).where(
+                Category.user_id == user_id, Category.key.in_(wanted)
+            )
+        )
+    }
+    missing = [
+        {"user_id": user_id, "key": key, "name": name} for key, name in wanted.items() if key not in resolved
+    ]
+    if missing:
+        for row in db.execute(insert(Category).returning(Category.id, Category.key, Category.name), missing):
+            resolved[row.key] = (row.id, row.name)
+    return resolved
+
+
+def resolve_category(db: Session, user_id: int, name: str) -> Tuple[int, str]:
+    """
+    Single-name form of `resolve_categories`.
+
+    Returns:
+        Tuple[int, str]: The category's ID and display name.
+    """
+    return resolve_categories(db, user_id, [name])[category_key(name)]
@@ -0,0 +1,516 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Row, delete, insert, select, true, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import EXPENSE_BATCH_MAX_ITEMS
+from app.core.database import dialect_insert
+from app.core.filters import ExpenseFilters
+from app.core.pagination import decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor
+from app.models.category import Category, category_key
+from app.models.expense import Expense as ExpenseModel
+from app.models.expense_tombstone import ExpenseTombstone
+from app.schemas import ExpenseBatchUpdate, ExpenseCreate
+from app.services.categories import resolve_categories, resolve_category
+from app.services.rollups import add_expense_delta, apply_rollup_deltas, new_deltas
+from app.services.users import bump_data_version, get_data_version
+
+# The functions below hold the expense endpoints' database work. They take a synchronous
+# Session so the sync routers can call them directly and the async routers can run them
+# unchanged on an AsyncSession through `AsyncSession.run_sync`. Every write also updates the
+# daily rollups and bumps the user's data version in the same transaction; the new version is
+# stamped on the written rows (and on tombstones of deleted ones) as their change sequence.
+
+# The fields of the `ExpenseRead` response. Reads select just these columns, so responses are
+# built from plain rows instead of ORM instances. The category name comes from the categories
+# table; use `select_expense_rows` for the join.
+EXPENSE_READ_COLUMNS = (
+    ExpenseModel.id, ExpenseModel.amount, Category.name.label("category"), ExpenseModel.description, ExpenseModel.date,
+)
+
+# What writes return: the `ExpenseRead` fields of the expenses table itself. The writer already
+# knows the category name, having resolved it before the write.
+EXPENSE_WRITE_COLUMNS = (
+    ExpenseModel.id, ExpenseModel.amount, ExpenseModel.category_id, ExpenseModel.description, ExpenseModel.date,
+)
+
+
+def select_expense_rows():
+    """
+    Build a SELECT of the `EXPENSE_READ_COLUMNS`, joining each expense to its category.
+
+    Returns:
+        Select: A query over the expenses table to add conditions and ordering to.
+    """
+    return select(*EXPENSE_READ_COLUMNS).join_from(ExpenseModel, Category, ExpenseModel.category_id == Category.id)
+
+
+def list_expenses_page(
+    db: Session, user_id: int, filters: ExpenseFilters, after: Optional[str], limit: int
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Load one keyset-paginated page of a user's expenses, newest first.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose expenses are listed.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters.
+        after (Optional[str]): Cursor of the previous page, or None for the first page.
+        limit (int): Maximum number of expenses to return.
+
+    Returns:
+        Tuple[List[Row], Optional[str]]: The page, as rows with the `ExpenseRead` fields, and the
+        cursor of the next page (None on the last page).
+
+    Raises:
+        HTTPException: A 400 error if `after` is not a valid cursor.
+    """
+    query = filters.apply(select_expense_rows().where(ExpenseModel.user_id == user_id), user_id)
+
+    if after is not None:
+        after_date, after_id = decode_cursor(after)
+        # Row-value comparison, so the database seeks straight into the composite index. The
+        # redundant plain bound lets a date-partitioned table skip the partitions after the cursor.
+        query = query.filter(
+            tuple_(ExpenseModel.date, ExpenseModel.id) < (after_date, after_id), ExpenseModel.date <= after_date
+        )
+
+    # Fetch one extra row to learn whether another page exists without a separate COUNT query
+    expenses = db.execute(query.order_by(ExpenseModel.date.desc(), ExpenseModel.id.desc()).limit(limit + 1)).all()
+    if len(expenses) <= limit:
+        return expenses, None
+    expenses = expenses[:limit]
+    return expenses, encode_cursor(expenses[-1].date, expenses[-1].id)
+
+
+def list_expense_changes(
+    db: Session, user_id: int, since: Optional[str], limit: int, version: Optional[int] = None
+) -> dict:
+    """
+    Load one page of the expenses written and deleted since a change-feed cursor.
+
+    Changes and deletions are sent in the order they were written, by (change sequence, expense
+    ID), which a transaction never shares between a write and a deletion. A page holds at most
+    `limit` of them; when more remain, `has_more` is set and the cursor points just past the
+    last one sent, so a snapshot or a long absence is caught up in bounded pages. Each page
+    seeks into the (user_id, change_seq) indexes of both tables.
+
+    The upper bound is the data version read first: a write commits its rows together with the
+    version it bumped, so every change up to that version is visible and none is skipped by the
+    next request. An expense written again while the client pages moves to a later change
+    sequence and is sent again there.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose changes are listed.
+        since (Optional[str]): Cursor of the previous page or sync, or None to start a full snapshot.
+        limit (int): Maximum number of changes and deletions to return together.
+        version (Optional[int]): The user's data version, if the caller has just read it.
+
+    Returns:
+        dict: The changed expenses, the IDs of deleted ones, the new cursor and whether more
+        changes remain.
+
+    Raises:
+        HTTPException: A 400 error if `since` is not a valid cursor.
+    """
+    if version is None:
+        version = get_data_version(db, user_id)
+    if since is None:
+        # A snapshot holds every expense but none of the deletions that came before it
+        since_seq, since_id, floor = None, None, version
+    else:
+        since_seq, since_id, floor = decode_change_cursor(since)
+    result = {"changes": [], "deleted": [], "cursor": encode_change_cursor(version), "has_more": False}
+    if since_seq is not None and since_id is None and since_seq >= version:
+        return result
+
+    def after_cursor(change_seq, expense_id):
+        if since_seq is None:
+            return true()
+        if since_id is None:
+            return change_seq > since_seq
+        return tuple_(change_seq, expense_id) > (since_seq, since_id)
+
+    changes = db.execute(
+        select_expense_rows().add_columns(ExpenseModel.change_seq).where(
+            ExpenseModel.user_id == user_id,
+            ExpenseModel.change_seq <= version,
+            after_cursor(ExpenseModel.change_seq, ExpenseModel.id),
+        ).order_by(ExpenseModel.change_seq, ExpenseModel.id).limit(limit + 1)
+    ).all()
+    deletions = []
+    if floor is None or floor < version:
+        deleted_after = [ExpenseTombstone.change_seq > floor] if floor is not None else []
+        deletions = db.execute(
+            select(ExpenseTombstone.change_seq, ExpenseTombstone.expense_id.label("id")).where(
+                ExpenseTombstone.user_id == user_id,
+                ExpenseTombstone.change_seq <= version,
+                after_cursor(ExpenseTombstone.change_seq, ExpenseTombstone.expense_id),
+                *deleted_after,
+            ).order_by(ExpenseTombstone.change_seq, ExpenseTombstone.expense_id).limit(limit + 1)
+        ).all()
+
+    events = sorted(
+        [(row.change_seq, row.id, False, row) for row in changes]
+        + [(row.change_seq, row.id, True, row) for row in deletions],
+        key=lambda event: event[:3],
+    )
+    page = events[:limit]
+    result["changes"] = [row for _, _, deleted, row in page if not deleted]
+    result["deleted"] = [expense_id for _, expense_id, deleted, _ in page if deleted]
+    if len(events) > limit:
+        last_seq, last_id = page[-1][:2]
+        result["cursor"] = encode_change_cursor(last_seq, last_id, floor)
+        result["has_more"] = True
+    return result
+
+
+def _record_tombstones(db: Session, user_id: int, expense_ids: List[int], change_seq: int):
+    """
+    Upsert tombstones for deleted expenses so the change feed reports the deletions.
+    """
+    stmt = dialect_insert(db, ExpenseTombstone)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExpenseTombstone.user_id, ExpenseTombstone.expense_id],
+        set_={"change_seq": stmt.excluded.change_seq, "deleted_at": stmt.excluded.deleted_at},
+    )
+    now = datetime.now(timezone.utc)
+    db.execute(stmt, [
+        {"user_id": user_id, "expense_id": expense_id, "change_seq": change_seq, "deleted_at": now}
+        for expense_id in expense_ids
+    ])
+
+
+def create_expense(db: Session, user_id: int, expense_in: ExpenseCreate) -> dict:
+    """
+    Insert one expense and update the rollups in the same transaction.
+
+    The category is resolved to its ID first (and created if it is new). The row comes back from
+    the INSERT's RETURNING clause, so no SELECT follows the insert.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expense.
+        expense_in (ExpenseCreate): The validated expense data.
+
+    Returns:
+        dict: The created expense, with the `ExpenseRead` fields.
+    """
+    change_seq = bump_data_version(db, user_id)
+    category_id, category = resolve_category(db, user_id, expense_in.category)
+    values = {
+        "user_id": user_id,
+        "amount": expense_in.amount,
+        "category_id": category_id,
+        "description": expense_in.description,
+        # Set here rather than by the server default, which SQLite stores without microseconds:
+        # keyset cursors only compare equal to dates stored in the same form as they are bound
+        "date": expense_in.date or datetime.now(timezone.utc),
+        "change_seq": change_seq,
+    }
+    expense = db.execute(insert(ExpenseModel).values(**values).returning(*EXPENSE_WRITE_COLUMNS)).one()
+
+    deltas = new_deltas()
+    add_expense_delta(deltas, expense.date, expense.category_id, expense.amount, 1)
+    apply_rollup_deltas(db, user_id, deltas)
+
+    db.commit()
+    return {**expense._mapping, "category": category}
+
+
+def _update_owned_expense(db: Session, user_id: int, expense_id: int, values: dict) -> Optional[dict]:
+    """
+    Apply `values` to one of the user's expenses, returning its new and previous state.
+
+    On PostgreSQL this is a single UPDATE ... FROM that joins the row's previous values and
+    returns them next to the new ones. SQLite's RETURNING can only see the updated table, so
+    there the previous values are read first. Either way the read cannot race another write,
+    because the caller already holds the lock on the user's row taken by `bump_data_version`.
+
+    Returns:
+        Optional[dict]: The `EXPENSE_WRITE_COLUMNS` plus `old_date`, `old_category_id` and
+        `old_amount`, or None if the expense does not exist or belongs to another user.
+    """
+    owned = (ExpenseModel.id == expense_id, ExpenseModel.user_id == user_id)
+    stmt = update(ExpenseModel).values(**values).execution_options(synchronize_session=False)
+
+    if db.get_bind().dialect.name == "postgresql":
+        old = select(ExpenseModel.id, ExpenseModel.date, ExpenseModel.category_id, ExpenseModel.amount).where(
+            *owned
+        ).subquery()
+        row = db.execute(
+            stmt.where(ExpenseModel.id == old.c.id).returning(
+                *EXPENSE_WRITE_COLUMNS,
+                old.c.date.label("old_date"),
+                old.c.category_id.label("old_category_id"),
+                old.c.amount.label("old_amount"),
+            )
+        ).first()
+        return dict(row._mapping) if row else None
+
+    old = db.execute(
+        select(ExpenseModel.date, ExpenseModel.category_id, ExpenseModel.amount).where(*owned)
+    ).first()
+    if old is None:
+        return None
+    new = db.execute(stmt.where(*owned).returning(*EXPENSE_WRITE_COLUMNS)).one()
+    return {**new._mapping, "old_date": old.date, "old_category_id": old.category_id, "old_amount": old.amount}
+
+
+def update_expense(db: Session, user_id: int, expense_id: int, expense_in: ExpenseCreate) -> dict:
+    """
+    Overwrite one of the user's expenses and move its rollup contribution accordingly.
+
+    Ownership is enforced in the UPDATE's WHERE clause and the response comes from its
+    RETURNING clause, so the expense is neither loaded beforehand nor refreshed afterwards.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expense.
+        expense_id (int): The ID of the expense to update.
+        expense_in (ExpenseCreate): The new values; a missing date keeps the current one.
+
+    Returns:
+        dict: The updated expense, with the `ExpenseRead` fields.
+
+    Raises:
+        HTTPException: A 404 error if the expense does not exist or belongs to another user.
+    """
+    change_seq = bump_data_version(db, user_id)
+    category_id, category = resolve_category(db, user_id, expense_in.category)
+    values = {
+        "amount": expense_in.amount,
+        "category_id": category_id,
+        "description": expense_in.description,
+        "change_seq": change_seq,
+    }
+    if expense_in.date:
+        values["date"] = expense_in.date
+
+    result = _update_owned_expense(db, user_id, expense_id, values)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Expense not found")
+
+    deltas = new_deltas()
+    add_expense_delta(deltas, result["old_date"], result["old_category_id"], result["old_amount"], -1)
+    add_expense_delta(deltas, result["date"], result["category_id"], result["amount"], 1)
+    apply_rollup_deltas(db, user_id, deltas)
+
+    db.commit()
+    return {**result, "category": category}
+
+
+def delete_expense(db: Session, user_id: int, expense_id: int):
+    """
+    Delete one of the user's expenses and remove it from the rollups.
+
+    A single DELETE ... RETURNING both enforces ownership and yields the values the rollups
+    need.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expense.
+        expense_id (int): The ID of the expense to delete.
+
+    Raises:
+        HTTPException: A 404 error if the expense does not exist or belongs to another user.
+    """
+    # Lock the user's row first, like every other write: writes that took the expense and rollup
+    # rows before it could deadlock with a create or update waiting on them while holding it
+    change_seq = bump_data_version(db, user_id)
+    expense = db.execute(
+        delete(ExpenseModel)
+        .where(ExpenseModel.id == expense_id, ExpenseModel.user_id == user_id)
+        .returning(ExpenseModel.date, ExpenseModel.category_id, ExpenseModel.amount)
+    ).first()
+    if expense is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Expense not found")
+
+    deltas = new_deltas()
+    add_expense_delta(deltas, expense.date, expense.category_id, expense.amount, -1)
+    apply_rollup_deltas(db, user_id, deltas)
+    _record_tombstones(db, user_id, [expense_id], change_seq)
+
+    db.commit()
+
+
+def check_batch_size(size: int):
+    """
+    Reject batches larger than `EXPENSE_BATCH_MAX_ITEMS` with a 413 error.
+    """
+    if size > EXPENSE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {EXPENSE_BATCH_MAX_ITEMS} items")
+
+
+def create_expenses_batch(db: Session, user_id: int, items: List[ExpenseCreate]) -> List[dict]:
+    """
+    Insert many expenses with one multi-row INSERT ... RETURNING in a single transaction.
+
+    Items without a date are stamped with the current UTC time.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expenses.
+        items (List[ExpenseCreate]): The validated expenses.
+
+    Returns:
+        List[dict]: One "created" result per item, in request order, with the new ID.
+    """
+    check_batch_size(len(items))
+    if not items:
+        return []
+
+    now = datetime.now(timezone.utc)
+    change_seq = bump_data_version(db, user_id)
+    categories = resolve_categories(db, user_id, (item.category for item in items))
+    rows = [
+        {
+            "user_id": user_id,
+            "amount": item.amount,
+            "category_id": categories[category_key(item.category)][0],
+            "description": item.description,
+            "date": item.date or now,
+            "change_seq": change_seq,
+        }
+        for item in items
+    ]
+    created = db.execute(
+        insert(ExpenseModel).returning(ExpenseModel.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+
+    deltas = new_deltas()
+    for row in rows:
+        add_expense_delta(deltas, row["date"], row["category_id"], row["amount"], 1)
+    apply_rollup_deltas(db, user_id, deltas)
+
+    db.commit()
+    return [{"index": i, "id": expense_id, "status": "created"} for i, expense_id in enumerate(created)]
+
+
+def update_expenses_batch(db: Session, user_id: int, items: List[ExpenseBatchUpdate]) -> List[dict]:
+    """
+    Update many of the user's expenses with one SELECT ... FOR UPDATE and one executemany UPDATE.
+
+    Items naming an expense that does not exist or belongs to someone else are reported as
+    "not_found"; repeated IDs are reported as "duplicate" and skipped. An item without a date
+    keeps the expense's current date.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expenses.
+        items (List[ExpenseBatchUpdate]): The new values, each with the ID of the expense to update.
+
+    Returns:
+        List[dict]: One result per item, in request order.
+    """
+    check_batch_size(len(items))
+    if not items:
+        return []
+
+    # Lock the user's row before reading the old values, as `update_expense` does, so a concurrent
+    # batch cannot compute its rollup deltas from the same values; the rows are locked as well
+    change_seq = bump_data_version(db, user_id)
+    existing = {
+        row.id: row
+        for row in db.execute(
+            select(ExpenseModel.id, ExpenseModel.date, ExpenseModel.category_id, ExpenseModel.amount).where(
+                ExpenseModel.user_id == user_id,
+                ExpenseModel.id.in_({item.id for item in items}),
+            ).with_for_update()
+        )
+    }
+
+    results, changes, seen = [], [], set()
+    deltas = new_deltas()
+    for i, item in enumerate(items):
+        old = existing.get(item.id)
+        if old is None:
+            results.append({"index": i, "id": item.id, "status": "not_found"})
+            continue
+        if item.id in seen:
+            results.append({"index": i, "id": item.id, "status": "duplicate"})
+            continue
+        seen.add(item.id)
+
+        new_date = item.date or old.date
+        changes.append({
+            "id": item.id,
+            "amount": item.amount,
+            "category": item.category,
+            "description": item.description,
+            "date": new_date,
+            "old": old,
+        })
+        results.append({"index": i, "id": item.id, "status": "updated"})
+
+    if not changes:
+        # Nothing to write: release the lock without bumping the data version
+        db.rollback()
+        return results
+
+    categories = resolve_categories(db, user_id, (change["category"] for change in changes))
+    for change in changes:
+        old = change.pop("old")
+        change["category_id"] = categories[category_key(change.pop("category"))][0]
+        change["change_seq"] = change_seq
+        add_expense_delta(deltas, old.date, old.category_id, old.amount, -1)
+        add_expense_delta(deltas, change["date"], change["category_id"], change["amount"], 1)
+    # ORM bulk UPDATE by primary key: a single executemany statement for all rows
+    db.execute(update(ExpenseModel), changes)
+    apply_rollup_deltas(db, user_id, deltas)
+    db.commit()
+    return results
+
+
+def delete_expenses_batch(db: Session, user_id: int, ids: List[int]) -> List[dict]:
+    """
+    Delete many of the user's expenses with one DELETE ... RETURNING.
+
+    IDs that do not exist or belong to someone else are reported as "not_found", and repeated
+    IDs as "duplicate".
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the expenses.
+        ids (List[int]): The IDs of the expenses to delete.
+
+    Returns:
+        List[dict]: One result per requested ID, in request order.
+    """
+    check_batch_size(len(ids))
+    if not ids:
+        return []
+
+    # Lock the user's row first, like every other write: writes that took the expense and rollup
+    # rows before it could deadlock with a create or update waiting on them while holding it
+    change_seq = bump_data_version(db, user_id)
+    removed = db.execute(
+        delete(ExpenseModel)
+        .where(ExpenseModel.user_id == user_id, ExpenseModel.id.in_(set(ids)))
+        .returning(ExpenseModel.id, ExpenseModel.date, ExpenseModel.category_id, ExpenseModel.amount)
+    ).all()
+
+    if removed:
+        deltas = new_deltas()
+        for row in removed:
+            add_expense_delta(deltas, row.date, row.category_id, row.amount, -1)
+        apply_rollup_deltas(db, user_id, deltas)
+        _record_tombstones(db, user_id, [row.id for row in removed], change_seq)
+        db.commit()
+    else:
+        # Nothing was deleted; leave the data version alone
+        db.rollback()
+
+    deleted_ids, seen, results = {row.id for row in removed}, set(), []
+    for i, expense_id in enumerate(ids):
+        if expense_id in seen:
+            status = "duplicate"
+        else:
+            status = "deleted" if expense_id in deleted_ids else "not_found"
+        seen.add(expense_id)
+        results.append({"index": i, "id": expense_id, "status": status})
+    return results
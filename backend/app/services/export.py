@@ -0,0 +1,121 @@
+import csv
+import io
+from typing import AsyncIterator, Callable, Iterator, Optional, Union
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import EXPORT_BATCH_SIZE
+from app.core.database import SessionLocal
+from app.core.filters import ExpenseFilters
+from app.core.serialization import MSGPACK_MEDIA_TYPE, dump_expense_lines, dump_expense_msgpack_stream
+from app.models.expense import Expense as ExpenseModel
+from app.services.expenses import select_expense_rows
+
+# Export formats and the media type each one is served with
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+CSV_COLUMNS = ["id", "date", "category", "description", "amount"]
+
+
+def _export_statement(user_id: int, filters: ExpenseFilters):
+    """
+    Build the query that reads a user's expenses, oldest first, as plain rows.
+
+    Args:
+        user_id (int): The ID of the user whose expenses are exported.
+        filters (ExpenseFilters): The filters selected on the export request.
+
+    Returns:
+        Select: Rows with the `ExpenseRead` fields, fetched `EXPORT_BATCH_SIZE` at a time.
+    """
+    stmt = filters.apply(
+        select_expense_rows().where(ExpenseModel.user_id == user_id), user_id
+    ).order_by(ExpenseModel.date, ExpenseModel.id)
+    # yield_per turns on stream_results, so rows are pulled from the database as they
+    # are written out instead of being buffered in full first
+    return stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _csv_chunk(batch) -> str:
+    """
+    Encode a batch of export rows as CSV lines in `CSV_COLUMNS` order.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (row.id, row.date.isoformat() if row.date else "", row.category, row.description or "", row.amount)
+        for row in batch
+    )
+    return buffer.getvalue()
+
+
+# format -> (text sent before the first row, function encoding one batch of rows)
+_ENCODERS = {
+    # NDJSON lines are encoded exactly like the items of the listing endpoint
+    "ndjson": ("", dump_expense_lines),
+    "csv": (",".join(CSV_COLUMNS) + "\r\n", _csv_chunk),
+    # Concatenated MessagePack maps with the same keys as the NDJSON objects
+    "msgpack": ("", dump_expense_msgpack_stream),
+}
+
+
+def iter_export(
+    user_id: int, export_format: str, filters: ExpenseFilters, session_factory: sessionmaker = SessionLocal
+) -> Iterator[Union[str, bytes]]:
+    """
+    Stream the user's expenses from a server-side cursor, encoded batch by batch.
+
+    The session is opened here rather than taken from the request's `get_db` dependency,
+    because the response body is produced after the endpoint has returned and its
+    dependencies have been cleaned up.
+
+    Args:
+        user_id (int): The ID of the user whose expenses are exported.
+        export_format (str): "ndjson", "csv" or "msgpack".
+        filters (ExpenseFilters): The filters selected on the export request.
+        session_factory (sessionmaker): Opens the session to read from, e.g. a replica's.
+
+    Yields:
+        Union[str, bytes]: The format's header (if any), then one encoded chunk per fetched batch.
+    """
+    header, encode = _ENCODERS[export_format]
+    if header:
+        yield header
+
+    db = session_factory()
+    try:
+        for batch in db.execute(_export_statement(user_id, filters)).partitions():
+            yield encode(batch)
+    finally:
+        db.close()
+
+
+async def aiter_export(
+    user_id: int, export_format: str, filters: ExpenseFilters, session_factory: Optional[Callable] = None
+) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Async counterpart of `iter_export`, reading through the async engine's streaming cursor.
+
+    Args:
+        user_id (int): The ID of the user whose expenses are exported.
+        export_format (str): "ndjson", "csv" or "msgpack".
+        filters (ExpenseFilters): The filters selected on the export request.
+        session_factory (Optional[Callable]): Opens the async session to read from; defaults to
+            the primary's `AsyncSessionLocal`.
+
+    Yields:
+        Union[str, bytes]: The format's header (if any), then one encoded chunk per fetched batch.
+    """
+    from app.core.async_database import AsyncSessionLocal
+
+    header, encode = _ENCODERS[export_format]
+    if header:
+        yield header
+
+    async with (session_factory or AsyncSessionLocal)() as db:
+        result = await db.stream(_export_statement(user_id, filters))
+        async for batch in result.partitions():
+            yield encode(batch)
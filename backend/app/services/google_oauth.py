@@ -0,0 +1,182 @@
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from fastapi import HTTPException
+from jose import JWTError, jwt
+
+from app.core.config import (
+    GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_HTTP_MAX_CONNECTIONS, GOOGLE_HTTP_TIMEOUT_SECONDS, GOOGLE_ISSUERS,
+    GOOGLE_JWKS_CACHE_SECONDS, GOOGLE_JWKS_URI, GOOGLE_REDIRECT_URI, GOOGLE_TOKEN_ENDPOINT,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+# An ID token signed with a key ID missing from the cached key set triggers a refetch, since Google
+# rotates keys; refetches caused this way are at least this many seconds apart.
+JWKS_MIN_REFRESH_SECONDS = 60.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleOAuthClient:
+    """
+    Talks to Google's OAuth endpoints without blocking the event loop.
+
+    One pooled `httpx.AsyncClient` is shared by all logins, so bursts reuse kept-alive TLS
+    connections, and every call is bounded by a timeout. ID tokens are verified locally against
+    Google's signing keys, which are fetched once and cached until they expire or an unknown key
+    ID shows up.
+
+    Attributes:
+        client_id (str): The OAuth client ID, which ID tokens must be issued for.
+        token_endpoint (str): Where authorization codes are exchanged for tokens.
+        jwks_uri (str): Where the signing keys are published.
+    """
+
+    def __init__(
+        self,
+        client_id: Optional[str] = GOOGLE_CLIENT_ID,
+        client_secret: Optional[str] = GOOGLE_CLIENT_SECRET,
+        redirect_uri: Optional[str] = GOOGLE_REDIRECT_URI,
+        token_endpoint: str = GOOGLE_TOKEN_ENDPOINT,
+        jwks_uri: str = GOOGLE_JWKS_URI,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.token_endpoint = token_endpoint
+        self.jwks_uri = jwks_uri
+        self._transport = transport
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._keys: Dict[str, dict] = {}
+        self._keys_expire_at = 0.0
+        self._keys_fetched_at = 0.0
+        self._keys_lock = asyncio.Lock()
+
+    def _client(self) -> "httpx.AsyncClient":
+        # Created on first use, inside the running event loop the connections will belong to. httpx
+        # itself is only imported then too, keeping it out of every worker's startup.
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(
+                timeout=GOOGLE_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=GOOGLE_HTTP_MAX_CONNECTIONS, max_keepalive_connections=GOOGLE_HTTP_MAX_CONNECTIONS
+                ),
+                transport=self._transport,
+            )
+        return self._http
+
+    async def aclose(self):
+        """
+        Close the pooled connections; called on application shutdown.
+        """
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def exchange_code(self, code: str) -> dict:
+        """
+        Exchange an authorization code for Google's tokens.
+
+        Args:
+            code (str): The code Google passed to the redirect URI.
+
+        Returns:
+            dict: The token response, with at least `id_token`.
+
+        Raises:
+            HTTPException: A 502 error if Google cannot be reached in time, or a 400 error if it
+            rejects the code or returns no ID token.
+        """
+        import httpx
+
+        try:
+            response = await self._client().post(self.token_endpoint, data={
+                "code": code,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "redirect_uri": self.redirect_uri,
+                "grant_type": "authorization_code",
+            })
+        except httpx.HTTPError:
+            raise HTTPException(status_code=502, detail="Could not reach Google's token endpoint")
+
+        tokens = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        if response.status_code != 200 or not tokens.get("id_token"):
+            raise HTTPException(status_code=400, detail="Failed to get id_token from Google")
+        return tokens
+
+    async def _fetch_keys(self):
+        response = await self._client().get(self.jwks_uri)
+        response.raise_for_status()
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        ttl = float(match.group(1)) if match else GOOGLE_JWKS_CACHE_SECONDS
+        self._keys = {key["kid"]: key for key in response.json()["keys"] if "kid" in key}
+        self._keys_fetched_at = time.monotonic()
+        self._keys_expire_at = self._keys_fetched_at + ttl
+
+    async def signing_key(self, kid: str) -> dict:
+        """
+        Return the JWK Google signs tokens with under `kid`, from the cache when possible.
+
+        The key set is refetched when it has expired, or when `kid` is unknown and the last fetch
+        is older than `JWKS_MIN_REFRESH_SECONDS`. Concurrent logins wait for a single refetch. If a
+        refetch fails, the keys fetched before stay in use.
+
+        Raises:
+            HTTPException: A 502 error if no key set could be fetched at all, or a 401 error if the
+            key is not in the key set.
+        """
+        import httpx
+
+        async with self._keys_lock:
+            now = time.monotonic()
+            stale = now >= self._keys_expire_at
+            unknown = kid not in self._keys and now - self._keys_fetched_at >= JWKS_MIN_REFRESH_SECONDS
+            if stale or unknown:
+                try:
+                    await self._fetch_keys()
+                except (httpx.HTTPError, KeyError, ValueError):
+                    if not self._keys:
+                        raise HTTPException(status_code=502, detail="Could not fetch Google's signing keys")
+        key = self._keys.get(kid)
+        if key is None:
+            raise HTTPException(status_code=401, detail="ID token signed with an unknown key")
+        return key
+
+    async def verify_id_token(self, id_token: str, access_token: Optional[str] = None) -> dict:
+        """
+        Verify an ID token's signature, issuer, audience and expiry, and return its claims.
+
+        Args:
+            id_token (str): The ID token from the token response.
+            access_token (Optional[str]): The access token issued with it, checked against `at_hash`.
+
+        Returns:
+            dict: The verified claims.
+
+        Raises:
+            HTTPException: A 401 error if the token is not a valid ID token for this client.
+        """
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Malformed ID token")
+        key = await self.signing_key(header.get("kid", ""))
+        try:
+            return jwt.decode(
+                id_token, key, algorithms=[key.get("alg", "RS256")], audience=self.client_id,
+                issuer=GOOGLE_ISSUERS, access_token=access_token,
+            )
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid ID token")
+
+
+# Shared by every request, so the connection pool and the key cache are too
+google_oauth = GoogleOAuthClient()
@@ -0,0 +1,541 @@
+import csv
+import hashlib
+import html
+import io
+import math
+import os
+import re
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import BinaryIO, Callable, Dict, Iterator, List, Literal, NamedTuple, Optional, Union
+
+from fastapi import HTTPException, Query
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import IMPORT_BATCH_SIZE, IMPORT_MAX_REJECTIONS
+from app.core.database import dialect_insert
+from app.models.category import category_key
+from app.models.expense import Expense as ExpenseModel
+from app.services.categories import ResolvedCategories, resolve_categories
+from app.services.rollups import add_expense_delta, apply_rollup_deltas, new_deltas
+from app.services.users import bump_data_version
+
+# Bank statement import.
+#
+# A statement is read as a stream: the CSV or OFX parser yields one transaction at a time and the
+# transactions are loaded IMPORT_BATCH_SIZE at a time, so memory use does not depend on the size
+# of the file (the upload itself is spooled to disk by Starlette). On PostgreSQL each batch is
+# COPYed into a temporary table and moved into `expenses` with one INSERT ... SELECT; elsewhere it
+# is written with one multi-row INSERT. The whole file is imported in one transaction: the user's
+# data version is bumped once, just before the first write, and the daily rollups are updated
+# once, at the end. Bumping it takes the lock on the user's row, so the user's other writes wait
+# from then until the import commits, but not while the file is read up to its first expense.
+#
+# Expenses are spending, stored as positive amounts. Credits in a statement (refunds, salary,
+# transfers in) are not expenses: they are left out and only counted in the report.
+#
+# Every imported expense carries an `import_hash` identifying the transaction it came from, under
+# a unique index on (user_id, import_hash), and rows are inserted with ON CONFLICT DO NOTHING, so
+# importing a statement again (or one overlapping an earlier one) skips what is already there.
+# The hash is the bank's transaction ID (OFX FITID, with the account) when the file has one, and
+# otherwise covers the date, amount and description plus how many identical transactions came
+# before in the same file, so two identical coffees on the same day are both kept.
+
+IMPORT_FORMATS = ("csv", "ofx")
+
+# Header names looked for, case-insensitively, when a CSV column is not named explicitly
+CSV_COLUMN_CANDIDATES = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date", "value date"),
+    "amount": ("amount", "transaction amount", "value"),
+    "description": ("description", "memo", "payee", "name", "details", "narrative", "reference"),
+    "category": ("category",),
+}
+
+_OFX_ELEMENT = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+_OFX_DATE = re.compile(r"(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::[^\]]*)?\])?$")
+_AMOUNT_NOISE = re.compile(r"[^\d,.+\-()]")
+
+
+class ImportOptions:
+    """
+    Query-string options of the statement import, describing how the file maps to expenses.
+
+    Used as a FastAPI dependency (`options: ImportOptions = Depends()`).
+
+    Attributes:
+        date_column (Optional[str]): CSV header of the transaction date; looked up among common names if omitted.
+        amount_column (Optional[str]): CSV header of the amount.
+        description_column (Optional[str]): CSV header of the description.
+        category_column (Optional[str]): CSV header of the category.
+        date_format (Optional[str]): `strptime` format of the CSV dates; ISO 8601 if omitted.
+        default_category (str): Category of transactions that have none.
+        spending_sign (Optional[str]): The sign spending carries in the file, "positive" or
+            "negative"; amounts are flipped as needed so spending is stored as positive amounts,
+            and transactions of the other sign (credits) are skipped. Defaults to "negative" for
+            OFX, which prescribes it, and to "positive" for CSV.
+    """
+
+    def __init__(
+        self,
+        date_column: Optional[str] = Query(None),
+        amount_column: Optional[str] = Query(None),
+        description_column: Optional[str] = Query(None),
+        category_column: Optional[str] = Query(None),
+        date_format: Optional[str] = Query(None, description="strptime format of the dates, e.g. %d/%m/%Y"),
+        default_category: str = Query("Imported", min_length=1),
+        spending_sign: Optional[Literal["positive", "negative"]] = Query(None),
+    ):
+        self.date_column = date_column
+        self.amount_column = amount_column
+        self.description_column = description_column
+        self.category_column = category_column
+        self.date_format = date_format
+        self.default_category = default_category
+        self.spending_sign = spending_sign
+
+
+@dataclass
+class StatementRow:
+    """
+    One transaction read from a statement, before it is mapped to an expense.
+
+    Attributes:
+        row (int): The line number (CSV) or position (OFX) of the transaction in the file.
+        date (datetime): When the transaction happened, timezone-aware.
+        amount (float): The amount as written in the file.
+        description (Optional[str]): The transaction's description.
+        category (Optional[str]): The transaction's category, if the file has one.
+        transaction_id (Optional[str]): The bank's ID of the transaction, if the file has one.
+    """
+    row: int
+    date: datetime
+    amount: float
+    description: Optional[str]
+    category: Optional[str] = None
+    transaction_id: Optional[str] = None
+
+
+class Rejection(NamedTuple):
+    """
+    A statement row that could not be read, with the reason.
+    """
+    row: int
+    reason: str
+
+
+class RowError(ValueError):
+    """
+    Raised by the field parsers for a value that cannot be read; becomes a `Rejection`.
+    """
+
+
+def statement_format(filename: Optional[str]) -> str:
+    """
+    Guess a statement's format from its file name: "ofx" for .ofx and .qfx files, "csv" otherwise.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    return "ofx" if extension in (".ofx", ".qfx") else "csv"
+
+
+def parse_amount(value: str) -> float:
+    """
+    Read an amount as banks write them: with currency symbols, thousands separators, a decimal
+    comma or point, and negative amounts in parentheses.
+
+    Raises:
+        RowError: If the value is not a number.
+    """
+    cleaned = _AMOUNT_NOISE.sub("", value)
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    cleaned = cleaned.strip("()")
+    if "," in cleaned and "." in cleaned:
+        # Whichever separator comes last is the decimal one
+        if cleaned.rfind(",") > cleaned.rfind("."):
+            cleaned = cleaned.replace(".", "").replace(",", ".")
+        else:
+            cleaned = cleaned.replace(",", "")
+    elif "," in cleaned:
+        whole, _, fraction = cleaned.rpartition(",")
+        cleaned = f"{whole.replace(',', '')}.{fraction}" if len(fraction) in (1, 2) else cleaned.replace(",", "")
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        raise RowError(f"unreadable amount {value!r}" if value.strip() else "missing amount") from None
+    if not math.isfinite(amount):
+        raise RowError(f"unreadable amount {value!r}")
+    return -amount if negative else amount
+
+
+def parse_date(value: str, date_format: Optional[str] = None) -> datetime:
+    """
+    Read a CSV date with `date_format`, or as ISO 8601; dates without a timezone are taken as UTC.
+
+    Raises:
+        RowError: If the value does not match the format.
+    """
+    value = value.strip()
+    if not value:
+        raise RowError("missing date")
+    try:
+        parsed = datetime.strptime(value, date_format) if date_format else datetime.fromisoformat(value)
+    except ValueError:
+        hint = "" if date_format else " (pass date_format for dates that are not ISO 8601)"
+        raise RowError(f"unreadable date {value!r}{hint}") from None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_ofx_date(value: str) -> datetime:
+    """
+    Read an OFX date-time such as "20240105", "20240105120000.000" or "20240105120000[-5:EST]".
+
+    Raises:
+        RowError: If the value is not an OFX date.
+    """
+    match = _OFX_DATE.match(value.strip())
+    if not match:
+        raise RowError(f"unreadable date {value!r}" if value.strip() else "missing date")
+    day, time_of_day, offset = match.groups()
+    try:
+        parsed = datetime.strptime(day + (time_of_day or "000000"), "%Y%m%d%H%M%S")
+    except ValueError:
+        raise RowError(f"unreadable date {value!r}") from None
+    # OFX times without an offset are in GMT
+    return parsed.replace(tzinfo=timezone(timedelta(hours=float(offset))) if offset else timezone.utc)
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    value = " ".join(value.split()) if value else ""
+    return value or None
+
+
+def parse_csv(stream: BinaryIO, options: ImportOptions) -> Iterator[Union[StatementRow, Rejection]]:
+    """
+    Read a CSV statement row by row.
+
+    The delimiter (comma, semicolon, tab or bar) is detected from the start of the file. Columns
+    are taken from the options, or recognized by their header (see `CSV_COLUMN_CANDIDATES`).
+
+    Args:
+        stream (BinaryIO): The file, UTF-8 encoded (a byte order mark is allowed).
+        options (ImportOptions): The column mapping and date format.
+
+    Yields:
+        Union[StatementRow, Rejection]: One entry per non-empty row after the header.
+
+    Raises:
+        HTTPException: A 400 error if the file has no header or no date or amount column.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        sample = text_stream.read(8192)
+        text_stream.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text_stream, dialect)
+        header = [name.strip().casefold() for name in next(reader, [])]
+        if not any(header):
+            raise HTTPException(status_code=400, detail="The CSV file has no header row")
+
+        def column(field: str, explicit: Optional[str]) -> Optional[int]:
+            if explicit:
+                if explicit.strip().casefold() not in header:
+                    raise HTTPException(status_code=400, detail=f"The CSV file has no column {explicit!r}")
+                return header.index(explicit.strip().casefold())
+            return next((header.index(name) for name in CSV_COLUMN_CANDIDATES[field] if name in header), None)
+
+        date_index = column("date", options.date_column)
+        amount_index = column("amount", options.amount_column)
+        description_index = column("description", options.description_column)
+        category_index = column("category", options.category_column)
+        for field, index in (("date", date_index), ("amount", amount_index)):
+            if index is None:
+                raise HTTPException(
+                    status_code=400, detail=f"Could not find the {field} column; name it with {field}_column"
+                )
+
+        def cell(fields: List[str], index: Optional[int]) -> str:
+            return fields[index] if index is not None and index < len(fields) else ""
+
+        for fields in reader:
+            if not any(value.strip() for value in fields):
+                continue
+            try:
+                yield StatementRow(
+                    row=reader.line_num,
+                    date=parse_date(cell(fields, date_index), options.date_format),
+                    amount=parse_amount(cell(fields, amount_index)),
+                    description=_clean(cell(fields, description_index)),
+                    category=_clean(cell(fields, category_index)),
+                )
+            except RowError as exc:
+                yield Rejection(reader.line_num, str(exc))
+    finally:
+        # Leave the upload open; closing the wrapper would close it
+        text_stream.detach()
+
+
+def _ofx_elements(text_stream) -> Iterator[tuple]:
+    """
+    Yield (is closing tag, tag name, text up to the next tag) for every tag of an OFX document.
+
+    Works for OFX 1.x (SGML, where elements have no closing tags) and 2.x (XML) alike, reading
+    the document in chunks.
+    """
+    buffer = ""
+    while True:
+        chunk = text_stream.read(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        # The text after the last "<" may belong to a tag cut off by the chunk boundary
+        cut = buffer.rfind("<")
+        for match in _OFX_ELEMENT.finditer(buffer, 0, max(cut, 0)):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3)
+        buffer = buffer[cut:] if cut >= 0 else ""
+    for match in _OFX_ELEMENT.finditer(buffer):
+        yield match.group(1) == "/", match.group(2).upper(), match.group(3)
+
+
+def _ofx_row(position: int, account: str, fields: Dict[str, str]) -> Union[StatementRow, Rejection]:
+    try:
+        return StatementRow(
+            row=position,
+            date=parse_ofx_date(fields.get("DTPOSTED", "")),
+            amount=parse_amount(fields.get("TRNAMT", "")),
+            description=_clean(fields.get("NAME") or fields.get("MEMO") or fields.get("PAYEE")),
+            transaction_id=f"{account}:{fields['FITID']}" if fields.get("FITID") else None,
+        )
+    except RowError as exc:
+        return Rejection(position, str(exc))
+
+
+def parse_ofx(stream: BinaryIO, options: ImportOptions) -> Iterator[Union[StatementRow, Rejection]]:
+    """
+    Read the transactions (STMTTRN elements) of an OFX or QFX statement one at a time.
+
+    Args:
+        stream (BinaryIO): The file.
+        options (ImportOptions): Unused; OFX fields have fixed names and formats.
+
+    Yields:
+        Union[StatementRow, Rejection]: One entry per transaction, numbered from 1 in file order.
+
+    Raises:
+        HTTPException: A 400 error if the file is not an OFX document.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    try:
+        seen_ofx = False
+        account = ""
+        position = 0
+        transaction: Optional[Dict[str, str]] = None
+        for closing, name, value in _ofx_elements(text_stream):
+            if name == "OFX":
+                seen_ofx = True
+            elif name == "STMTTRN":
+                if transaction is not None:
+                    yield _ofx_row(position, account, transaction)
+                    transaction = None
+                if not closing:
+                    position += 1
+                    transaction = {}
+            elif not closing and transaction is not None:
+                transaction[name] = html.unescape(value.strip())
+            elif not closing and name == "ACCTID":
+                account = value.strip()
+        if transaction is not None:
+            yield _ofx_row(position, account, transaction)
+        if not seen_ofx:
+            raise HTTPException(status_code=400, detail="The file is not an OFX statement")
+    finally:
+        text_stream.detach()
+
+
+def transaction_identity(row: StatementRow) -> str:
+    """
+    Describe what identifies a statement transaction: the bank's transaction ID when the file
+    has one, and otherwise its date, amount (as written in the file) and description.
+    """
+    if row.transaction_id:
+        return f"id|{row.transaction_id}"
+    return f"{row.date.astimezone(timezone.utc).isoformat()}|{row.amount!r}|{row.description or ''}"
+
+
+def import_hash(identity: str, occurrence: int) -> str:
+    """
+    Hash a transaction for deduplication.
+
+    Args:
+        identity (str): The transaction's `transaction_identity`.
+        occurrence (int): How many transactions with the same identity came before it in the
+            file, so repeated identical transactions are all kept.
+
+    Returns:
+        str: 32 hex digits.
+    """
+    return hashlib.sha256(f"{identity}|{occurrence}".encode()).hexdigest()[:32]
+
+
+# The columns of the unique index ON CONFLICT must name
+_HASH_INDEX_COLUMNS = [
+    column.name
+    for index in ExpenseModel.__table__.indexes if index.name == "uq_expenses_user_import_hash"
+    for column in index.columns
+]
+_COPY_COLUMNS = ("amount", "category_id", "description", "date", "import_hash")
+
+
+def _insert_rows(db: Session, values: List[dict]) -> list:
+    """
+    Insert one batch with a multi-row INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns:
+        list: (date, category_id, amount) of every row inserted; duplicates are left out.
+    """
+    # Executed on the table rather than the mapped class, skipping the ORM's bulk-insert bookkeeping
+    table = ExpenseModel.__table__
+    insert = dialect_insert(db, table)
+    statement = insert.on_conflict_do_nothing(index_elements=_HASH_INDEX_COLUMNS).returning(
+        table.c.date, table.c.category_id, table.c.amount
+    )
+    return db.connection().execute(statement, values).all()
+
+
+def _copy_rows(db: Session, values: List[dict]) -> list:
+    """
+    Load one batch on PostgreSQL: COPY it into the temporary `expense_import` table, then move
+    it into `expenses` with one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    Returns:
+        list: (date, category_id, amount) of every row inserted; duplicates are left out.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for value in values:
+        # An empty unquoted field is NULL in COPY's CSV format
+        writer.writerow([value["date"].isoformat() if name == "date" else value[name] for name in _COPY_COLUMNS])
+    buffer.seek(0)
+
+    connection = db.connection()
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY expense_import ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    first = values[0]
+    inserted = connection.execute(
+        text(
+            f"INSERT INTO expenses (user_id, change_seq, {', '.join(_COPY_COLUMNS)}) "
+            f"SELECT :user_id, :change_seq, {', '.join(_COPY_COLUMNS)} FROM expense_import "
+            f"ON CONFLICT ({', '.join(_HASH_INDEX_COLUMNS)}) DO NOTHING "
+            "RETURNING date, category_id, amount"
+        ),
+        {"user_id": first["user_id"], "change_seq": first["change_seq"]},
+    ).all()
+    connection.exec_driver_sql("TRUNCATE expense_import")
+    return inserted
+
+
+def import_expenses(
+    db: Session, user_id: int, stream: BinaryIO, import_format: str, options: ImportOptions,
+    on_batch: Optional[Callable[[], None]] = None,
+) -> dict:
+    """
+    Import a bank statement as expenses of the user, skipping transactions imported before.
+
+    Args:
+        db (Session): The database session on the primary.
+        user_id (int): The ID of the user who owns the expenses.
+        stream (BinaryIO): The statement file.
+        import_format (str): "csv" or "ofx".
+        options (ImportOptions): How the file maps to expenses.
+        on_batch (Optional[Callable[[], None]]): Called after every batch, e.g. to report progress;
+            an exception it raises aborts the import before anything is committed.
+
+    Returns:
+        dict: The `ExpenseImportReport`: counts of inserted, skipped, skipped credit and rejected
+        transactions and the first `IMPORT_MAX_REJECTIONS` rejected rows.
+
+    Raises:
+        HTTPException: A 400 error if the file cannot be read as a statement of that format.
+    """
+    rows = (parse_ofx if import_format == "ofx" else parse_csv)(stream, options)
+    spending_sign = options.spending_sign or ("negative" if import_format == "ofx" else "positive")
+    sign = -1 if spending_sign == "negative" else 1
+    report = {
+        "format": import_format, "inserted": 0, "skipped": 0, "skipped_credits": 0, "rejected": 0, "rejections": [],
+    }
+
+    copy = db.get_bind().dialect.name == "postgresql" and db.get_bind().dialect.driver == "psycopg2"
+    change_seq: Optional[int] = None
+    categories: ResolvedCategories = {}
+    occurrences: Dict[bytes, int] = {}
+    deltas = new_deltas()
+    # Closed explicitly, so an aborted import detaches the parser from the file straight away
+    with closing(rows):
+        while True:
+            batch = list(islice(rows, IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            transactions = []
+            for item in batch:
+                if isinstance(item, Rejection):
+                    report["rejected"] += 1
+                    if len(report["rejections"]) < IMPORT_MAX_REJECTIONS:
+                        report["rejections"].append({"row": item.row, "reason": item.reason})
+                elif sign * item.amount <= 0:
+                    report["skipped_credits"] += 1
+                else:
+                    transactions.append(item)
+            if not transactions:
+                continue
+
+            if change_seq is None:
+                change_seq = bump_data_version(db, user_id)
+                if copy:
+                    db.connection().exec_driver_sql(
+                        "CREATE TEMP TABLE expense_import (amount double precision, category_id integer, "
+                        "description text, date timestamptz, import_hash varchar(32)) ON COMMIT DROP"
+                    )
+
+            missing = {}
+            for item in transactions:
+                name = item.category or options.default_category
+                if category_key(name) not in categories:
+                    missing.setdefault(category_key(name), name)
+            if missing:
+                categories.update(resolve_categories(db, user_id, missing.values()))
+
+            values = []
+            for item in transactions:
+                identity = transaction_identity(item)
+                # Counted by digest, which keeps the per-file state small however long the descriptions are
+                digest = hashlib.blake2b(identity.encode(), digest_size=16).digest()
+                occurrence = occurrences.get(digest, 0)
+                occurrences[digest] = occurrence + 1
+                values.append({
+                    "user_id": user_id,
+                    "amount": sign * item.amount,
+                    "category_id": categories[category_key(item.category or options.default_category)][0],
+                    "description": item.description,
+                    "date": item.date.astimezone(timezone.utc),
+                    "change_seq": change_seq,
+                    "import_hash": import_hash(identity, occurrence),
+                })
+
+            inserted = (_copy_rows if copy else _insert_rows)(db, values)
+            for row in inserted:
+                add_expense_delta(deltas, row.date, row.category_id, row.amount, 1)
+            report["inserted"] += len(inserted)
+            report["skipped"] += len(values) - len(inserted)
+            if on_batch is not None:
+                on_batch()
+
+    apply_rollup_deltas(db, user_id, deltas)
+    db.commit()
+    return report
@@ -0,0 +1,579 @@
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import (
+    EXPORT_BATCH_SIZE, JOB_HEARTBEAT_SECONDS, JOB_MAX_ACTIVE_PER_USER, JOB_QUEUE_LIMIT, JOB_RETENTION_SECONDS,
+    JOB_SPOOL_DIR, JOB_STALE_SECONDS, JOB_WORKERS,
+)
+from app.core.database import SessionLocal
+from app.core.filters import ExpenseFilters
+from app.core.metrics import Counter, Gauge
+from app.core.replicas import pin_to_primary
+from app.models.expense import Expense as ExpenseModel
+from app.models.job import (
+    JOB_ACTIVE_STATUSES, JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, Job,
+)
+from app.services.export import iter_export
+from app.services.imports import ImportOptions, import_expenses
+from app.services.rollups import rebuild_rollups
+from app.services.users import bump_data_version
+
+# Background jobs.
+#
+# Heavy operations are queued as rows of the `jobs` table and run outside of any request by the
+# process's `JobRunner`, on a pool of JOB_WORKERS threads. The request that queues a job returns
+# at once with the job, and the client polls GET /jobs/{id} for its status, progress and result.
+# Each kind of job is a function in `JOB_KINDS`, run with its own session on the primary.
+#
+# A job reports progress and learns that it was cancelled through its `JobContext`, in memory;
+# the runner's heartbeat thread writes the progress to the database and reads cancellation
+# requests every JOB_HEARTBEAT_SECONDS. The job's own thread never waits on those writes, which
+# matters on SQLite, where the job's transaction holds the database's only write lock.
+#
+# The heartbeat also marks running jobs whose heartbeat stopped (their process died) as failed
+# and deletes finished jobs after JOB_RETENTION_SECONDS. Jobs still queued when a process stops
+# are picked up by the next process to start. A job is claimed with a conditional UPDATE, so it
+# runs once however many runners see it.
+
+logger = logging.getLogger(__name__)
+
+# How long a finished writing job waits for the user to be pinned to the primary
+NOTIFY_TIMEOUT_SECONDS = 10
+
+# How many expired jobs one heartbeat deletes at most
+PURGE_BATCH_SIZE = 100
+
+jobs_finished = Counter(
+    "jobs_finished_total", "Background jobs that finished, by kind and status.", ["kind", "status"]
+)
+jobs_pending = Gauge("jobs_pending", "Background jobs queued or running in this process.")
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job whose cancellation was requested; the job's uncommitted work is rolled back.
+    """
+
+
+class JobContext:
+    """
+    What a running job knows about itself, and its channel back to the runner.
+
+    Attributes:
+        job_id (int): The ID of the job.
+        user_id (int): The ID of the user the job runs for.
+        params (dict): The job's parameters, as given when it was queued.
+        progress (Optional[float]): The fraction of the work done, from 0 to 1, if known.
+        cancelled (bool): Set by the runner when cancellation is requested.
+    """
+
+    def __init__(self, job_id: int, user_id: int, params: dict):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.params = params
+        self.progress: Optional[float] = None
+        self.cancelled = False
+
+    def update(self, progress: Optional[float] = None):
+        """
+        Record the job's progress, and stop the job if its cancellation was requested.
+
+        Cheap enough to call after every batch of work: nothing is written here.
+
+        Args:
+            progress (Optional[float]): The fraction of the work done, from 0 to 1.
+
+        Raises:
+            JobCancelled: If the job is to stop.
+        """
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if self.cancelled:
+            raise JobCancelled()
+
+
+@dataclass
+class JobKind:
+    """
+    A kind of background job.
+
+    Attributes:
+        run (Callable[[JobContext, Session], Optional[dict]]): Does the work and returns the job's
+            result. It commits its own writes; an exception rolls back what is not committed and
+            fails the job.
+        writes (bool): Whether the job changes the user's expenses. The user is then pinned to
+            the primary once it succeeds.
+    """
+    run: Callable[[JobContext, Session], Optional[dict]]
+    writes: bool = False
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def spool_path(name: str) -> str:
+    """
+    Return the path of a file in JOB_SPOOL_DIR.
+    """
+    return os.path.join(JOB_SPOOL_DIR, name)
+
+
+def spool_upload(file: BinaryIO) -> str:
+    """
+    Copy an uploaded file into JOB_SPOOL_DIR, where it outlives the request for a job to read it.
+
+    Returns:
+        str: The name of the copy, to be passed to the job as its "upload" parameter.
+    """
+    os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=JOB_SPOOL_DIR, prefix="upload-", delete=False) as copy:
+        shutil.copyfileobj(file, copy)
+    return os.path.basename(copy.name)
+
+
+def export_file_name(job_id: int, export_format: str) -> str:
+    """
+    Return the name of the file an export job writes in JOB_SPOOL_DIR.
+    """
+    return f"job-{job_id}.{export_format}"
+
+
+def remove_spool_files(*names: Optional[str]):
+    """
+    Delete files from JOB_SPOOL_DIR, ignoring the ones already gone.
+    """
+    for name in names:
+        if not name:
+            continue
+        try:
+            os.remove(spool_path(name))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not remove job file %s", name, exc_info=True)
+
+
+def _job_files(job: Job) -> List[Optional[str]]:
+    """
+    Return the names of the spool files belonging to a job: its upload and its output.
+    """
+    output = export_file_name(job.id, job.params["format"]) if job.kind == "export" else None
+    return [job.params.get("upload"), output]
+
+
+class JobRunner:
+    """
+    Runs the jobs queued by this process on a bounded pool of threads.
+
+    Attributes:
+        workers (int): The number of jobs run at the same time.
+        session_factory (sessionmaker): Opens the sessions jobs and the heartbeat run with.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, session_factory: sessionmaker = SessionLocal):
+        self.workers = workers
+        self.session_factory = session_factory
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._running: Dict[int, JobContext] = {}
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of jobs submitted to this runner that have not finished.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def full(self) -> bool:
+        """
+        Whether JOB_QUEUE_LIMIT jobs are already waiting for a thread.
+        """
+        return self.pending >= self.workers + JOB_QUEUE_LIMIT
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """
+        Start the worker threads and the heartbeat, and pick up the jobs left queued.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The application's event loop, on which the result
+                cache and the primary pins are updated after writing jobs.
+        """
+        self._loop = loop
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+        with self.session_factory() as db:
+            queued = db.scalars(select(Job.id).where(Job.status == JOB_QUEUED).order_by(Job.id)).all()
+        for job_id in queued:
+            self.submit(job_id)
+
+    def shutdown(self):
+        """
+        Stop taking jobs. Running jobs finish; queued ones stay queued for the next process to start.
+        """
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, job_id: int):
+        """
+        Hand a queued job to the pool.
+
+        Raises:
+            RuntimeError: If the runner is not started.
+        """
+        if self._executor is None:
+            raise RuntimeError("The job runner is not started")
+        with self._lock:
+            self._pending.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def cancel(self, job_id: int):
+        """
+        Stop a job running in this process at its next `JobContext.update`.
+
+        Jobs running in other processes see the request at their runner's next heartbeat.
+        """
+        with self._lock:
+            context = self._running.get(job_id)
+        if context is not None:
+            context.cancelled = True
+
+    def _run(self, job_id: int):
+        try:
+            self._execute(job_id)
+        except Exception:
+            logger.exception("Job %s could not be run", job_id)
+        finally:
+            with self._lock:
+                self._pending.discard(job_id)
+                self._running.pop(job_id, None)
+
+    def _execute(self, job_id: int):
+        with self.session_factory() as db:
+            now = _now()
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, started_at=now, heartbeat_at=now)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                # Cancelled while queued, or claimed by another process
+                return
+            job = db.get(Job, job_id)
+            kind_name, user_id, params = job.kind, job.user_id, dict(job.params)
+            context = JobContext(job_id, user_id, params)
+            context.cancelled = job.cancel_requested
+            with self._lock:
+                self._running[job_id] = context
+
+            status, result, error = JOB_SUCCEEDED, None, None
+            kind = JOB_KINDS[kind_name]
+            try:
+                result = kind.run(context, db)
+            except JobCancelled:
+                status = JOB_CANCELLED
+            except HTTPException as exc:
+                # The services report bad input (e.g. an unreadable statement) this way
+                status, error = JOB_FAILED, str(exc.detail)
+            except Exception:
+                logger.exception("Job %s (%s) failed", job_id, kind_name)
+                status, error = JOB_FAILED, "Internal error"
+            db.rollback()
+
+            if status == JOB_SUCCEEDED and kind.writes:
+                self._after_write(user_id)
+            db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JOB_RUNNING)
+                .values(
+                    status=status, result=result, error=error, finished_at=_now(),
+                    progress=1.0 if status == JOB_SUCCEEDED else context.progress,
+                )
+            )
+            db.commit()
+            jobs_finished.inc(kind=kind_name, status=status)
+            remove_spool_files(params.get("upload"))
+            if status != JOB_SUCCEEDED and kind_name == "export":
+                remove_spool_files(export_file_name(job_id, params["format"]))
+
+    def _after_write(self, user_id: int):
+        """
+        Pin the user to the primary, as a write request would.
+
+        Runs before the job is marked as succeeded, so a client seeing it succeed reads the new data.
+        """
+        if self._loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(pin_to_primary(user_id), self._loop).result(NOTIFY_TIMEOUT_SECONDS)
+        except Exception:
+            logger.error("Could not pin user %s to the primary", user_id, exc_info=True)
+
+    def _beat(self):
+        while not self._stopping.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                self.beat()
+            except Exception:
+                logger.warning("Job heartbeat failed", exc_info=True)
+
+    def beat(self):
+        """
+        Write the progress of this process's running jobs and pick up their cancellation
+        requests, then fail interrupted jobs and delete expired ones.
+        """
+        with self._lock:
+            running = dict(self._running)
+        now = _now()
+        with self.session_factory() as db:
+            for job_id, context in running.items():
+                db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_RUNNING)
+                    .values(progress=context.progress, heartbeat_at=now)
+                )
+            if running:
+                for job_id in db.scalars(select(Job.id).where(Job.id.in_(running), Job.cancel_requested)):
+                    running[job_id].cancelled = True
+            db.commit()
+
+            interrupted = db.scalars(
+                select(Job).where(
+                    Job.status == JOB_RUNNING,
+                    Job.heartbeat_at < now - timedelta(seconds=JOB_STALE_SECONDS),
+                    Job.id.notin_(running),
+                )
+            ).all()
+            for job in interrupted:
+                job.status, job.error, job.finished_at = JOB_FAILED, "Interrupted: the process running the job stopped", now
+                remove_spool_files(*_job_files(job))
+                jobs_finished.inc(kind=job.kind, status=JOB_FAILED)
+            expired = db.scalars(
+                select(Job).where(Job.finished_at < now - timedelta(seconds=JOB_RETENTION_SECONDS)).limit(PURGE_BATCH_SIZE)
+            ).all()
+            for job in expired:
+                remove_spool_files(*_job_files(job))
+                db.delete(job)
+            db.commit()
+
+
+def enqueue_job(db: Session, user_id: int, kind: str, params: dict, runner: Optional[JobRunner] = None) -> Job:
+    """
+    Queue a job for the user and hand it to the runner.
+
+    Args:
+        db (Session): The database session on the primary.
+        user_id (int): The ID of the user the job runs for.
+        kind (str): A key of `JOB_KINDS`.
+        params (dict): The job's parameters, JSON-serializable.
+        runner (Optional[JobRunner]): The runner to submit to; the application's by default.
+
+    Returns:
+        Job: The queued job.
+
+    Raises:
+        HTTPException: A 429 error if the user already has JOB_MAX_ACTIVE_PER_USER jobs queued or
+            running, or a 503 error if the runner's queue is full.
+    """
+    runner = runner or job_runner
+    if runner.full:
+        raise HTTPException(status_code=503, detail="Too many jobs are queued", headers={"Retry-After": "30"})
+    active = db.scalar(
+        select(func.count()).select_from(Job).where(Job.user_id == user_id, Job.status.in_(JOB_ACTIVE_STATUSES))
+    )
+    if active >= JOB_MAX_ACTIVE_PER_USER:
+        raise HTTPException(status_code=429, detail="Too many jobs in progress; wait for one to finish")
+    job = Job(user_id=user_id, kind=kind, params=params)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    runner.submit(job.id)
+    return job
+
+
+def list_jobs(db: Session, user_id: int, limit: int) -> List[Job]:
+    """
+    Return the user's most recent jobs, newest first.
+    """
+    return db.scalars(
+        select(Job).where(Job.user_id == user_id).order_by(Job.created_at.desc(), Job.id.desc()).limit(limit)
+    ).all()
+
+
+def get_job(db: Session, user_id: int, job_id: int) -> Job:
+    """
+    Return one of the user's jobs.
+
+    Raises:
+        HTTPException: A 404 error if the job does not exist or belongs to another user.
+    """
+    job = db.get(Job, job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def cancel_job(db: Session, user_id: int, job_id: int, runner: Optional[JobRunner] = None) -> Job:
+    """
+    Cancel one of the user's jobs.
+
+    A queued job is cancelled at once. A running job is asked to stop and is cancelled when it
+    next reports progress; its uncommitted work is rolled back.
+
+    Raises:
+        HTTPException: A 404 error if the job is not the user's, or a 409 error if it has already
+            finished other than by being cancelled.
+    """
+    runner = runner or job_runner
+    job = get_job(db, user_id, job_id)
+    # Only flags a job running in this process, which stops and rolls back at its next progress
+    # report; the request is recorded by the UPDATEs below. On PostgreSQL they do not wait on the
+    # job. On SQLite they wait for a running job's transaction, which holds the database's write
+    # lock: until this process's job has stopped, or until a job in another process, which learns
+    # of the request only from the row, has ended.
+    runner.cancel(job_id)
+    cancelled = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JOB_QUEUED)
+        .values(status=JOB_CANCELLED, finished_at=_now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requested = cancelled or db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JOB_RUNNING)
+        .values(cancel_requested=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    db.refresh(job)
+    if cancelled:
+        jobs_finished.inc(kind=job.kind, status=JOB_CANCELLED)
+        remove_spool_files(job.params.get("upload"))
+    elif not requested and job.status != JOB_CANCELLED:
+        # A job that stopped on the signal above is cancelled already; any other has finished
+        raise HTTPException(status_code=409, detail="The job has already finished")
+    return job
+
+
+def job_output_path(job: Job) -> str:
+    """
+    Return the path of the file an export job produced.
+
+    Raises:
+        HTTPException: A 404 error if the job is not a succeeded export or its file has expired.
+    """
+    path = spool_path(export_file_name(job.id, job.params["format"])) if job.kind == "export" else None
+    if job.status != JOB_SUCCEEDED or path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="The job has no file to download")
+    return path
+
+
+def filter_params(filters: ExpenseFilters) -> dict:
+    """
+    Turn export filters into JSON-serializable job parameters.
+    """
+    return {
+        "date_from": filters.date_from.isoformat() if filters.date_from else None,
+        "date_to": filters.date_to.isoformat() if filters.date_to else None,
+        "category": filters.category,
+        "min_amount": filters.min_amount,
+        "max_amount": filters.max_amount,
+    }
+
+
+def _filters_from_params(params: dict) -> ExpenseFilters:
+    return ExpenseFilters(
+        date_from=datetime.fromisoformat(params["date_from"]) if params["date_from"] else None,
+        date_to=datetime.fromisoformat(params["date_to"]) if params["date_to"] else None,
+        category=params["category"],
+        min_amount=params["min_amount"],
+        max_amount=params["max_amount"],
+    )
+
+
+def _run_import(context: JobContext, db: Session) -> dict:
+    """
+    Import the uploaded statement; progress is how far into the file the parser is.
+    """
+    params = context.params
+    path = spool_path(params["upload"])
+    size = max(os.path.getsize(path), 1)
+    context.update(0.0)
+    with open(path, "rb") as stream:
+        return import_expenses(
+            db, context.user_id, stream, params["format"], ImportOptions(**params["options"]),
+            on_batch=lambda: context.update(stream.tell() / size),
+        )
+
+
+def _run_export(context: JobContext, db: Session) -> dict:
+    """
+    Write the user's expenses to a file in JOB_SPOOL_DIR, downloaded from GET /jobs/{id}/result.
+    """
+    params = context.params
+    filters = _filters_from_params(params["filters"])
+    count = select(func.count()).select_from(ExpenseModel).where(ExpenseModel.user_id == context.user_id)
+    total = db.scalar(filters.apply(count, context.user_id))
+    db.rollback()
+    context.update(0.0)
+
+    path = spool_path(export_file_name(context.job_id, params["format"]))
+    os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+    # Written under a temporary name, so a download never sees a partial file
+    try:
+        with open(path + ".part", "wb") as output:
+            for batches, chunk in enumerate(iter_export(context.user_id, params["format"], filters), 1):
+                output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                context.update(min(batches * EXPORT_BATCH_SIZE / total, 1.0) if total else None)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".part")
+        raise
+    os.replace(path + ".part", path)
+    return {"format": params["format"], "rows": total, "bytes": os.path.getsize(path)}
+
+
+def _run_rebuild_rollups(context: JobContext, db: Session) -> dict:
+    """
+    Recompute the user's daily rollups from their expenses.
+    """
+    context.update(0.0)
+    # Summaries read from the rollups, so clients must not keep the ones computed from the old rows
+    bump_data_version(db, context.user_id)
+    return {"rows": rebuild_rollups(db, context.user_id)}
+
+
+# Kinds of jobs, by the name stored in `Job.kind`
+JOB_KINDS: Dict[str, JobKind] = {
+    "import": JobKind(_run_import, writes=True),
+    "export": JobKind(_run_export),
+    "rebuild_rollups": JobKind(_run_rebuild_rollups, writes=True),
+}
+
+# The application's runner, started and stopped with the application (see app/main.py)
+job_runner = JobRunner()
+jobs_pending.set_function(lambda: job_runner.pending)
@@ -0,0 +1,311 @@
+import argparse
+import re
+import sys
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Connection, text
+
+from app.core.config import EXPENSE_PARTITION_INTERVAL, EXPENSE_PARTITION_PREMAKE
+from app.core.database import Base, engine
+from app.models.expense import Expense as ExpenseModel
+
+# Range partitioning of the expenses table (PostgreSQL only).
+#
+# With EXPENSE_PARTITION_INTERVAL set, `expenses` is created as a table partitioned by RANGE (date)
+# with one partition per UTC month or year, named expenses_pYYYY_MM or expenses_pYYYY, plus a
+# DEFAULT partition catching dates no partition covers yet. Indexes declared on the model are
+# created on every partition automatically. Queries bounded by date (date-range filters, keyset
+# pages) only visit the partitions their bounds overlap, and a whole period can be taken out of
+# the table by detaching its partition instead of deleting its rows.
+#
+# Maintenance runs through `python -m app.services.partitions`:
+#   migrate             convert an existing, unpartitioned expenses table
+#   premake             create the current and the next EXPENSE_PARTITION_PREMAKE partitions
+#                       (also done on every startup; schedule it if the app runs for months)
+#   detach --before D   detach the partitions that end on or before D
+#   list                show the partitions and their estimated row counts
+
+DEFAULT_PARTITION = "expenses_default"
+
+_PARTITION_NAME = re.compile(r"^expenses_p(\d{4})(?:_(\d{2}))?$")
+
+
+def period_start(day: date, interval: str) -> date:
+    """
+    Return the first day of the month or year containing `day`.
+    """
+    return day.replace(day=1) if interval == "month" else day.replace(month=1, day=1)
+
+
+def next_period(start: date, interval: str) -> date:
+    """
+    Return the first day of the period following the one starting on `start`.
+    """
+    if interval == "year":
+        return start.replace(year=start.year + 1)
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def partition_name(start: date, interval: str) -> str:
+    """
+    Return the name of the partition holding the period that starts on `start`.
+    """
+    return f"expenses_p{start:%Y_%m}" if interval == "month" else f"expenses_p{start:%Y}"
+
+
+def partition_bounds(name: str) -> Optional[Tuple[date, date]]:
+    """
+    Recover the [start, end) dates of a partition from its name.
+
+    Returns:
+        Optional[Tuple[date, date]]: The bounds, or None for the default partition and tables
+        that do not follow the naming scheme.
+    """
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    year, month = match.groups()
+    if month is None:
+        start = date(int(year), 1, 1)
+        return start, next_period(start, "year")
+    start = date(int(year), int(month), 1)
+    return start, next_period(start, "month")
+
+
+def _utc_literal(day: date) -> str:
+    # Bounds are UTC midnights, matching the UTC days of the rollup table
+    return f"'{day.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(connection: Connection) -> bool:
+    """
+    Tell whether the expenses table exists and is a partitioned table.
+    """
+    kind = connection.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('expenses')")).scalar()
+    return kind == "p"
+
+
+def list_partitions(connection: Connection) -> List[Tuple[str, int]]:
+    """
+    List the partitions of the expenses table, in name order.
+
+    Returns:
+        List[Tuple[str, int]]: (partition name, estimated row count) pairs.
+    """
+    return [
+        (row.name, max(int(row.estimate), 0))
+        for row in connection.execute(text(
+            "SELECT c.relname AS name, c.reltuples AS estimate FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'expenses'::regclass ORDER BY c.relname"
+        ))
+    ]
+
+
+def create_partition(connection: Connection, start: date, interval: str) -> bool:
+    """
+    Create the partition for the period starting on `start`, if it does not exist yet.
+
+    Rows of that period already sitting in the default partition are moved into the new
+    partition before it is attached, since PostgreSQL refuses to attach a range the default
+    partition still holds rows of.
+
+    Args:
+        connection (Connection): A connection inside the caller's transaction.
+        start (date): The first day of the period.
+        interval (str): "month" or "year".
+
+    Returns:
+        bool: True if the partition was created.
+    """
+    name = partition_name(start, interval)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+
+    lower, upper = _utc_literal(start), _utc_literal(next_period(start, interval))
+    connection.execute(text(f"CREATE TABLE {name} (LIKE expenses INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= {lower} AND date < {upper} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    connection.execute(text(f"ALTER TABLE expenses ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    return True
+
+
+def ensure_partitions(
+    connection: Connection, first: Optional[date] = None, premake: int = EXPENSE_PARTITION_PREMAKE
+) -> List[str]:
+    """
+    Create the default partition and every missing partition from `first` up to `premake` periods ahead.
+
+    Every worker process calls this on startup; a transaction-scoped advisory lock makes them take
+    turns, so only the first one creates anything.
+
+    Args:
+        connection (Connection): A connection inside the caller's transaction.
+        first (Optional[date]): The earliest day to cover; defaults to today (UTC).
+        premake (int): How many periods after the current one to create ahead of time.
+
+    Returns:
+        List[str]: The names of the partitions created.
+
+    Raises:
+        RuntimeError: If the expenses table exists but is not partitioned.
+    """
+    if not is_partitioned(connection):
+        raise RuntimeError(
+            "EXPENSE_PARTITION_INTERVAL is set but the expenses table is not partitioned; "
+            "run `python -m app.services.partitions migrate`"
+        )
+    interval = EXPENSE_PARTITION_INTERVAL
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('expenses_partitions'))"))
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF expenses DEFAULT"))
+
+    today = datetime.now(timezone.utc).date()
+    start = period_start(min(first or today, today), interval)
+    last = period_start(today, interval)
+    for _ in range(premake):
+        last = next_period(last, interval)
+
+    created = []
+    while start <= last:
+        if create_partition(connection, start, interval):
+            created.append(partition_name(start, interval))
+        start = next_period(start, interval)
+    return created
+
+
+def migrate_to_partitioned(connection: Connection, keep_old: bool = False) -> int:
+    """
+    Convert an unpartitioned expenses table into the partitioned layout and copy its rows over.
+
+    The old table is renamed out of the way (with its indexes and ID sequence, whose names the new
+    table reuses), the partitioned table is created from the model, partitions covering the oldest
+    expense onwards are added and the rows are copied in one INSERT ... SELECT. The ID sequence
+    continues after the highest existing ID. Everything runs in the caller's transaction, holding
+    an exclusive lock on the table, so the application sees either the old or the new layout.
+
+    Args:
+        connection (Connection): A connection inside the caller's transaction.
+        keep_old (bool): Keep the old table as `expenses_unpartitioned` instead of dropping it.
+
+    Returns:
+        int: The number of expenses copied; 0 if the table was already partitioned or did not exist
+        yet, in which case it is created partitioned.
+    """
+    if is_partitioned(connection):
+        return 0
+    if connection.execute(text("SELECT to_regclass('expenses')")).scalar() is None:
+        Base.metadata.create_all(connection)
+        ensure_partitions(connection)
+        return 0
+
+    connection.execute(text("LOCK TABLE expenses IN ACCESS EXCLUSIVE MODE"))
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('expenses', 'id')")).scalar()
+    connection.execute(text("ALTER TABLE expenses RENAME TO expenses_unpartitioned"))
+    for (index,) in connection.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'expenses_unpartitioned'"
+    )).all():
+        connection.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:50]}_unpartitioned"'))
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO expenses_unpartitioned_id_seq"))
+
+    ExpenseModel.__table__.create(connection)
+    oldest = connection.execute(text("SELECT min(date) FROM expenses_unpartitioned")).scalar()
+    ensure_partitions(connection, oldest.astimezone(timezone.utc).date() if oldest else None)
+
+    columns = ", ".join(column.name for column in ExpenseModel.__table__.columns)
+    copied = connection.execute(text(
+        f"INSERT INTO expenses ({columns}) SELECT {columns} FROM expenses_unpartitioned"
+    )).rowcount
+    connection.execute(text(
+        "SELECT setval(pg_get_serial_sequence('expenses', 'id'), (SELECT max(id) FROM expenses), true)"
+    ))
+    if not keep_old:
+        connection.execute(text("DROP TABLE expenses_unpartitioned"))
+    return copied
+
+
+def detach_partitions(connection: Connection, before: date) -> List[str]:
+    """
+    Detach every partition whose period ends on or before `before`, keeping its rows in a standalone table.
+
+    Detaching only changes the catalog, however large the partition is. The detached expenses are
+    then treated like deleted ones: their owners' data versions are bumped, tombstones are written
+    for the change feed and their days are removed from the rollups. The detached table can be
+    dumped and dropped, or attached again with ATTACH PARTITION (followed by a rollup rebuild).
+
+    Args:
+        connection (Connection): A connection inside the caller's transaction.
+        before (date): Partitions ending after this day are kept.
+
+    Returns:
+        List[str]: The names of the detached partitions.
+    """
+    detached = []
+    for name, _ in list_partitions(connection):
+        bounds = partition_bounds(name)
+        if bounds is None or bounds[1] > before:
+            continue
+        start, end = bounds
+
+        # Lock the owners' rows before the table, in the order expense writes take them
+        connection.execute(text(
+            f"UPDATE users SET data_version = data_version + 1 WHERE id IN (SELECT DISTINCT user_id FROM {name})"
+        ))
+        connection.execute(text(f"ALTER TABLE expenses DETACH PARTITION {name}"))
+        connection.execute(text(
+            "INSERT INTO expense_tombstones (user_id, expense_id, change_seq, deleted_at) "
+            f"SELECT e.user_id, e.id, u.data_version, now() FROM {name} e JOIN users u ON u.id = e.user_id "
+            "ON CONFLICT (user_id, expense_id) DO UPDATE "
+            "SET change_seq = excluded.change_seq, deleted_at = excluded.deleted_at"
+        ))
+        connection.execute(
+            text("DELETE FROM expense_daily_rollups WHERE day >= :start AND day < :end"),
+            {"start": start, "end": end},
+        )
+        detached.append(name)
+    return detached
+
+
+def main(argv=None) -> int:
+    """
+    Command-line entry point: `python -m app.services.partitions {migrate,premake,detach,list}`.
+
+    Returns:
+        int: The process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Manage the date partitions of the expenses table.")
+    parser.add_argument("command", choices=["migrate", "premake", "detach", "list"])
+    parser.add_argument("--keep-old", action="store_true", help="migrate: keep the unpartitioned table")
+    parser.add_argument("--before", type=date.fromisoformat, help="detach: partitions ending on or before this day")
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "postgresql" or not EXPENSE_PARTITION_INTERVAL:
+        print("Partitioning needs a PostgreSQL database and EXPENSE_PARTITION_INTERVAL set to 'month' or 'year'.")
+        return 2
+    if args.command == "detach" and args.before is None:
+        parser.error("detach requires --before")
+
+    if args.command == "migrate":
+        with engine.begin() as connection:
+            copied = migrate_to_partitioned(connection, args.keep_old)
+        print(f"Copied {copied} expenses into the partitioned table.")
+        return 0
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        if args.command == "premake":
+            print(f"Created {len(ensure_partitions(connection))} partitions.")
+        elif args.command == "detach":
+            detached = detach_partitions(connection, args.before)
+            print(f"Detached {', '.join(detached) or 'no partitions'}.")
+        else:
+            for name, rows in list_partitions(connection):
+                print(f"{name:<24} ~{rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Date, and_, cast, delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, dialect_insert
+from app.models.expense import Expense as ExpenseModel
+from app.models.expense_rollup import ExpenseDailyRollup
+from app.models.user import User  # noqa: F401  (registers the mapper the expense relationship refers to)
+from app.services.schema import check_schema
+
+# Pending changes to the rollup table: (day, category ID) -> [amount delta, count delta]
+RollupDeltas = Dict[Tuple[date, int], list]
+
+
+def rollup_day(value: datetime) -> date:
+    """
+    Map an expense timestamp to the UTC day it is rolled up under.
+
+    Naive timestamps (as returned by SQLite) are taken to be in UTC already.
+
+    Args:
+        value (datetime): The expense date.
+
+    Returns:
+        date: The UTC calendar day of the timestamp.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def new_deltas() -> RollupDeltas:
+    """
+    Create an empty set of rollup changes to accumulate into with `add_expense_delta`.
+
+    Returns:
+        RollupDeltas: A mapping that starts every (day, category ID) key at a zero delta.
+    """
+    return defaultdict(lambda: [0.0, 0])
+
+
+def add_expense_delta(deltas: RollupDeltas, expense_date: datetime, category_id: int, amount: float, sign: int):
+    """
+    Record that one expense was added to (`sign=1`) or removed from (`sign=-1`) the rollup.
+
+    An update that moves an expense is recorded as the removal of its old values followed by
+    the addition of its new ones, which covers a changed date, category and amount alike.
+
+    Args:
+        deltas (RollupDeltas): The changes being accumulated for one transaction.
+        expense_date (datetime): The date of the expense.
+        category_id (int): The ID of the expense's category.
+        amount (float): The amount of the expense.
+        sign (int): 1 when the expense is added, -1 when it is removed.
+    """
+    entry = deltas[(rollup_day(expense_date), category_id)]
+    entry[0] += sign * amount
+    entry[1] += sign
+
+
+def apply_rollup_deltas(db: Session, user_id: int, deltas: RollupDeltas):
+    """
+    Write accumulated changes to the rollup table inside the caller's transaction.
+
+    All changed (day, category) rows are upserted with a single executemany statement. Rows whose
+    count drops to zero are removed so the table only holds days that still have expenses.
+
+    Args:
+        db (Session): The session of the transaction that changed the expenses.
+        user_id (int): The ID of the user who owns the changed expenses.
+        deltas (RollupDeltas): The changes accumulated with `add_expense_delta`.
+    """
+    changes = [
+        {"user_id": user_id, "day": day, "category_id": category_id, "total": amount, "count": count}
+        for (day, category_id), (amount, count) in deltas.items()
+        if count != 0 or amount != 0
+    ]
+    if not changes:
+        return
+
+    insert = dialect_insert(db, ExpenseDailyRollup)
+    db.execute(
+        insert.on_conflict_do_update(
+            index_elements=["user_id", "day", "category_id"],
+            set_={
+                "total": ExpenseDailyRollup.total + insert.excluded.total,
+                "count": ExpenseDailyRollup.count + insert.excluded.count,
+            },
+        ),
+        changes,
+    )
+
+    shrunk = [(c["day"], c["category_id"]) for c in changes if c["count"] < 0]
+    if shrunk:
+        db.execute(
+            delete(ExpenseDailyRollup).where(
+                ExpenseDailyRollup.user_id == user_id,
+                ExpenseDailyRollup.count <= 0,
+                or_(*(and_(ExpenseDailyRollup.day == day, ExpenseDailyRollup.category_id == category_id)
+                      for day, category_id in shrunk)),
+            )
+        )
+
+
+def _as_date(value) -> date:
+    """
+    Normalize a day returned by the database; SQLite's `date()` yields an ISO string.
+    """
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def utc_day(column, dialect_name: str):
+    """
+    Build the SQL equivalent of `rollup_day`: the UTC calendar day of a timestamp column.
+
+    Every query that groups or filters expenses by day goes through this expression, so the
+    rollups, their rebuild and the summaries agree on which day an expense falls on whatever the
+    session's time zone. On PostgreSQL the timestamp is converted to UTC explicitly; SQLite stores
+    timestamps as UTC text (see `ExpenseCreate`), so taking its date part is enough there.
+
+    Args:
+        column: A timezone-aware timestamp column, such as `Expense.date`.
+        dialect_name (str): The name of the SQLAlchemy dialect the query will run on.
+
+    Returns:
+        A SQL expression for the UTC day of `column`.
+    """
+    if dialect_name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    return func.date(column)
+
+
+def _base_totals_query(db: Session, user_id: Optional[int]):
+    """
+    Build the GROUP BY over the expenses table that the rollup table must match.
+
+    Args:
+        db (Session): The session the query will run on.
+        user_id (Optional[int]): Restrict to one user, or None for every user.
+
+    Returns:
+        Select: Rows of (user_id, day, category_id, total, count).
+    """
+    day = utc_day(ExpenseModel.date, db.get_bind().dialect.name)
+    stmt = select(
+        ExpenseModel.user_id,
+        day.label("day"),
+        ExpenseModel.category_id,
+        func.sum(ExpenseModel.amount).label("total"),
+        func.count(ExpenseModel.id).label("count"),
+    ).group_by(ExpenseModel.user_id, day, ExpenseModel.category_id)
+    if user_id is not None:
+        stmt = stmt.where(ExpenseModel.user_id == user_id)
+    return stmt
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollup table from the expenses table.
+
+    Existing rollup rows are deleted and re-inserted from a single INSERT ... SELECT, in one
+    transaction, so readers never observe a partially rebuilt table.
+
+    Args:
+        db (Session): The database session.
+        user_id (Optional[int]): Rebuild only this user's rows, or every user's when None.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    clear = delete(ExpenseDailyRollup)
+    if user_id is not None:
+        clear = clear.where(ExpenseDailyRollup.user_id == user_id)
+    db.execute(clear)
+
+    result = db.execute(
+        ExpenseDailyRollup.__table__.insert().from_select(
+            ["user_id", "day", "category_id", "total", "count"], _base_totals_query(db, user_id)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def verify_rollups(db: Session, user_id: Optional[int] = None, tolerance: float = 1e-6) -> list:
+    """
+    Compare the rollup table with totals recomputed from the expenses table.
+
+    Args:
+        db (Session): The database session.
+        user_id (Optional[int]): Check only this user's rows, or every user's when None.
+        tolerance (float): Largest accepted difference between stored and recomputed totals,
+            which absorbs floating-point drift from incremental updates.
+
+    Returns:
+        list: One (user_id, day, category_id, expected, actual) tuple per mismatching key, where
+            expected and actual are (total, count) pairs or None when the row is missing.
+    """
+    expected = {
+        (row.user_id, _as_date(row.day), row.category_id): (row.total, row.count)
+        for row in db.execute(_base_totals_query(db, user_id))
+    }
+
+    stored_query = select(ExpenseDailyRollup)
+    if user_id is not None:
+        stored_query = stored_query.where(ExpenseDailyRollup.user_id == user_id)
+    actual = {
+        (r.user_id, r.day, r.category_id): (r.total, r.count)
+        for r in db.execute(stored_query).scalars()
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys(), key=str):
+        want, have = expected.get(key), actual.get(key)
+        if want is None or have is None or want[1] != have[1] or abs(want[0] - have[0]) > tolerance:
+            mismatches.append((*key, want, have))
+    return mismatches
+
+
+def main(argv=None) -> int:
+    """
+    Command-line entry point: `python -m app.services.rollups {rebuild,verify} [--user-id ID]`.
+
+    Returns:
+        int: The process exit code; 1 when the database schema is not at the expected revision
+        (run `python -m app.services.schema upgrade` first) or `verify` finds mismatches.
+    """
+    parser = argparse.ArgumentParser(description="Rebuild or verify the expense daily rollup table.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user-id", type=int, default=None, help="Only process this user")
+    args = parser.parse_args(argv)
+
+    try:
+        # The tables are the migrations' to create; running against an older schema would fail midway
+        check_schema()
+    except RuntimeError as exc:
+        print(exc)
+        return 1
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild_rollups(db, args.user_id)} rollup rows.")
+            return 0
+
+        mismatches = verify_rollups(db, args.user_id)
+        for user_id, day, category_id, want, have in mismatches:
+            print(f"user={user_id} day={day} category_id={category_id} expected={want} stored={have}")
+        print(f"{len(mismatches)} mismatching rollup rows.")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse
+import logging
+import os
+import sys
+from typing import Optional
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from app.core.config import EXPENSE_PARTITION_INTERVAL
+from app.core.database import engine
+
+# Schema versioning with Alembic.
+#
+# The migration scripts live in backend/migrations. SCHEMA_REVISION is the revision this build of
+# the application is written against; every new migration must set it to its own revision ID
+# (`check` fails otherwise). Application workers only compare it with the database's
+# alembic_version row on startup: one query, no reflection of the schema, and Alembic itself is
+# never imported by them.
+#
+# Migrations run through `python -m app.services.schema`, once per deploy and before the workers:
+#   upgrade [--revision R]   apply pending migrations up to head (or R) and create date partitions
+#   current                  print the revision the database is at
+#   check                    fail unless the database is at SCHEMA_REVISION and it is the head
+
+SCHEMA_REVISION = "0005_sqlite_microsecond_dates"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI = os.path.join(BACKEND_DIR, "alembic.ini")
+
+
+def current_revision(connection: Connection) -> Optional[str]:
+    """
+    Return the revision the database is at, or None if it has never been migrated.
+    """
+    if not inspect(connection).has_table("alembic_version"):
+        return None
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def check_schema(bind: Engine = engine) -> str:
+    """
+    Make sure the database is at the schema revision this build expects.
+
+    Args:
+        bind (Engine): The engine of the database to check.
+
+    Returns:
+        str: The database's revision.
+
+    Raises:
+        RuntimeError: If the database is at another revision or has never been migrated.
+    """
+    with bind.connect() as connection:
+        revision = current_revision(connection)
+    if revision != SCHEMA_REVISION:
+        raise RuntimeError(
+            f"The database schema is at revision {revision or '(none)'} but this build expects "
+            f"{SCHEMA_REVISION}; run `python -m app.services.schema upgrade`"
+        )
+    return revision
+
+
+def alembic_config():
+    """
+    Build the Alembic configuration from backend/alembic.ini, leaving the caller's logging alone.
+    """
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def head_revision() -> str:
+    """
+    Return the newest revision among the migration scripts.
+    """
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def upgrade(revision: str = "head"):
+    """
+    Apply the pending migrations up to `revision`.
+
+    Safe to run from several processes at once on PostgreSQL, where migrations/env.py serializes
+    them with an advisory lock.
+
+    Args:
+        revision (str): The target revision.
+    """
+    from alembic import command
+
+    command.upgrade(alembic_config(), revision)
+
+
+def main(argv=None) -> int:
+    """
+    Command-line entry point: `python -m app.services.schema {upgrade,current,check}`.
+
+    Returns:
+        int: The process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Migrate the database schema.")
+    parser.add_argument("command", choices=["upgrade", "current", "check"])
+    parser.add_argument("--revision", default="head", help="upgrade: the revision to migrate to")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "upgrade":
+        upgrade(args.revision)
+        if EXPENSE_PARTITION_INTERVAL:
+            from app.services.partitions import ensure_partitions
+
+            with engine.begin() as connection:
+                ensure_partitions(connection)
+        with engine.connect() as connection:
+            print(f"Database schema is at revision {current_revision(connection)}.")
+        return 0
+
+    if args.command == "current":
+        with engine.connect() as connection:
+            print(current_revision(connection) or "(none)")
+        return 0
+
+    head = head_revision()
+    if head != SCHEMA_REVISION:
+        print(f"SCHEMA_REVISION is {SCHEMA_REVISION} but the newest migration is {head}.")
+        return 1
+    try:
+        check_schema()
+    except RuntimeError as exc:
+        print(exc)
+        return 1
+    print(f"Database schema is at revision {head}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+from typing import List
+
+from sqlalchemy import Row, case, func, literal, or_
+from sqlalchemy.orm import Session
+
+from app.core.filters import ExpenseFilters
+from app.models.category import Category
+from app.models.expense import EXPENSE_SEARCH_CONFIG, EXPENSE_SEARCH_DOCUMENT, Expense as ExpenseModel
+from app.services.expenses import select_expense_rows
+
+
+def _postgres_search(query: str):
+    """
+    Build the match conditions and rank of a PostgreSQL search.
+
+    An expense matches when its description matches the query as full text (stemmed words,
+    quoted phrases, "-" exclusions), or when the query is word-similar to its description or
+    category name. Word similarity compares trigrams, so it tolerates typos and matches prefixes
+    ("ube" finds "Uber"). All three conditions are answered by the GIN indexes declared on
+    the Expense and Category models. The rank is the best of the full-text rank and the two similarities.
+    """
+    tsquery = func.websearch_to_tsquery(EXPENSE_SEARCH_CONFIG, query)
+    term = literal(query)
+    conditions = [or_(
+        EXPENSE_SEARCH_DOCUMENT.op("@@")(tsquery),
+        term.op("<%")(ExpenseModel.description),
+        term.op("<%")(Category.name),
+    )]
+    rank = func.greatest(
+        func.ts_rank_cd(EXPENSE_SEARCH_DOCUMENT, tsquery),
+        func.word_similarity(term, ExpenseModel.description),
+        func.word_similarity(term, Category.name),
+    )
+    return conditions, rank
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fallback_search(query: str):
+    """
+    Build the match conditions and rank of a search on databases without PostgreSQL's text search.
+
+    Every word of the query must occur in the description or the category, case-insensitively.
+    Expenses whose category starts with the query rank first. This scans the user's expenses,
+    which is acceptable for the SQLite databases used in development.
+    """
+    conditions = [
+        or_(
+            ExpenseModel.description.ilike(f"%{_escape_like(word)}%", escape="\\"),
+            Category.name.ilike(f"%{_escape_like(word)}%", escape="\\"),
+        )
+        for word in query.split()
+    ]
+    rank = case((Category.name.ilike(f"{_escape_like(query)}%", escape="\\"), 1), else_=0)
+    return conditions, rank
+
+
+def search_expenses(db: Session, user_id: int, query: str, filters: ExpenseFilters, limit: int) -> List[Row]:
+    """
+    Find the user's expenses whose description or category matches a free-text query.
+
+    Results are ordered by relevance, then newest first, and can be narrowed with the usual
+    expense filters.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose expenses are searched.
+        query (str): The text typed by the user.
+        filters (ExpenseFilters): Optional date-range, category and amount-range filters.
+        limit (int): Maximum number of results.
+
+    Returns:
+        List[Row]: The best matches, as rows with the `ExpenseRead` fields.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if db.get_bind().dialect.name == "postgresql":
+        conditions, rank = _postgres_search(query)
+    else:
+        conditions, rank = _fallback_search(query)
+
+    stmt = filters.apply(select_expense_rows().where(ExpenseModel.user_id == user_id, *conditions), user_id)
+    stmt = stmt.order_by(rank.desc(), ExpenseModel.date.desc(), ExpenseModel.id.desc()).limit(limit)
+    return db.execute(stmt).all()
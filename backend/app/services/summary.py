@@ -0,0 +1,193 @@
+from datetime import datetime, time, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, cast, func, literal_column
+from sqlalchemy.orm import Session
+
+from app.core.filters import ExpenseFilters
+from app.models.category import Category, category_id_query
+from app.models.expense import Expense as ExpenseModel
+from app.models.expense_rollup import ExpenseDailyRollup
+from app.services.rollups import rollup_day, utc_day
+
+TIME_BUCKETS = ("day", "week", "month")
+
+
+def bucket_key(day, bucket: str, dialect_name: str):
+    """
+    Build a SQL expression that maps a day to the ISO date of its day, week or month bucket.
+
+    Weeks start on Monday. The expression is evaluated by the database, so grouping happens
+    in SQL on both PostgreSQL and the SQLite stand-in used in development. It takes a date rather
+    than a timestamp, so the session's time zone plays no part: pass the rollup's `day` or the
+    `utc_day` of an expense.
+
+    Args:
+        day: The date column or expression to bucket.
+        bucket (str): One of "day", "week" or "month".
+        dialect_name (str): The name of the SQLAlchemy dialect the query will run on.
+
+    Returns:
+        A SQL expression producing the bucket's first day as a "YYYY-MM-DD" string.
+    """
+    # The constants are rendered inline rather than bound, so the expression in the SELECT list
+    # and the one in GROUP BY are textually identical, which PostgreSQL requires.
+    if dialect_name == "postgresql":
+        # Truncate a plain timestamp: date_trunc would turn a date into a timestamptz at midnight
+        # in the session's time zone
+        return func.to_char(
+            func.date_trunc(literal_column(f"'{bucket}'"), cast(day, DateTime)), literal_column("'YYYY-MM-DD'")
+        )
+
+    if bucket == "day":
+        return func.strftime(literal_column("'%Y-%m-%d'"), day)
+    if bucket == "week":
+        # 'weekday 0' moves forward to the next Sunday (or stays on one), so six days back is Monday
+        return func.date(day, literal_column("'weekday 0'"), literal_column("'-6 days'"))
+    return func.strftime(literal_column("'%Y-%m-01'"), day)
+
+
+def _is_day_boundary(value: Optional[datetime]) -> bool:
+    """
+    Tell whether a date bound is absent or falls on a UTC midnight, i.e. can be answered from daily rollups.
+    """
+    if value is None:
+        return True
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.time() == time(0)
+
+
+def can_use_rollup(filters: ExpenseFilters) -> bool:
+    """
+    Tell whether a summary with these filters can be served from the daily rollup table.
+
+    The rollup holds whole UTC days per category, so it can answer category and day-aligned
+    date-range filters, but not amount ranges or bounds that cut through a day.
+
+    Args:
+        filters (ExpenseFilters): The filters of the summary request.
+
+    Returns:
+        bool: True if `summarize_rollup` gives the same totals as `summarize`.
+    """
+    return (
+        filters.min_amount is None
+        and filters.max_amount is None
+        and _is_day_boundary(filters.date_from)
+        and _is_day_boundary(filters.date_to)
+    )
+
+
+def summarize_rollup(db: Session, user_id: int, group_by: str, filters: ExpenseFilters) -> dict:
+    """
+    Compute per-group SUM/COUNT from the daily rollup table instead of the expenses table.
+
+    The query reads one row per (day, category) the user has expenses in, independent of how many
+    expenses that is. Categories are grouped by their integer ID and joined only for their names.
+    Per-expense extremes are not kept in the rollup, so `min` and `max` are None.
+    Only call this when `can_use_rollup(filters)` holds.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose expenses are summarized.
+        group_by (str): "category", or one of the time buckets "day", "week" and "month".
+        filters (ExpenseFilters): Category and day-aligned date-range filters.
+
+    Returns:
+        dict: Data matching the `ExpenseSummary` schema.
+    """
+    total = func.sum(ExpenseDailyRollup.total)
+    if group_by == "category":
+        key = Category.name
+        group = (ExpenseDailyRollup.category_id, Category.name)
+    else:
+        key = bucket_key(ExpenseDailyRollup.day, group_by, db.get_bind().dialect.name)
+        group = (key,)
+
+    query = db.query(
+        key.label("key"),
+        total.label("total"),
+        func.sum(ExpenseDailyRollup.count).label("count"),
+    ).select_from(ExpenseDailyRollup).filter(ExpenseDailyRollup.user_id == user_id)
+    if group_by == "category":
+        query = query.join(Category, Category.id == ExpenseDailyRollup.category_id)
+
+    if filters.date_from is not None:
+        query = query.filter(ExpenseDailyRollup.day >= rollup_day(filters.date_from))
+    if filters.date_to is not None:
+        query = query.filter(ExpenseDailyRollup.day < rollup_day(filters.date_to))
+    if filters.category is not None:
+        query = query.filter(ExpenseDailyRollup.category_id == category_id_query(user_id, filters.category))
+
+    query = query.group_by(*group)
+    query = query.order_by(key) if group_by in TIME_BUCKETS else query.order_by(total.desc())
+    return _summary(group_by, [dict(row._mapping) for row in query.all()])
+
+
+def _summary(group_by: str, buckets: list) -> dict:
+    """
+    Wrap grouped rows into the `ExpenseSummary` shape, adding the overall total and count.
+    """
+    return {
+        "group_by": group_by,
+        "buckets": buckets,
+        "total": sum(b["total"] for b in buckets),
+        "count": sum(b["count"] for b in buckets),
+    }
+
+
+def summarize(db: Session, user_id: int, group_by: str, filters: ExpenseFilters) -> dict:
+    """
+    Compute per-group SUM/COUNT/MIN/MAX of the user's expenses with a single GROUP BY query.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose expenses are summarized.
+        group_by (str): "category", or one of the time buckets "day", "week" and "month".
+        filters (ExpenseFilters): Filters restricting which expenses are summarized.
+
+    Returns:
+        dict: Data matching the `ExpenseSummary` schema.
+    """
+    total = func.sum(ExpenseModel.amount)
+    if group_by == "category":
+        key = Category.name
+        group = (ExpenseModel.category_id, Category.name)
+    else:
+        dialect_name = db.get_bind().dialect.name
+        key = bucket_key(utc_day(ExpenseModel.date, dialect_name), group_by, dialect_name)
+        group = (key,)
+
+    query = db.query(
+        key.label("key"),
+        total.label("total"),
+        func.count(ExpenseModel.id).label("count"),
+        func.min(ExpenseModel.amount).label("min"),
+        func.max(ExpenseModel.amount).label("max"),
+    ).select_from(ExpenseModel).filter(ExpenseModel.user_id == user_id)
+    if group_by == "category":
+        query = query.join(Category, Category.id == ExpenseModel.category_id)
+    query = filters.apply(query, user_id).group_by(*group)
+    query = query.order_by(key) if group_by in TIME_BUCKETS else query.order_by(total.desc())
+
+    return _summary(group_by, [dict(row._mapping) for row in query.all()])
+
+
+def expense_summary(db: Session, user_id: int, group_by: str, extremes: bool, filters: ExpenseFilters) -> dict:
+    """
+    Summarize from the daily rollups when possible, and from the expenses table otherwise.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose expenses are summarized.
+        group_by (str): "category", "day", "week" or "month".
+        extremes (bool): Whether per-group min/max are required, which only the expenses table has.
+        filters (ExpenseFilters): Filters restricting which expenses are summarized.
+
+    Returns:
+        dict: Data matching the `ExpenseSummary` schema.
+    """
+    if not extremes and can_use_rollup(filters):
+        return summarize_rollup(db, user_id, group_by, filters)
+    return summarize(db, user_id, group_by, filters)
@@ -0,0 +1,117 @@
+from typing import Optional
+
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS
+from app.core.database import dialect_insert
+from app.models.user import User
+
+# Users resolved from a token subject by get_current_user, keyed by that subject. Tokens issued by
+# dev-login carry the numeric user ID and Google-issued ones the email, so one user may sit under
+# two keys. ORM changes to a user drop its entries through the listeners in app/core/security.py.
+# The cached snapshot leaves out the data version, so `bump_data_version` need not drop anything.
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int, email: Optional[str] = None):
+    """
+    Drop a user from the authenticated-user cache under both of its subject formats.
+
+    Args:
+        user_id (int): The ID of the user whose row changed.
+        email (Optional[str]): The user's email, if it may be cached under it.
+    """
+    user_cache.delete(str(user_id))
+    if email:
+        user_cache.delete(email)
+
+
+def find_user_by_subject(db: Session, sub: str) -> Optional[User]:
+    """
+    Look up the user a token subject refers to.
+
+    Tokens issued by dev-login carry the numeric user ID as subject, while Google-issued
+    ones carry the email address.
+
+    Args:
+        db (Session): The database session.
+        sub (str): The `sub` claim of a decoded access token.
+
+    Returns:
+        Optional[User]: The matching user, or None if there is none.
+    """
+    try:
+        user_id = int(sub)
+        query = select(User).where(User.id == user_id)
+    except ValueError:
+        # If not a number, assume it's an email (Google login case)
+        query = select(User).where(User.email == sub)
+    return db.execute(query).scalars().first()
+
+
+def get_or_create_user(db: Session, email: str, full_name: Optional[str] = None) -> Row:
+    """
+    Return the user with the given email, creating them first if they do not exist yet.
+
+    An existing user costs one indexed SELECT, which neither writes nor locks their row. A new
+    one is added with INSERT ... ON CONFLICT (email) DO NOTHING ... RETURNING; if a concurrent
+    login created the user first, the insert returns nothing and the row is selected again.
+
+    Args:
+        db (Session): The database session.
+        email (str): The user's email address.
+        full_name (Optional[str]): The name stored when the user is created.
+
+    Returns:
+        Row: The existing or newly created user's `id`, `email` and `full_name`.
+    """
+    existing = select(User.id, User.email, User.full_name).where(User.email == email)
+    user = db.execute(existing).first()
+    if user is None:
+        user = db.execute(
+            dialect_insert(db, User).values(email=email, full_name=full_name)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id, User.email, User.full_name)
+        ).first() or db.execute(existing).one()
+        db.commit()
+    return user
+
+
+def bump_data_version(db: Session, user_id: int) -> int:
+    """
+    Increment the user's data version inside the caller's transaction.
+
+    Every write to a user's expenses calls this before committing, so the version changes
+    exactly when the data behind the user's listings and summaries does. The UPDATE also
+    locks the user's row until commit, which orders concurrent writes by the same user.
+
+    Args:
+        db (Session): The session of the transaction that changes the expenses.
+        user_id (int): The ID of the user whose expenses change.
+
+    Returns:
+        int: The new data version.
+    """
+    return db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+        .returning(User.data_version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    """
+    Read the user's current data version with a single primary-key lookup.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The user's data version.
+    """
+    return db.execute(select(User.data_version).where(User.id == user_id)).scalar_one()
@@ -0,0 +1,376 @@
+"""
+Load-test the API in-process against a freshly seeded database.
+
+The script boots `app.main:app` (running its startup handler, which migrates the empty
+database, so tables, rollups and partitions are set up exactly as in production), seeds `--users`
+users with `--expenses` expenses each, then drives the auth and expense endpoints from
+`--concurrency` concurrent clients through httpx's ASGI transport. Every request is timed and the
+SQL statements it executes are counted. For each concurrency level and endpoint the script
+reports throughput, p50/p95/p99 latency, error count and queries per request, as a table and
+optionally as JSON for comparison with a baseline.
+
+Client and server share one process and event loop, so the numbers are meant for comparing two
+revisions on the same machine, not as the capacity of a deployment.
+
+Run from the backend directory:
+
+    python -m benchmarks.load [--database-url URL] [--users 20] [--expenses 500]
+                              [--concurrency 1 8 32] [--requests 2000] [--seed 1]
+                              [--output results.json] [--compare baseline.json]
+
+Without `--database-url` a temporary SQLite database is used. A PostgreSQL URL must point to an
+empty database: its tables are created and seeded. Set USE_ASYNC_DB=1 to benchmark the async
+routers, and RATE_LIMIT_ENABLED=1 to include the per-user rate limits.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Category names with their share of expenses and a typical amount
+CATEGORIES = [
+    ("Groceries", 0.28, 45.0),
+    ("Transport", 0.16, 12.0),
+    ("Eating Out", 0.15, 28.0),
+    ("Bills", 0.08, 90.0),
+    ("Shopping", 0.10, 60.0),
+    ("Entertainment", 0.07, 35.0),
+    ("Health", 0.05, 40.0),
+    ("Travel", 0.03, 400.0),
+    ("Rent", 0.02, 1200.0),
+    ("Other", 0.06, 20.0),
+]
+
+DESCRIPTIONS = ["", "weekly shop", "bus pass", "lunch with team", "electricity", "gift", "cinema", "pharmacy"]
+
+# Operation -> default share of the request mix
+DEFAULT_MIX = {
+    "login": 5,
+    "list": 45,
+    "list_filtered": 15,
+    "create": 15,
+    "update": 12,
+    "delete": 5,
+    "google_login": 3,
+}
+
+# Statements executed by the request currently being handled, counted by an engine event. The
+# list is shared with the threadpool (sync endpoints) because threads receive a copy of the context.
+_query_count: ContextVar[Optional[list]] = ContextVar("benchmark_query_count", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _configure_environment(args):
+    """
+    Point the app's configuration at the benchmark database. Must run before `app` is imported.
+    """
+    if args.database_url:
+        os.environ["Database_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="budgie-bench-"), "bench.sqlite3")
+        os.environ["Database_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    # The database is empty; let the startup handler create the schema through the migrations
+    os.environ.setdefault("DB_AUTO_MIGRATE", "true")
+    # The clients send far more than any user would; measure the endpoints, not the rate limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+def seed(users: int, expenses: int, rng: random.Random) -> Dict[str, List[int]]:
+    """
+    Insert `users` users with `expenses` expenses each, spread over the last two years.
+
+    Categories follow the shares in `CATEGORIES`, amounts are log-normally distributed around
+    each category's typical amount and dates cluster towards the recent past.
+
+    Returns:
+        Dict[str, List[int]]: The expense IDs of every user, by email.
+    """
+    from sqlalchemy import insert, select
+
+    from app.core.database import SessionLocal
+    from app.models.category import Category, category_key
+    from app.models.expense import Expense
+    from app.models.user import User
+    from app.services.rollups import rebuild_rollups
+
+    now = datetime.now(timezone.utc)
+    names, weights, typical = zip(*CATEGORIES)
+    owned = {}
+    db = SessionLocal()
+    try:
+        for u in range(users):
+            email = f"bench{u}@example.com"
+            user_id = db.execute(
+                insert(User).values(email=email, full_name=f"Bench User {u}", data_version=1).returning(User.id)
+            ).scalar_one()
+            category_ids = db.execute(
+                insert(Category).returning(Category.id, sort_by_parameter_order=True),
+                [{"user_id": user_id, "key": category_key(name), "name": name} for name in names],
+            ).scalars().all()
+
+            rows = []
+            for _ in range(expenses):
+                c = rng.choices(range(len(names)), weights)[0]
+                rows.append({
+                    "user_id": user_id,
+                    "category_id": category_ids[c],
+                    "amount": round(rng.lognormvariate(math.log(typical[c]), 0.5), 2),
+                    "description": rng.choice(DESCRIPTIONS) or None,
+                    "date": now - timedelta(days=730 * rng.random() ** 2, seconds=rng.randrange(86400)),
+                    "change_seq": 1,
+                })
+            db.execute(insert(Expense), rows)
+            owned[email] = db.execute(select(Expense.id).where(Expense.user_id == user_id)).scalars().all()
+        db.commit()
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    return owned
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LoadRun:
+    """
+    One benchmark pass at a fixed concurrency: workers draw operations from the mix until the
+    request budget is used up, and every request's latency, status and query count is recorded.
+    """
+
+    def __init__(self, client, tokens: Dict[str, str], owned: Dict[str, List[int]], mix: Dict[str, int], seed: int):
+        self.client = client
+        self.tokens = tokens
+        self.owned = owned
+        self.operations, self.weights = zip(*mix.items())
+        self.seed = seed
+        self.samples = defaultdict(list)  # endpoint -> [(latency seconds, queries, ok)]
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs):
+        counter = [0]
+        token = _query_count.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        finally:
+            _query_count.reset(token)
+        elapsed = time.perf_counter() - start
+        self.samples[endpoint].append((elapsed, counter[0], response.status_code < 400))
+        return response
+
+    async def _operation(self, rng: random.Random):
+        email = rng.choice(list(self.tokens))
+        headers = {"Authorization": f"Bearer {self.tokens[email]}"}
+        ids = self.owned[email]
+        operation = rng.choices(self.operations, self.weights)[0]
+
+        if operation == "login":
+            await self._request("POST /auth/dev-login", "POST", "/auth/dev-login", json={"email": email})
+        elif operation == "google_login":
+            await self._request("GET /auth/google/login", "GET", "/auth/google/login")
+        elif operation == "list":
+            response = await self._request("GET /expenses/", "GET", "/expenses/", headers=headers)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor and rng.random() < 0.3:
+                await self._request("GET /expenses/ (next page)", "GET", "/expenses/", headers=headers,
+                                    params={"after": cursor})
+        elif operation == "list_filtered":
+            date_from = datetime.now(timezone.utc) - timedelta(days=rng.choice((7, 30, 90)))
+            params = {"date_from": date_from.isoformat(), "category": rng.choice(CATEGORIES)[0].lower()}
+            await self._request("GET /expenses/ (filtered)", "GET", "/expenses/", headers=headers, params=params)
+        elif operation == "create":
+            name, _, typical = rng.choice(CATEGORIES)
+            response = await self._request("POST /expenses/", "POST", "/expenses/", headers=headers, json={
+                "amount": round(rng.lognormvariate(math.log(typical), 0.5), 2), "category": name,
+            })
+            if response.status_code == 200:
+                ids.append(response.json()["id"])
+        elif operation == "update" and ids:
+            name, _, typical = rng.choice(CATEGORIES)
+            await self._request("PUT /expenses/{id}", "PUT", f"/expenses/{rng.choice(ids)}", headers=headers, json={
+                "amount": round(rng.lognormvariate(math.log(typical), 0.5), 2), "category": name,
+                "description": rng.choice(DESCRIPTIONS) or None,
+            })
+        elif operation == "delete" and ids:
+            expense_id = ids.pop(rng.randrange(len(ids)))
+            await self._request("DELETE /expenses/{id}", "DELETE", f"/expenses/{expense_id}", headers=headers)
+
+    async def run(self, concurrency: int, requests: int) -> float:
+        """
+        Issue about `requests` operations from `concurrency` workers and return the wall time taken.
+        """
+        remaining = [requests]
+
+        async def worker(index: int):
+            rng = random.Random(f"{self.seed}-{concurrency}-{index}")
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                await self._operation(rng)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return time.perf_counter() - start
+
+    def report(self, concurrency: int, wall_time: float) -> List[dict]:
+        """
+        Summarize the recorded samples, one entry per endpoint.
+        """
+        results = []
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(s[0] * 1000 for s in samples)
+            queries = [s[1] for s in samples]
+            results.append({
+                "concurrency": concurrency,
+                "endpoint": endpoint,
+                "requests": len(samples),
+                "errors": sum(1 for s in samples if not s[2]),
+                "throughput_rps": round(len(samples) / wall_time, 2),
+                "latency_ms": {
+                    "p50": round(_percentile(latencies, 50), 3),
+                    "p95": round(_percentile(latencies, 95), 3),
+                    "p99": round(_percentile(latencies, 99), 3),
+                    "mean": round(sum(latencies) / len(latencies), 3),
+                },
+                "queries_per_request": {
+                    "mean": round(sum(queries) / len(queries), 2),
+                    "max": max(queries),
+                },
+            })
+        return results
+
+
+async def run_benchmark(args) -> dict:
+    """
+    Boot the app, seed the database and run one load pass per concurrency level.
+    """
+    import httpx
+    from sqlalchemy import event
+
+    from app.core.config import USE_ASYNC_DB
+    from app.core.database import engine
+    from app.main import app, startup_event
+
+    startup_event()
+    event.listen(engine, "before_cursor_execute", _count_query)
+    if USE_ASYNC_DB:
+        from app.core.async_database import async_engine
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _count_query)
+
+    rng = random.Random(args.seed)
+    owned = seed(args.users, args.expenses, rng)
+    mix = dict(DEFAULT_MIX, **args.mix)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        tokens = {}
+        for email in owned:
+            response = await client.post("/auth/dev-login", json={"email": email})
+            response.raise_for_status()
+            tokens[email] = response.json()["access_token"]
+
+        for concurrency in args.concurrency:
+            load = LoadRun(client, tokens, owned, mix, args.seed)
+            await load.run(concurrency, max(args.requests // 10, concurrency))  # warm-up, not reported
+            load.samples.clear()
+            wall_time = await load.run(concurrency, args.requests)
+            results.extend(load.report(concurrency, wall_time))
+
+    if USE_ASYNC_DB:
+        # Pooled aiosqlite connections each own a thread that would keep the process alive
+        await async_engine.dispose()
+
+    return {
+        "config": {
+            "database": engine.dialect.name,
+            "async": USE_ASYNC_DB,
+            "users": args.users,
+            "expenses_per_user": args.expenses,
+            "requests": args.requests,
+            "seed": args.seed,
+            "mix": mix,
+        },
+        "results": results,
+    }
+
+
+def print_table(report: dict, baseline: Optional[dict] = None):
+    """
+    Print the results, with the change against `baseline` for matching rows when given.
+    """
+    previous = {(r["concurrency"], r["endpoint"]): r for r in (baseline or {}).get("results", [])}
+    print(f"{'conc':>4}  {'endpoint':<28} {'reqs':>6} {'err':>4} {'rps':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7}" + ("  p95 vs base" if baseline else ""))
+    for r in report["results"]:
+        line = (f"{r['concurrency']:>4}  {r['endpoint']:<28} {r['requests']:>6} {r['errors']:>4} "
+                f"{r['throughput_rps']:>9,.1f} {r['latency_ms']['p50']:>8.2f} {r['latency_ms']['p95']:>8.2f} "
+                f"{r['latency_ms']['p99']:>8.2f} {r['queries_per_request']['mean']:>7.2f}")
+        base = previous.get((r["concurrency"], r["endpoint"]))
+        if base and base["latency_ms"]["p95"]:
+            line += f"  {(r['latency_ms']['p95'] / base['latency_ms']['p95'] - 1) * 100:+10.1f}%"
+        print(line)
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"expected OPERATION=WEIGHT with OPERATION in {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to seed and benchmark; a temporary SQLite file by default")
+    parser.add_argument("--users", type=int, default=20, help="Number of seeded users")
+    parser.add_argument("--expenses", type=int, default=500, help="Seeded expenses per user")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent clients per pass")
+    parser.add_argument("--requests", type=int, default=2000, help="Operations per concurrency level")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the data and the request sequence")
+    parser.add_argument("--mix", type=_parse_mix, default={},
+                        help="Override operation weights, e.g. list=60,create=20 (operations: %s)" % ", ".join(DEFAULT_MIX))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a baseline run to compare p95 latencies against")
+    args = parser.parse_args(argv)
+
+    _configure_environment(args)
+    report = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Compare the two ways of rendering a page of expenses as JSON.
+
+"orm" is the path `GET /expenses/` used before: load ORM instances, validate each one through
+`ExpenseRead` and let the JSON response encode the result. "rows" is the current path: select
+plain column tuples and encode them with `dump_expense_rows`. For each page size the script
+checks that both produce the same bytes and prints rows per second and the peak memory
+allocated while rendering one page.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization [--rows 100 500 5000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# The app's modules read their configuration on import; an in-memory database is enough here
+os.environ.setdefault("Database_URL", "sqlite://")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.core.serialization import dump_expense_rows
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.user import User
+from app.schemas import ExpenseRead
+from app.services.expenses import select_expense_rows
+
+_expense_list = TypeAdapter(List[ExpenseRead])
+
+
+def seed(db: Session, count: int):
+    """
+    Insert one user with `count` expenses of varied amounts, categories and dates.
+    """
+    db.add(User(id=1, email="bench@example.com"))
+    names = ("food", "transport", "rent", "fun")
+    db.add_all(Category(id=i + 1, user_id=1, key=name, name=name) for i, name in enumerate(names))
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db.execute(Expense.__table__.insert(), [
+        {
+            "user_id": 1,
+            "amount": round(1 + (i * 7919 % 100000) / 100, 2),
+            "category_id": i % 4 + 1,
+            "description": None if i % 3 else f"expense number {i}",
+            "date": start + timedelta(minutes=17 * i),
+        }
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def render_orm(db: Session, limit: int) -> bytes:
+    expenses = db.query(Expense).filter(Expense.user_id == 1).order_by(
+        Expense.date.desc(), Expense.id.desc()
+    ).limit(limit).all()
+    content = _expense_list.dump_python(_expense_list.validate_python(expenses, from_attributes=True), mode="json")
+    # Encoded the way Starlette's JSONResponse renders a response model
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def render_rows(db: Session, limit: int) -> bytes:
+    rows = db.execute(
+        select_expense_rows()
+        .where(Expense.user_id == 1)
+        .order_by(Expense.date.desc(), Expense.id.desc())
+        .limit(limit)
+    ).all()
+    return dump_expense_rows(rows)
+
+
+def measure(render, db: Session, limit: int, repeat: int):
+    """
+    Return (rows per second, peak KiB allocated) for rendering one page of `limit` rows.
+    """
+    render(db, limit)  # warm up statement caches
+    best = float("inf")
+    for _ in range(repeat):
+        db.expunge_all()
+        start = time.perf_counter()
+        render(db, limit)
+        best = min(best, time.perf_counter() - start)
+
+    db.expunge_all()
+    tracemalloc.start()
+    render(db, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return limit / best, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 500, 5000], help="Page sizes to render")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per page size; the best one is reported")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, max(args.rows))
+
+        print(f"{'rows':>6}  {'path':<5}  {'rows/sec':>12}  {'peak KiB':>10}")
+        for limit in args.rows:
+            if render_orm(db, limit) != render_rows(db, limit):
+                raise SystemExit(f"Outputs differ for a page of {limit} rows")
+            for name, render in (("orm", render_orm), ("rows", render_rows)):
+                rate, peak = measure(render, db, limit, args.repeat)
+                print(f"{limit:>6}  {name:<5}  {rate:>12,.0f}  {peak:>10,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import event, text
+
+from app.core.database import Base, engine
+# Register every table on Base.metadata, so autogenerate compares the database with all models
+from app.models import category, expense, expense_rollup, expense_tombstone, job, user  # noqa: F401
+
+config = context.config
+
+# The alembic CLI configures logging from alembic.ini; the application keeps its own configuration
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Leave objects restricted to another dialect (the PostgreSQL search indexes) out of autogenerate.
+    """
+    ddl_if = getattr(obj, "_ddl_if", None)
+    return ddl_if is None or ddl_if.dialect in (None, context.get_context().dialect.name)
+
+
+def run_migrations_offline():
+    """
+    Emit the migrations as SQL on stdout (`alembic upgrade head --sql`) instead of running them.
+    """
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """
+    Run the migrations on the application's database in one transaction, so a failing migration
+    leaves the schema and the data as they were.
+
+    On PostgreSQL an advisory lock is held for the whole run, so deploy jobs started concurrently
+    take turns: the second one finds the schema already current and does nothing.
+    """
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            # pysqlite opens transactions only before DML and runs DDL outside of them; begin
+            # explicitly so the DDL is rolled back with the rest of a failed run
+            event.listen(connection, "begin", lambda conn: conn.exec_driver_sql("BEGIN"))
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite cannot alter most column and constraint definitions in place
+            render_as_batch=sqlite,
+            transactional_ddl=True,
+        )
+        with context.begin_transaction():
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('alembic_migrations'))"))
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,251 @@
+"""Baseline: the schema as of the switch from create_all to migrations
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+
+Databases created by `Base.metadata.create_all` before migrations existed already hold some or
+all of these tables, in the shape of whichever release created them. Such a database is adopted:
+missing tables are created, and existing tables get the columns and indexes they lack (through
+batch mode on SQLite, which cannot add most columns in place). A column that cannot be added to
+a table holding rows (one that is NOT NULL without a default) stops the upgrade with an error
+rather than stamping a database the application cannot use. A database from before the categories
+table, whose expenses still store category names, is converted on the way: the names become
+per-user categories, the rollups keyed by name are recreated (0004_backfill_rollups refills them)
+and every user's data version is bumped, so clients refetch the normalized names.
+"""
+from typing import Dict, List, Sequence, Tuple, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from app.core.config import EXPENSE_PARTITION_INTERVAL, SEARCH_TEXT_CONFIG
+from app.models.category import category_display_name, category_key
+
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# An index: (name, columns or expressions, keyword arguments of op.create_index)
+IndexSpec = Tuple[str, list, Dict]
+
+
+def _users() -> Tuple[List[sa.Column], List[IndexSpec]]:
+    columns = [
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("picture", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("data_version", sa.Integer(), nullable=False, server_default="0"),
+    ]
+    indexes = [
+        ("ix_users_id", ["id"], {}),
+        ("ix_users_email", ["email"], {"unique": True}),
+    ]
+    return columns, indexes
+
+
+def _categories(postgresql: bool) -> Tuple[List[sa.Column], List[IndexSpec]]:
+    columns = [
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.UniqueConstraint("user_id", "key", name="uq_categories_user_key"),
+    ]
+    indexes = []
+    if postgresql:
+        indexes.append(
+            ("ix_categories_name_trgm", ["name"], {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}})
+        )
+    return columns, indexes
+
+
+def _expenses(postgresql: bool) -> Tuple[List[sa.Column], List[IndexSpec]]:
+    # A partitioned table must include the partition key in its primary key
+    partitioned = postgresql and bool(EXPENSE_PARTITION_INTERVAL)
+    columns = [
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("date", sa.DateTime(timezone=True), server_default=sa.func.now(), primary_key=partitioned),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"),
+    ]
+    indexes = [
+        ("ix_expenses_id", ["id"], {}),
+        ("ix_expenses_user_date_id", ["user_id", "date", "id"], {}),
+        ("ix_expenses_user_change_seq", ["user_id", "change_seq"], {}),
+        ("ix_expenses_user_category_date_id", ["user_id", "category_id", "date", "id"], {}),
+    ]
+    if postgresql:
+        # Must match EXPENSE_SEARCH_DOCUMENT in app/models/expense.py for search queries to use it
+        config = sa.literal(SEARCH_TEXT_CONFIG).render_literal_execute()
+        indexes.append((
+            "ix_expenses_description_fts",
+            [sa.func.to_tsvector(config, sa.func.coalesce(sa.column("description"), sa.literal_column("''")))],
+            {"postgresql_using": "gin"},
+        ))
+        indexes.append((
+            "ix_expenses_description_trgm", ["description"],
+            {"postgresql_using": "gin", "postgresql_ops": {"description": "gin_trgm_ops"}},
+        ))
+    return columns, indexes
+
+
+def _expense_daily_rollups() -> Tuple[List[sa.Column], List[IndexSpec]]:
+    columns = [
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+    ]
+    return columns, []
+
+
+def _expense_tombstones() -> Tuple[List[sa.Column], List[IndexSpec]]:
+    columns = [
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("expense_id", sa.Integer(), primary_key=True),
+        sa.Column("change_seq", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ]
+    indexes = [("ix_expense_tombstones_user_change_seq", ["user_id", "change_seq"], {})]
+    return columns, indexes
+
+
+def _create_table(name: str, columns: list, indexes: List[IndexSpec], **kwargs):
+    op.create_table(name, *columns, **kwargs)
+    for index_name, index_columns, index_kwargs in indexes:
+        op.create_index(index_name, name, index_columns, **index_kwargs)
+
+
+def _column_names(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _adopt_table(name: str, columns: list, indexes: List[IndexSpec]):
+    """
+    Bring a table created before the migrations up to the baseline.
+
+    Missing columns are added when rows can take them (the column is nullable or has a server
+    default), and missing indexes are created by name. Anything else raises, so the database is
+    never stamped with a schema it does not have.
+    """
+    present = _column_names(name)
+    missing = [column for column in columns if isinstance(column, sa.Column) and column.name not in present]
+    unaddable = [
+        column.name for column in missing
+        if column.primary_key or (not column.nullable and column.server_default is None)
+    ]
+    if unaddable:
+        raise RuntimeError(
+            f"Cannot adopt the existing {name} table: it lacks the column(s) {', '.join(unaddable)}, "
+            "which cannot be added to a table holding rows"
+        )
+    if missing:
+        with op.batch_alter_table(name) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+    present_indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(name)}
+    for index_name, index_columns, index_kwargs in indexes:
+        if index_name not in present_indexes:
+            op.create_index(index_name, name, index_columns, **index_kwargs)
+
+
+def _convert_expense_categories():
+    """
+    Point expenses that store a category name at a row of the categories table instead.
+
+    Every distinct (user, name) becomes a category, merging spellings with the same
+    `category_key`; the most frequent spelling names it. The name column is then dropped.
+    """
+    bind = op.get_bind()
+    categories = sa.table("categories", sa.column("id"), sa.column("user_id"), sa.column("key"), sa.column("name"))
+    legacy = bind.execute(sa.text(
+        "SELECT user_id, category FROM expenses GROUP BY user_id, category ORDER BY user_id, COUNT(*) DESC"
+    )).all()
+
+    wanted = {}
+    for user_id, name in legacy:
+        wanted.setdefault((user_id, category_key(name)), category_display_name(name))
+    known = {
+        (row.user_id, row.key): row.id
+        for row in bind.execute(sa.select(categories.c.id, categories.c.user_id, categories.c.key))
+    }
+    missing = [
+        {"user_id": user_id, "key": key, "name": name}
+        for (user_id, key), name in wanted.items() if (user_id, key) not in known
+    ]
+    if missing:
+        bind.execute(categories.insert(), missing)
+        known = {
+            (row.user_id, row.key): row.id
+            for row in bind.execute(sa.select(categories.c.id, categories.c.user_id, categories.c.key))
+        }
+
+    with op.batch_alter_table("expenses") as batch_op:
+        # Named as PostgreSQL names the constraint of a freshly created table; batch mode requires a name
+        foreign_key = sa.ForeignKey("categories.id", name="expenses_category_id_fkey")
+        batch_op.add_column(sa.Column("category_id", sa.Integer(), foreign_key, nullable=True))
+    if legacy:
+        bind.execute(
+            sa.text("UPDATE expenses SET category_id = :category_id WHERE user_id = :user_id AND category = :category"),
+            [
+                {"category_id": known[(user_id, category_key(name))], "user_id": user_id, "category": name}
+                for user_id, name in legacy
+            ],
+        )
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.drop_column("category")
+        batch_op.alter_column("category_id", existing_type=sa.Integer(), nullable=False)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    postgresql = bind.dialect.name == "postgresql"
+    existing = set() if context.is_offline_mode() else set(sa.inspect(bind).get_table_names())
+    legacy_categories = "expenses" in existing and "category" in _column_names("expenses")
+    if "expense_daily_rollups" in existing and "category_id" not in _column_names("expense_daily_rollups"):
+        # Rollups keyed by category name; they are recreated and refilled by 0004_backfill_rollups
+        op.drop_table("expense_daily_rollups")
+        existing.discard("expense_daily_rollups")
+
+    if postgresql:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    tables = [
+        ("users", _users(), {}),
+        ("categories", _categories(postgresql), {}),
+        (
+            "expenses", _expenses(postgresql),
+            {"postgresql_partition_by": "RANGE (date)"} if postgresql and EXPENSE_PARTITION_INTERVAL else {},
+        ),
+        ("expense_daily_rollups", _expense_daily_rollups(), {}),
+        ("expense_tombstones", _expense_tombstones(), {}),
+    ]
+    for name, (columns, indexes), kwargs in tables:
+        if name == "expenses" and legacy_categories:
+            _convert_expense_categories()
+        if name in existing:
+            _adopt_table(name, columns, indexes)
+        else:
+            _create_table(name, columns, indexes, **kwargs)
+
+    if legacy_categories:
+        # Every category name may have changed spelling: make clients refetch all expenses
+        op.execute("UPDATE users SET data_version = data_version + 1")
+        op.execute(
+            "UPDATE expenses SET change_seq = (SELECT data_version FROM users WHERE users.id = expenses.user_id)"
+        )
+
+
+def downgrade() -> None:
+    for table in ("expense_tombstones", "expense_daily_rollups", "expenses", "categories", "users"):
+        op.drop_table(table)
@@ -0,0 +1,37 @@
+"""Add expenses.import_hash and its unique index, for deduplicating statement imports
+
+Revision ID: 0002_expense_import_hash
+Revises: 0001_baseline
+Create Date: 2026-10-18
+
+Remember to set SCHEMA_REVISION in app/services/schema.py to this revision.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.core.config import EXPENSE_PARTITION_INTERVAL
+
+revision: str = "0002_expense_import_hash"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A nullable column without a default is added without rewriting the table, and the index only
+    # holds the imported rows' hashes next to NULLs
+    op.add_column("expenses", sa.Column("import_hash", sa.String(32), nullable=True))
+    partitioned = op.get_bind().dialect.name == "postgresql" and bool(EXPENSE_PARTITION_INTERVAL)
+    op.create_index(
+        "uq_expenses_user_import_hash", "expenses",
+        ["user_id", "import_hash", *(["date"] if partitioned else [])],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_expenses_user_import_hash", table_name="expenses")
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.drop_column("import_hash")
@@ -0,0 +1,43 @@
+"""Add the jobs table of the background job runner
+
+Revision ID: 0003_jobs
+Revises: 0002_expense_import_hash
+Create Date: 2026-10-18
+
+Remember to set SCHEMA_REVISION in app/services/schema.py to this revision.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003_jobs"
+down_revision: Union[str, Sequence[str], None] = "0002_expense_import_hash"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(32), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("progress", sa.Float(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("cancel_requested", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_jobs_user_created_at", "jobs", ["user_id", "created_at"])
+    op.create_index("ix_jobs_status_heartbeat_at", "jobs", ["status", "heartbeat_at"])
+    op.create_index("ix_jobs_finished_at", "jobs", ["finished_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("jobs")
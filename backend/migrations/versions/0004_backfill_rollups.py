@@ -0,0 +1,39 @@
+"""Backfill the daily rollups from the expenses table
+
+Revision ID: 0004_backfill_rollups
+Revises: 0003_jobs
+Create Date: 2026-10-18
+
+The rollups are only maintained by expense writes, so databases whose expenses predate the rollup
+table (or were adopted by the baseline) hold expenses no rollup row counts, and summaries read
+from the rollups would leave them out. This recomputes every rollup row once, grouping by the UTC
+day exactly as `app.services.rollups.utc_day` does.
+
+Remember to set SCHEMA_REVISION in app/services/schema.py to this revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0004_backfill_rollups"
+down_revision: Union[str, Sequence[str], None] = "0003_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        day = "CAST(timezone('UTC', date) AS DATE)"
+    else:
+        day = "date(date)"
+    op.execute("DELETE FROM expense_daily_rollups")
+    op.execute(
+        "INSERT INTO expense_daily_rollups (user_id, day, category_id, total, count) "
+        f"SELECT user_id, {day}, category_id, SUM(amount), COUNT(id) FROM expenses "
+        f"GROUP BY user_id, {day}, category_id"
+    )
+
+
+def downgrade() -> None:
+    # The rollups stay valid; there is nothing to undo
+    pass
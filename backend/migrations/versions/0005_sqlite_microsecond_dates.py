@@ -0,0 +1,33 @@
+"""Store SQLite expense dates with microseconds
+
+Revision ID: 0005_sqlite_microsecond_dates
+Revises: 0004_backfill_rollups
+Create Date: 2026-10-18
+
+SQLite keeps dates as text. Dates written by the application carry microseconds
+("2024-01-05 10:00:00.000000"), but those filled in by the column's server default, as every
+expense created without a date used to be, do not ("2024-01-05 10:00:00"). A keyset cursor on
+such a row is bound in the longer form, which compares as later than the row itself, so the
+listing served the row again and again. This rewrites those dates in the application's form.
+PostgreSQL stores real timestamps and is left alone.
+
+Remember to set SCHEMA_REVISION in app/services/schema.py to this revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0005_sqlite_microsecond_dates"
+down_revision: Union[str, Sequence[str], None] = "0004_backfill_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE expenses SET date = date || '.000000' WHERE length(date) = 19")
+
+
+def downgrade() -> None:
+    # The longer form reads back as the same moment; there is nothing to undo
+    pass
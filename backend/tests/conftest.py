@@ -0,0 +1,27 @@
+import os
+
+# The application's engine is created on import; point it at a throwaway database
+os.environ.setdefault("Database_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.models import category, expense, expense_rollup, expense_tombstone, job, user  # noqa: E402,F401
+
+
+@pytest.fixture
+def db():
+    """
+    A session on a fresh in-memory SQLite database holding the full schema and one user (ID 1).
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(user.User(id=1, email="a@example.test"))
+        session.commit()
+        yield session
+    engine.dispose()
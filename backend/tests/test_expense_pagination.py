@@ -0,0 +1,63 @@
+import importlib.util
+from datetime import datetime, timezone
+from pathlib import Path
+
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import insert
+
+from app.core.filters import ExpenseFilters
+from app.models.expense import Expense as ExpenseModel
+from app.schemas import ExpenseCreate
+from app.services.expenses import create_expense, list_expenses_page
+
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations" / "versions"
+
+
+def _run_migration(db, name: str):
+    spec = importlib.util.spec_from_file_location(name, MIGRATIONS / f"{name}.py")
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(db.connection())):
+        migration.upgrade()
+
+
+def _no_filters() -> ExpenseFilters:
+    return ExpenseFilters(date_from=None, date_to=None, category=None, min_amount=None, max_amount=None)
+
+
+def _walk(db, limit: int) -> list:
+    """
+    Follow the cursors from the first page to the last, returning the IDs in the order served.
+    """
+    ids, after = [], None
+    for _ in range(100):
+        page, after = list_expenses_page(db, 1, _no_filters(), after, limit)
+        ids.extend(row.id for row in page)
+        if after is None:
+            return ids
+    raise AssertionError(f"Pagination did not finish; served {ids[:20]}...")
+
+
+def test_every_page_is_walked_once(db):
+    # Created without a date, at the same second, plus two dated rows sharing one timestamp
+    for amount in (1, 2, 3):
+        create_expense(db, 1, ExpenseCreate(amount=amount, category="Food"))
+    dated = datetime(2024, 1, 5, 10, 0, tzinfo=timezone.utc)
+    for amount in (4, 5):
+        create_expense(db, 1, ExpenseCreate(amount=amount, category="Food", date=dated))
+
+    assert sorted(_walk(db, limit=1)) == [1, 2, 3, 4, 5]
+    assert sorted(_walk(db, limit=2)) == [1, 2, 3, 4, 5]
+
+
+def test_rows_with_the_server_default_date_are_walked_once(db):
+    # Rows written before dates were always set by the application, in SQLite's own text form,
+    # brought to the application's form by migration 0005
+    create_expense(db, 1, ExpenseCreate(amount=1, category="Food"))
+    db.execute(insert(ExpenseModel), [{"user_id": 1, "amount": 2, "category_id": 1} for _ in range(3)])
+    db.commit()
+    _run_migration(db, "0005_sqlite_microsecond_dates")
+
+    assert sorted(_walk(db, limit=1)) == [1, 2, 3, 4]
@@ -0,0 +1,171 @@
+import asyncio
+import base64
+import time
+
+import httpx
+import pytest
+import rsa
+from fastapi import HTTPException
+from jose import jwt
+
+from app.services import google_oauth as google_oauth_module
+from app.services.google_oauth import JWKS_MIN_REFRESH_SECONDS, GoogleOAuthClient
+
+CLIENT_ID = "client-id.apps.googleusercontent.com"
+JWKS_URI = "https://keys.example.test/certs"
+
+
+def _b64url_uint(value: int) -> str:
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class SigningKey:
+    """
+    A locally generated RS256 key pair, published as a JWK under `kid`.
+    """
+
+    def __init__(self, kid: str):
+        self.kid = kid
+        self.public, self.private = rsa.newkeys(1024)
+
+    @property
+    def jwk(self) -> dict:
+        return {
+            "kty": "RSA", "alg": "RS256", "use": "sig", "kid": self.kid,
+            "n": _b64url_uint(self.public.n), "e": _b64url_uint(self.public.e),
+        }
+
+    def sign(self, kid=None, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234", "email": "a@x.com",
+            "iat": now, "exp": now + 300, **claims,
+        }
+        pem = self.private.save_pkcs1().decode()
+        return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid or self.kid})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class JWKSServer:
+    """
+    Serves the JWKS of `keys` and counts the requests made for it.
+    """
+
+    def __init__(self, *keys: SigningKey, max_age: int = 3600):
+        self.keys = list(keys)
+        self.max_age = max_age
+        self.requests = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        assert str(request.url) == JWKS_URI
+        self.requests += 1
+        return httpx.Response(
+            200, json={"keys": [key.jwk for key in self.keys]},
+            headers={"cache-control": f"public, max-age={self.max_age}"},
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(google_oauth_module, "time", fake)
+    return fake
+
+
+def _client(server: JWKSServer) -> GoogleOAuthClient:
+    return GoogleOAuthClient(client_id=CLIENT_ID, jwks_uri=JWKS_URI, transport=httpx.MockTransport(server.handler))
+
+
+def _verify(client: GoogleOAuthClient, *tokens: str) -> list:
+    """
+    Verify the tokens in order on one event loop; a rejected token yields its HTTPException.
+    """
+    async def run():
+        results = []
+        for token in tokens:
+            try:
+                results.append(await client.verify_id_token(token))
+            except HTTPException as exc:
+                results.append(exc)
+        await client.aclose()
+        return results
+
+    return asyncio.run(run())
+
+
+def test_valid_token_returns_claims(clock):
+    key = SigningKey("k1")
+    server = JWKSServer(key)
+
+    [claims] = _verify(_client(server), key.sign())
+
+    assert claims["sub"] == "1234"
+    assert claims["email"] == "a@x.com"
+    assert server.requests == 1
+
+
+@pytest.mark.parametrize("claims", [{"aud": "someone-else"}, {"iss": "https://evil.example.test"}])
+def test_wrong_audience_or_issuer_is_rejected(clock, claims):
+    key = SigningKey("k1")
+
+    [error] = _verify(_client(JWKSServer(key)), key.sign(**claims))
+
+    assert isinstance(error, HTTPException)
+    assert error.status_code == 401
+
+
+def test_forged_signature_is_rejected(clock):
+    key, forger = SigningKey("k1"), SigningKey("k1")
+
+    [error] = _verify(_client(JWKSServer(key)), forger.sign())
+
+    assert isinstance(error, HTTPException)
+    assert error.status_code == 401
+
+
+def test_keys_are_served_from_cache_until_they_expire(clock):
+    key = SigningKey("k1")
+    server = JWKSServer(key, max_age=600)
+    client = _client(server)
+
+    _verify(client, key.sign(), key.sign())
+    assert server.requests == 1
+
+    clock.now += 599
+    _verify(client, key.sign())
+    assert server.requests == 1
+
+    clock.now += 1
+    _verify(client, key.sign())
+    assert server.requests == 2
+
+
+def test_unknown_kid_triggers_one_rate_limited_refresh(clock):
+    old, new = SigningKey("old"), SigningKey("new")
+    server = JWKSServer(old)
+    client = _client(server)
+    _verify(client, old.sign())
+
+    # Google rotates its keys: the new kid is fetched once, well before the cached set expires
+    server.keys.append(new)
+    clock.now += JWKS_MIN_REFRESH_SECONDS
+    claims, again = _verify(client, new.sign(), new.sign())
+    assert claims["sub"] == again["sub"] == "1234"
+    assert server.requests == 2
+
+    # Tokens with made-up kids cannot force a refetch more often than every JWKS_MIN_REFRESH_SECONDS
+    first, second = _verify(client, new.sign(kid="bogus"), new.sign(kid="bogus"))
+    assert first.status_code == second.status_code == 401
+    assert server.requests == 2
+
+    clock.now += JWKS_MIN_REFRESH_SECONDS
+    _verify(client, new.sign(kid="bogus"))
+    assert server.requests == 3
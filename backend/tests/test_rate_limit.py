@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import rate_limit
+from app.core.kvstore import MemoryKVStore
+from app.core.rate_limit import check_rate_limit
+
+RATE = 2.0  # tokens per second
+BURST = 3
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def store(clock, monkeypatch) -> MemoryKVStore:
+    monkeypatch.setitem(rate_limit.BUCKETS, "read", (RATE, BURST))
+    monkeypatch.setitem(rate_limit.BUCKETS, "write", (RATE, BURST))
+    return MemoryKVStore(clock=clock)
+
+
+def _check(store: MemoryKVStore, user_id: int = 1, bucket: str = "read"):
+    """
+    Run one rate-limit check, returning the HTTPException it raises or None if the request passes.
+    """
+    try:
+        asyncio.run(check_rate_limit(user_id, bucket, store))
+    except HTTPException as exc:
+        return exc
+    return None
+
+
+def test_full_burst_is_allowed_then_limited(store):
+    assert [_check(store) for _ in range(BURST)] == [None] * BURST
+
+    error = _check(store)
+    assert error is not None and error.status_code == 429
+
+
+def test_limited_request_carries_retry_after(store, clock):
+    for _ in range(BURST):
+        _check(store)
+    clock.now += 0.1
+
+    error = _check(store)
+
+    # 0.2 of the token needed was refilled; the remaining 0.8 takes 0.4 s, rounded up
+    assert error.status_code == 429
+    assert error.headers["Retry-After"] == "1"
+
+
+def test_bucket_refills_at_its_rate(store, clock):
+    for _ in range(BURST):
+        _check(store)
+
+    clock.now += 1 / RATE
+    assert _check(store) is None
+    assert _check(store) is not None
+
+    # Refilling stops at the burst size however long the user is idle
+    clock.now += 3600
+    assert [_check(store) for _ in range(BURST)] == [None] * BURST
+    assert _check(store) is not None
+
+
+def test_buckets_are_per_user_and_per_kind(store):
+    for _ in range(BURST):
+        _check(store, user_id=1)
+    assert _check(store, user_id=1) is not None
+
+    assert _check(store, user_id=2) is None
+    assert _check(store, user_id=1, bucket="write") is None
+
+
+def test_least_recently_used_buckets_are_evicted(clock):
+    store = MemoryKVStore(max_keys=2, clock=clock)
+
+    for key in ("a", "b", "a", "c"):
+        asyncio.run(store.take_tokens(key, RATE, BURST))
+
+    assert list(store._buckets) == ["a", "c"]
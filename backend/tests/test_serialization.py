@@ -0,0 +1,36 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.serialization import dump_expense_lines, dump_expense_rows
+from app.schemas import ExpenseCreate, ExpenseRead
+
+DATES = [
+    datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=timezone(timedelta(hours=2))),
+    datetime(2026, 3, 1, 9, 30, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+    datetime(2026, 3, 1, 9, 30, tzinfo=timezone.utc),
+    datetime(2026, 3, 1, 9, 30),
+]
+
+
+def _row(date: datetime, amount: float = 12.5) -> SimpleNamespace:
+    return SimpleNamespace(id=7, amount=amount, category="Food", description="Lunch", date=date)
+
+
+@pytest.mark.parametrize("date", DATES)
+@pytest.mark.parametrize("amount", [12.5, 1e20])  # the orjson path and the stdlib fallback
+def test_rows_serialize_like_expense_read(date, amount):
+    row = _row(date, amount)
+    expected = ExpenseRead.model_validate(row, from_attributes=True).model_dump(mode="json")
+
+    assert json.loads(dump_expense_rows([row])) == [expected]
+    assert json.loads(dump_expense_lines([row])) == expected
+
+
+def test_input_dates_are_converted_to_utc():
+    expense = ExpenseCreate(amount=1, category="Food", date=DATES[0])
+
+    assert expense.date == DATES[0]
+    assert expense.date.tzinfo == timezone.utc
@@ -3,6 +3,11 @@ from typing import Optional
 from datetime import datetime
 
 
+def _parse_date(value) -> datetime:
+    # JSON carries ISO strings; MessagePack responses carry timestamps, decoded to datetimes already
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
 @dataclass
 class Expense:
     """
@@ -33,8 +38,8 @@ class Expense:
 
         Args:
             data (dict): A dictionary containing the keys 'id', 'amount', 'category', 'description', 
-                         and 'date'. The 'id' is optional and the 'description' defaults to an empty string 
-                         if not provided.
+                         and 'date' (an ISO string or a datetime). The 'id' is optional and the 'description'
+                         defaults to an empty string if not provided.
 
         Returns:
             Expense: An instance of the Expense class.
@@ -44,7 +49,7 @@ class Expense:
                 amount=data.get("amount"),
                 category=data.get("category"),
                 description=data.get("description", ""),
-                date=datetime.fromisoformat(data.get("date")),
+                date=_parse_date(data.get("date")),
         )
 
     def to_dict(self) -> dict:
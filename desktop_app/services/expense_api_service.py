@@ -2,10 +2,29 @@ import requests
 from typing import List
 from models.expense_model import Expense
 
+try:
+    import msgpack
+except ImportError:  # without msgpack the client keeps asking for JSON
+    msgpack = None
+
 # Base URL for backend API
 BASE_URL = "http://127.0.0.1:8000"
 TOKEN = None 
 
+# Listings, summaries and the change feed are requested as MessagePack when msgpack is installed:
+# it is smaller than JSON and decodes faster, with dates arriving as datetimes. The backend
+# answers in JSON if it does not offer MessagePack.
+READ_ACCEPT = "application/msgpack, application/json;q=0.5" if msgpack else "application/json"
+
+# Last response of each GET, keyed by URL and query, as (ETag, JSON body)
+_RESPONSE_CACHE = {}
+
+# Local copy of the user's expenses by ID, the change-feed cursor it is current as of, and the
+# ETag of the last feed response as (cursor it was requested with, ETag)
+_EXPENSES = {}
+_CHANGE_CURSOR = None
+_CHANGE_ETAG = None
+
 def set_token(token: str):
     """
     Set the global authentication token for API requests.
@@ -13,8 +32,13 @@ def set_token(token: str):
     Args:
         token (str): The authentication token used for secure API access.
     """
-    global TOKEN
+    global TOKEN, _CHANGE_CURSOR, _CHANGE_ETAG
     TOKEN = token
+    # Cached responses belong to the previous user
+    _RESPONSE_CACHE.clear()
+    _EXPENSES.clear()
+    _CHANGE_CURSOR = None
+    _CHANGE_ETAG = None
     print(f"[DEBUG] Global TOKEN set: {TOKEN[:20]}...") # For debug purpose 
 
 def get_headers():
@@ -32,20 +56,136 @@ def get_headers():
     return {"Authorization": f"Bearer {TOKEN}"}
 
 
+def _decode(response: requests.Response):
+    """
+    Decode a response body, MessagePack or JSON according to its Content-Type.
+
+    Args:
+        response (requests.Response): A successful response.
+
+    Returns:
+        The decoded body.
+    """
+    if msgpack and response.headers.get("Content-Type", "").startswith("application/msgpack"):
+        return msgpack.unpackb(response.content, timestamp=3)
+    return response.json()
+
+
+def _conditional_get(url: str, params: dict):
+    """
+    GET a listing or summary, revalidating the previous response with its ETag.
+
+    When the backend answers 304 Not Modified the cached body is reused, so an unchanged
+    result costs one small round trip instead of a full download.
+
+    Args:
+        url (str): The endpoint URL.
+        params (dict): The query parameters.
+
+    Returns:
+        The decoded body.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    key = (url, tuple(sorted(params.items())))
+    headers = {**get_headers(), "Accept": READ_ACCEPT}
+    cached = _RESPONSE_CACHE.get(key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+
+    response = requests.get(url, headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status() # Raise exception if request failed
+
+    body = _decode(response)
+    etag = response.headers.get("ETag")
+    if etag:
+        _RESPONSE_CACHE[key] = (etag, body)
+    return body
+
+
 def get_expenses() -> List[Expense]:
     """
-    Fetch all expenses from the backend API.
+    Fetch all expenses, newest first, keeping a local copy current through the change feed.
+
+    The first call downloads a full snapshot. Later calls pass the cursor of the previous one
+    and receive only the expenses created, updated or deleted since, so a refresh costs in
+    proportion to what changed rather than to the size of the history. The feed is read page
+    by page until the backend reports no more changes. A refresh with nothing new revalidates
+    the last response with its ETag and gets an empty 304 answer.
 
     Returns:
         List[Expense]: A list of `Expense` objects retrieved from the API.
 
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    global _CHANGE_CURSOR, _CHANGE_ETAG
+    while True:
+        params = {"since": _CHANGE_CURSOR} if _CHANGE_CURSOR else {}
+        headers = {**get_headers(), "Accept": READ_ACCEPT}
+        if _CHANGE_ETAG and _CHANGE_ETAG[0] == _CHANGE_CURSOR:
+            headers["If-None-Match"] = _CHANGE_ETAG[1]
+
+        response = requests.get(f"{BASE_URL}/expenses/changes", headers=headers, params=params)
+        if response.status_code == 304:
+            break
+        response.raise_for_status() # Raise exception if request failed
+        feed = _decode(response)
+
+        for expense_id in feed["deleted"]:
+            _EXPENSES.pop(expense_id, None)
+        for data in feed["changes"]:
+            _EXPENSES[data["id"]] = Expense.from_dict(data)
+        etag = response.headers.get("ETag")
+        _CHANGE_ETAG = (_CHANGE_CURSOR, etag) if etag else None
+        _CHANGE_CURSOR = feed["cursor"]
+        if not feed.get("has_more"):
+            break
+
+    return sorted(_EXPENSES.values(), key=lambda e: (e.date, e.id), reverse=True)
+
+
+def get_summary(group_by: str = "category", extremes: bool = True, **filters) -> List[dict]:
+    """
+    Fetch per-group expense totals computed by the backend.
+
+    Args:
+        group_by (str): "category", "day", "week" or "month".
+        extremes (bool): Whether per-group 'min'/'max' are needed. Without them the backend
+                         answers from its pre-aggregated daily totals, which is cheaper.
+        **filters: Optional query filters such as `date_from` and `date_to` (ISO strings).
+
+    Returns:
+        List[dict]: One dict per group with 'key', 'total', 'count', 'min' and 'max'.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    params = {"group_by": group_by, "extremes": str(extremes).lower(), **filters}
+    return _conditional_get(f"{BASE_URL}/expenses/summary", params)["buckets"]
+
+
+def search_expenses(query: str, **filters) -> List[Expense]:
+    """
+    Search expenses by description and category on the backend, best matches first.
+
+    Args:
+        query (str): The text to search for; typos and word prefixes are tolerated.
+        **filters: Optional query filters such as `date_from`, `date_to` and `category`.
+
+    Returns:
+        List[Expense]: The matching `Expense` objects.
+
     Raises:
         requests.exceptions.HTTPError: If the API request fails.
     """
     response = requests.get(
-        f"{BASE_URL}/expenses/", headers=get_headers()
+        f"{BASE_URL}/expenses/search", headers=get_headers(), params={"q": query, **filters}
     )
-    response.raise_for_status() # Raise exception if request failed
+    response.raise_for_status()
     return [Expense.from_dict(e) for e in response.json()]
 
 
@@ -101,3 +241,127 @@ def delete_expense(expense_id: int):
     """
     response = requests.delete(f"{BASE_URL}/expenses/{expense_id}", headers=get_headers())
     response.raise_for_status()
+
+
+def create_expenses(expenses: List[Expense]) -> List[dict]:
+    """
+    Create many expense entries with a single request to the batch endpoint.
+
+    Args:
+        expenses (List[Expense]): The `Expense` objects to be created.
+
+    Returns:
+        List[dict]: One result per expense, in order, with its 'index', new 'id' and 'status'.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    response = requests.post(
+        f"{BASE_URL}/expenses/batch", headers=get_headers(), json=[e.to_dict() for e in expenses]
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def update_expenses(expenses: List[Expense]) -> List[dict]:
+    """
+    Update many expense entries with a single request to the batch endpoint.
+
+    Args:
+        expenses (List[Expense]): The `Expense` objects with updated values; each must have an `id`.
+
+    Returns:
+        List[dict]: One result per expense, in order, with its 'index', 'id' and 'status'.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    response = requests.put(
+        f"{BASE_URL}/expenses/batch", headers=get_headers(),
+        json=[{"id": e.id, **e.to_dict()} for e in expenses]
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def delete_expenses(expense_ids: List[int]) -> List[dict]:
+    """
+    Delete many expense entries with a single request to the batch endpoint.
+
+    Args:
+        expense_ids (List[int]): The IDs of the expenses to be deleted.
+
+    Returns:
+        List[dict]: One result per ID, in order, with its 'index', 'id' and 'status'.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    response = requests.post(
+        f"{BASE_URL}/expenses/batch/delete", headers=get_headers(), json={"ids": expense_ids}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def start_statement_import(path: str, **options) -> dict:
+    """
+    Upload a bank statement (CSV or OFX) to be imported in the background.
+
+    The call returns as soon as the file is uploaded; poll the returned job with `get_job` to
+    show progress and, once it has succeeded, the import report in its 'result'.
+
+    Args:
+        path (str): Path of the statement file.
+        **options: Optional import settings passed to the API, e.g. `date_format` or `default_category`.
+
+    Returns:
+        dict: The queued job, with its 'id', 'status' and 'progress'.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    with open(path, "rb") as statement:
+        response = requests.post(
+            f"{BASE_URL}/jobs/import", headers=get_headers(), params=options,
+            files={"file": (path.replace("\\", "/").rsplit("/", 1)[-1], statement)},
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+def get_job(job_id: int) -> dict:
+    """
+    Fetch the status, progress and result of a background job.
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        dict: The job; 'status' is one of "queued", "running", "succeeded", "failed" or "cancelled"
+        and 'progress' the fraction done, from 0 to 1, when known.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    response = requests.get(f"{BASE_URL}/jobs/{job_id}", headers=get_headers())
+    response.raise_for_status()
+    return response.json()
+
+
+def cancel_job(job_id: int) -> dict:
+    """
+    Cancel a background job; a running one stops shortly after and nothing it did is kept.
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        dict: The job after the request.
+
+    Raises:
+        requests.exceptions.HTTPError: If the API request fails.
+    """
+    response = requests.post(f"{BASE_URL}/jobs/{job_id}/cancel", headers=get_headers())
+    response.raise_for_status()
+    return response.json()
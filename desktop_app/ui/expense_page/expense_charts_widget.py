@@ -1,8 +1,7 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
-from collections import defaultdict
-from datetime import datetime
+from datetime import date
 import matplotlib.dates as mdates
 
 class ChartWidget(QWidget):
@@ -31,37 +30,32 @@ class ChartWidget(QWidget):
         self.canvas = FigureCanvas(self.figure)
         self.layout.addWidget(self.canvas)
 
-    def update_chart(self, expenses):
+    def update_chart(self, category_totals, daily_totals):
         """
-        Updates both the pie chart and the line chart based on the provided list of expense objects.
+        Updates both the pie chart and the line chart from totals summarized by the backend.
 
         Args:
-            expenses (list): A list of expense objects. Each expense should have a 'category', 
-                             'amount', and 'date' (either a datetime object or a date object).
+            category_totals (list): Summary buckets grouped by category. Each bucket is a dict
+                                    with a 'key' (the category) and a 'total'.
+            daily_totals (list): Summary buckets grouped by day. Each bucket is a dict with a
+                                 'key' (an ISO date string) and a 'total'.
         """
         self.ax_pie.clear()
         self.ax_line.clear()
     
-        if not expenses:
+        if not category_totals:
             self.canvas.draw()
             return
         
         # Pie chart: sum by category
-        category_totals = defaultdict(float)
-        for e in expenses:
-            category_totals[e.category] += e.amount
-        labels = list(category_totals.keys())
-        sizes = list(category_totals.values())
+        labels = [b["key"] for b in category_totals]
+        sizes = [b["total"] for b in category_totals]
         self.ax_pie.pie(sizes, labels=labels, autopct="%1.1f%%")
         self.ax_pie.set_title("Spending by Category")
 
-        # Line chart: daily spending trend
-        daily_totals = defaultdict(float)
-        for e in expenses:
-            day = e.date.date() if isinstance(e.date, datetime) else e.date
-            daily_totals[day] += e.amount
-        days = sorted(daily_totals.keys())
-        values = [daily_totals[d] for d in days]
+        # Line chart: daily spending trend (buckets arrive in date order)
+        days = [date.fromisoformat(b["key"]) for b in daily_totals]
+        values = [b["total"] for b in daily_totals]
         self.ax_line.plot(days, values, marker="o")
         self.ax_line.set_title("Spending Trend")
         self.ax_line.set_xlabel("Date")
@@ -30,6 +30,14 @@ class ExpensesPage(QWidget):
         self.setWindowTitle("Expense")  # Sets the window title
         self.layout = QVBoxLayout(self) # Main vertival layout of the page
 
+        # Search box: Enter searches descriptions and categories, clearing it shows all expenses again
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search expenses (e.g. uber march)...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.returnPressed.connect(self.load_expenses)
+        self.search_input.textChanged.connect(lambda text: None if text.strip() else self.load_expenses())
+        self.layout.addWidget(self.search_input)
+
         # Table setup: Create a table to display expense data
         self.table = QTableWidget()
         self.table.setColumnCount(5)
@@ -67,15 +75,23 @@ class ExpensesPage(QWidget):
     def load_expenses(self):  
         """
         Fetches the list of expenses from the backend and updates the table and chart.
+        When the search box holds a query, the table shows the matching expenses instead.
         If an error occurs while fetching the data, an error message is displayed.
         """ 
         try:
             # Fetch expenses from backend
-            expenses = expense_api_service.get_expenses()
+            query = self.search_input.text().strip()
+            if query:
+                expenses = expense_api_service.search_expenses(query)
+            else:
+                expenses = expense_api_service.get_expenses()
             # Populate table
             self.populate_table(expenses)
-            # Update chart
-            self.charts.update_chart(expenses)
+            # Update chart from server-side totals instead of re-aggregating every row
+            self.charts.update_chart(
+                expense_api_service.get_summary("category", extremes=False),
+                expense_api_service.get_summary("day", extremes=False),
+            )
 
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load expenses: {e}")